@@ -1,229 +1,32 @@
 
+import argparse
 import pygame
 import sys
-from enum import Enum
-from dataclasses import dataclass
+import time
 from typing import List, Optional
-import math
-import random
-
-# กำหนดประเภทของหมาก
-class PieceType(Enum):
-    PAWN = "PAWN"
-    KNIGHT = "KNIGHT"
-    BISHOP = "BISHOP"
-    ROOK = "ROOK"
-    QUEEN = "QUEEN"
-
-@dataclass
-class Position:
-    x: int
-    y: int
-
-@dataclass
-class Piece:
-    piece_type: PieceType
-    position: Position
-
-# @dataclass
-# class Player:
-#     position: Position
-#     hp: int
-#     abilities: List[str]
-
-class PlayerAbilities(Enum):
-    EXTRA_MOVE = "Double Move"  # เดินได้ 2 ครั้ง
-    SHIELD = "Shield"          # โล่ป้องกัน 1 ครั้ง
-    TELEPORT = "Teleport"      # เคลื่อนที่ข้ามฝั่งได้
-    HEAL = "Heal"             # ฟื้นฟู HP 1 หน่วย
-    
-@dataclass
-class Player:
-    position: Position
-    hp: int
-    abilities: List[PlayerAbilities]
-    shield_active: bool = False
-    moves_remaining: int = 1
-
-    def add_ability(self, ability: PlayerAbilities):
-        """เพิ่มความสามารถให้ผู้เล่น"""
-        self.abilities.append(ability)
-
-    def use_ability(self, ability: PlayerAbilities) -> bool:
-        """ใช้ความสามารถ"""
-        if ability in self.abilities:
-            if ability == PlayerAbilities.EXTRA_MOVE:
-                self.moves_remaining = 2
-            elif ability == PlayerAbilities.SHIELD:
-                self.shield_active = True
-            elif ability == PlayerAbilities.HEAL:
-                self.hp = min(self.hp + 1, 5)
-            self.abilities.remove(ability)
-            return True
-        return False
-
-class ChessAI:
-    def __init__(self, board_size: int = 8):
-        self.board_size = board_size
-        self.difficulty_level = 1
-
-    def get_moves(self, piece: Piece) -> List[Position]:
-        """คำนวณการเดินที่เป็นไปได้ของหมากแต่ละตัว"""
-        moves = []
-        
-        if piece.piece_type == PieceType.PAWN:
-            # เดินหน้า 1 ช่อง และแนวทแยง
-            possible_moves = [
-                (0, 1),   # เดินหน้า
-                (1, 1),   # ทแยงขวา
-                (-1, 1),  # ทแยงซ้าย
-            ]
-            for dx, dy in possible_moves:
-                new_x = piece.position.x + dx
-                new_y = piece.position.y + dy
-                if self._is_valid_position(new_x, new_y):
-                    moves.append(Position(new_x, new_y))
-            
-        elif piece.piece_type == PieceType.KNIGHT:
-            knight_moves = [
-                (2, 1), (2, -1), (-2, 1), (-2, -1),
-                (1, 2), (1, -2), (-1, 2), (-1, -2)
-            ]
-            for dx, dy in knight_moves:
-                new_x = piece.position.x + dx
-                new_y = piece.position.y + dy
-                if self._is_valid_position(new_x, new_y):
-                    moves.append(Position(new_x, new_y))
-                    
-        elif piece.piece_type == PieceType.ROOK:
-            # เดินแนวตั้งและแนวนอน
-            directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-            for dx, dy in directions:
-                new_x = piece.position.x + dx
-                new_y = piece.position.y + dy
-                if self._is_valid_position(new_x, new_y):
-                    moves.append(Position(new_x, new_y))
-        
-        return moves
-
-    def _is_valid_position(self, x: int, y: int) -> bool:
-        """ตรวจสอบว่าตำแหน่งอยู่ในกระดานหรือไม่"""
-        return 0 <= x < self.board_size and 0 <= y < self.board_size
 
-    def choose_moves(self, pieces: List[Piece], player: Player) -> List[Position]:
-        """เลือกการเดินที่ดีที่สุดสำหรับ AI ทั้ง 3 ตัว"""
-        moves = []
-        roles = ["blocker", "attacker", "supporter"]
-        
-        for piece, role in zip(pieces, roles):
-            possible_moves = self.get_moves(piece)
-            if not possible_moves:  # ถ้าไม่มีที่ให้เดิน ให้อยู่ที่เดิม
-                moves.append(piece.position)
-                continue
-                
-            best_move = piece.position  # ถ้าไม่มีที่ดีกว่า ให้อยู่ที่เดิม
-            best_score = float('-inf')
-            
-            for move in possible_moves:
-                score = self._evaluate_move(piece, move, player, role)
-                if score > best_score:
-                    best_score = score
-                    best_move = move
-            
-            moves.append(best_move)
-            
-        return moves
-
-    def _evaluate_move(self, piece: Piece, move: Position, player: Player, role: str) -> float:
-        """ประเมินคะแนนของการเดิน"""
-        score = 0.0
-        
-        # ระยะห่างจากผู้เล่น
-        distance = math.sqrt((move.x - player.position.x)**2 + 
-                           (move.y - player.position.y)**2)
-        
-        # คะแนนพื้นฐานตามบทบาท
-        if role == "blocker":
-            # ต้องการอยู่ใกล้ผู้เล่นแต่ไม่ต้องเข้าไปติด
-            score = 20 - distance if distance > 2 else 10
-        elif role == "attacker":
-            # ต้องการเข้าใกล้ผู้เล่นมากที่สุด
-            score = 30 - distance
-        else:  # supporter
-            # พยายามอยู่ห่างพอประมาณและควบคุมพื้นที่
-            ideal_distance = 3
-            score = 20 - abs(distance - ideal_distance)
-
-        # โบนัสถ้าสามารถกินผู้เล่นได้
-        if move.x == player.position.x and move.y == player.position.y:
-            score += 100
-
-        # หักคะแนนถ้าเดินชิดขอบเกินไป
-        if move.x in [0, 7] or move.y in [0, 7]:
-            score -= 5
-
-        return score
-    
-class Level:
-    def __init__(self, level_number: int):
-        self.level_number = level_number
-        self.ai_setups = {
-            1: [ # ด่าน 1 - เริ่มต้น
-                (PieceType.PAWN, Position(1, 1)),
-                (PieceType.KNIGHT, Position(3, 1)),
-                (PieceType.ROOK, Position(6, 1))
-            ],
-            2: [ # ด่าน 2 - เพิ่มความยาก
-                (PieceType.PAWN, Position(1, 1)),
-                (PieceType.KNIGHT, Position(3, 1)),
-                (PieceType.ROOK, Position(6, 1)),
-                (PieceType.BISHOP, Position(4, 1))
-            ],
-            3: [ # ด่าน 3 - ปานกลาง
-                (PieceType.KNIGHT, Position(2, 1)),
-                (PieceType.BISHOP, Position(3, 1)),
-                (PieceType.ROOK, Position(5, 1)),
-                (PieceType.QUEEN, Position(4, 1)),
-                (PieceType.PAWN, Position(1, 2))
-            ],
-            4: [ # ด่าน 4 - ยาก
-                (PieceType.QUEEN, Position(4, 1)),
-                (PieceType.BISHOP, Position(3, 1)),
-                (PieceType.BISHOP, Position(5, 1)),
-                (PieceType.KNIGHT, Position(2, 1)),
-                (PieceType.KNIGHT, Position(6, 1)),
-                (PieceType.PAWN, Position(4, 2))
-            ],
-            5: [ # ด่าน 5 - ท้าทาย
-                (PieceType.QUEEN, Position(4, 1)),
-                (PieceType.ROOK, Position(1, 1)),
-                (PieceType.ROOK, Position(7, 1)),
-                (PieceType.BISHOP, Position(3, 1)),
-                (PieceType.BISHOP, Position(5, 1)),
-                (PieceType.KNIGHT, Position(2, 2)),
-                (PieceType.KNIGHT, Position(6, 2))
-            ]
-        }
-
-    def get_ai_pieces(self) -> List[Piece]:
-        """สร้างหมาก AI สำหรับด่านปัจจุบัน"""
-        if self.level_number not in self.ai_setups:
-            return []
-        
-        pieces = []
-        for piece_type, position in self.ai_setups[self.level_number]:
-            pieces.append(Piece(piece_type, position))
-        return pieces
-
-    def get_difficulty(self) -> int:
-        """คำนวณความยากของด่าน"""
-        return min(5, self.level_number)
+from moodeng_cache import ReplyCache
+from moodeng_core import PieceType, PlayerAbilities, Position
+from moodeng_engine import (
+    Action, GameState, MAX_BOARD_SIZE, MAX_LEVEL, MIN_BOARD_SIZE, SEED_LIMIT,
+)
+from moodeng_levelgen import LevelGenerator
+from moodeng_profile import Profiler
+from moodeng_render import DirtyTracker, FrameScheduler, RenderCache
+from moodeng_replay import ReplayDivergence, ReplayPlayer, ReplayWriter
+from moodeng_worker import AIWorker, snapshot
+
+REPLAY_STEP = pygame.USEREVENT + 1  # timer ของการเล่น replay ทีละตา
+AI_DONE = pygame.USEREVENT + 2      # AI คิดเสร็จ (ส่งจาก thread ของ AI ปลุก main loop)
+AI_THINKING = pygame.USEREVENT + 3  # AI คิดนานพอที่จะขึ้นข้อความ "AI thinking..."
+THINKING_DELAY_MS = 150             # AI ที่ตอบเร็วกว่านี้ไม่ต้องขึ้นข้อความ (ไม่ให้กระพริบ)
+VIEW_SQUARES = 16                   # กระดานที่ใหญ่กว่านี้เห็นทีละ 16x16 ช่อง กล้องเลื่อนตามผู้เล่น
 
 class GameVisualizer:
-    def __init__(self, window_size: int = 800):
+    def __init__(self, window_size: int = 800, board_size: int = 8):
         pygame.init()
         self.window_size = window_size
-        self.square_size = window_size // 8
+        self.set_board_size(board_size)
         self.screen = pygame.display.set_mode((window_size, window_size + 60))  # เพิ่มพื้นที่สำหรับปุ่ม
         pygame.display.set_caption("Chess AI Test Game")
         
@@ -234,6 +37,7 @@ class GameVisualizer:
             'player': (0, 0, 255),
             'ai': (255, 0, 0),
             'valid_move': (0, 255, 0),
+            'danger_move': (255, 140, 0),  # ช่องที่เดินได้แต่หมาก AI โจมตีถึง
             'button': (50, 200, 50),  # สีปุ่ม
             'button_hover': (100, 255, 100)  # สีปุ่มเมื่อเมาส์ชี้
         }
@@ -246,6 +50,37 @@ class GameVisualizer:
             40                          # height
         )
 
+        # font และตัวอักษรที่ใช้ทุกเฟรม โหลด/render ครั้งเดียว
+        self.cache = RenderCache()
+        self.cache.prerender(["P"] + [piece_type.name[0] for piece_type in PieceType],
+                             36, self.colors['white'])
+        self.cache.prerender(["Restart"], 36, (255, 255, 255))
+        self.cache.prerender([ability.value for ability in PlayerAbilities], 24, (255, 255, 255))
+
+    def set_board_size(self, board_size: int):
+        """กระดานที่ใหญ่กว่า VIEW_SQUARES วาดเฉพาะช่องที่อยู่ในกล้อง (origin คือช่องบนซ้ายที่เห็น)"""
+        self.board_size = board_size
+        self.view_squares = min(board_size, VIEW_SQUARES)
+        self.square_size = self.window_size // self.view_squares
+        self.origin = (0, 0)
+        # พื้นหลังกับตารางหมากรุกวาดครั้งเดียวเก็บไว้ แล้วค่อย blit
+        # (สองแบบ: กล้องเลื่อนไปเลขคี่ สีช่องจะสลับกัน)
+        self.backgrounds = {}
+
+    def follow(self, position: Position) -> bool:
+        """เลื่อนกล้องให้ position อยู่กลางจอแต่ไม่เลยขอบกระดาน คืนค่า True ถ้ากล้องขยับ"""
+        limit = self.board_size - self.view_squares
+        half = self.view_squares // 2
+        origin = (min(max(position.x - half, 0), limit), min(max(position.y - half, 0), limit))
+        if origin == self.origin:
+            return False
+        self.origin = origin
+        return True
+
+    def is_visible(self, position: Position) -> bool:
+        x, y = position.x - self.origin[0], position.y - self.origin[1]
+        return 0 <= x < self.view_squares and 0 <= y < self.view_squares
+
     def draw_button(self, mouse_pos):
         # เปลี่ยนสีปุ่มเมื่อเมาส์ชี้
         color = self.colors['button_hover'] if self.button_rect.collidepoint(mouse_pos) else self.colors['button']
@@ -254,45 +89,60 @@ class GameVisualizer:
         pygame.draw.rect(self.screen, color, self.button_rect, border_radius=5)
         
         # วาดข้อความบนปุ่ม
-        font = pygame.font.Font(None, 36)
-        text = font.render("Restart", True, (255, 255, 255))
+        text = self.cache.text("Restart", 36, (255, 255, 255))
         text_rect = text.get_rect(center=self.button_rect.center)
         self.screen.blit(text, text_rect)
 
     def is_button_clicked(self, mouse_pos):
         return self.button_rect.collidepoint(mouse_pos)
 
-    def draw_board(self):
-        for y in range(8):
-            for x in range(8):
-                color = self.colors['white'] if (x + y) % 2 == 0 else self.colors['gray']
-                pygame.draw.rect(self.screen, color, 
-                               (x * self.square_size, y * self.square_size, 
-                                self.square_size, self.square_size))
+    def draw_board(self, area: Optional[pygame.Rect] = None):
+        """วาดพื้นหลังและตาราง ทั้งจอหรือเฉพาะ area"""
+        parity = sum(self.origin) % 2
+        background = self.backgrounds.get(parity)
+        if background is None:
+            background = pygame.Surface(self.screen.get_size())
+            background.fill(self.colors['white'])
+            for y in range(self.view_squares):
+                for x in range(self.view_squares):
+                    color = self.colors['white'] if (x + y + parity) % 2 == 0 else self.colors['gray']
+                    pygame.draw.rect(background, color, 
+                                   (x * self.square_size, y * self.square_size, 
+                                    self.square_size, self.square_size))
+            self.backgrounds[parity] = background
+        if area is None:
+            self.screen.blit(background, (0, 0))
+        else:
+            self.screen.blit(background, area, area)
+
+    def square_rect(self, position: Position) -> pygame.Rect:
+        return pygame.Rect((position.x - self.origin[0]) * self.square_size,
+                           (position.y - self.origin[1]) * self.square_size,
+                           self.square_size, self.square_size)
 
     def draw_piece(self, position: Position, piece_type: str, is_player: bool):
-        x = position.x * self.square_size + self.square_size // 2
-        y = position.y * self.square_size + self.square_size // 2
+        x, y = self.square_rect(position).center
         color = self.colors['player'] if is_player else self.colors['ai']
         
         pygame.draw.circle(self.screen, color, (x, y), self.square_size // 3)
         
-        font = pygame.font.Font(None, 36)
-        text = font.render(piece_type, True, self.colors['white'])
+        text = self.cache.text(piece_type, 36, self.colors['white'])
         text_rect = text.get_rect(center=(x, y))
         self.screen.blit(text, text_rect)
 
-    def draw_valid_moves(self, valid_moves: List[Position]):
-        for move in valid_moves:
-            x = move.x * self.square_size + self.square_size // 2
-            y = move.y * self.square_size + self.square_size // 2
-            pygame.draw.circle(self.screen, self.colors['valid_move'], 
+    def draw_valid_moves(self, valid_moves: List[Position], dangerous: Optional[List[bool]] = None):
+        for i, move in enumerate(valid_moves):
+            x, y = self.square_rect(move).center
+            color = self.colors['danger_move'] if dangerous and dangerous[i] else self.colors['valid_move']
+            pygame.draw.circle(self.screen, color, 
                              (x, y), self.square_size // 4)
 
     def get_square_from_mouse(self, pos) -> Position:
         x = pos[0] // self.square_size
         y = pos[1] // self.square_size
-        return Position(x, y)
+        if not (0 <= x < self.view_squares and 0 <= y < self.view_squares):
+            return Position(-1, -1)  # นอกกระดาน (เช่นแถบปุ่มด้านล่าง)
+        return Position(x + self.origin[0], y + self.origin[1])
 
 # class Game:
 #     def __init__(self):
@@ -383,33 +233,59 @@ class GameVisualizer:
 
 
 class Game:
-    def __init__(self):
-        self.visualizer = GameVisualizer()
-        self.ai = ChessAI()
-        self.current_level = 1
-        self.level_system = Level(self.current_level)
-        self.player = None
-        self.ai_pieces = []
+    def __init__(self, dirty_rects: bool = True, fps: int = 60,
+                 seed: Optional[int] = None, record: Optional[str] = None,
+                 profile: Optional[str] = None, speculate: bool = True,
+                 ai_cache: Optional[str] = None, board_size: int = 8,
+                 endless: bool = False, level_cache: Optional[str] = None):
+        self.visualizer = GameVisualizer(board_size=board_size)
+        self.state = GameState(log=print, seed=seed, board_size=board_size,
+                               max_level=None if endless else MAX_LEVEL)
+        # โหมด endless: ด่านหลัง MAX_LEVEL สร้างจาก seed บน thread แยก (เตรียมไว้ระหว่างเล่นด่านก่อนหน้า)
+        # ให้ level_cache จะเก็บด่านที่สร้างแล้วข้ามการเปิดเกม
+        self.levels = None
+        if endless:
+            self.levels = LevelGenerator(self.state.seed, board_size, path=level_cache)
+            self.state.levels = self.levels
+        # ตำแหน่งที่เคยเจอ (ต้นด่าน หลังผู้เล่นเกิดใหม่) AI ไม่ต้องคิดซ้ำ ให้ ai_cache จะเก็บข้ามการเปิดเกม
+        self.reply_cache = ReplyCache(path=ai_cache)
+        self.state.ai.cache = self.reply_cache
+        # จับเวลาแต่ละส่วนของ loop เปิดเมื่อกด F3 (แสดงบนจอ) หรือเมื่อให้ profile (เขียน JSON ตอนปิด)
+        self.profile_path = profile
+        self.show_profile = False
+        self.profiler = Profiler(enabled=profile is not None)
+        self.state.profiler = self.profiler
+        # AI คิดบน thread แยก ระหว่างนั้น pending_action คือคลิกของผู้เล่นที่รอตา AI อยู่
+        self.worker = AIWorker(self.state.ai, self.profiler,
+                               on_done=lambda: pygame.event.post(pygame.event.Event(AI_DONE)))
+        self.pending_action: Optional[Action] = None
+        self.show_thinking = False
+        # ระหว่างที่ผู้เล่นเลือกช่อง ให้ AI คิดตาตอบของทุกช่องที่เดินได้ไว้ก่อน
+        self.speculate_ai = speculate
+        # บันทึกทุกตาลงไฟล์ replay ระหว่างเล่น
+        self.recorder = ReplayWriter(record, self.state) if record else None
         self.selected = False
         self.valid_moves = []
-        self.score = 0
-        self.game_over = False
-        self.victory = False
         self.ability_selected = None
-        self.level_complete = False  # เพิ่มตัวแปรเช็คจบด่าน
+        # True = วาดใหม่และส่งขึ้นจอเฉพาะส่วนที่เปลี่ยน, False = วาดทั้งจอทุกเฟรม
+        self.dirty_rects = dirty_rects
+        self.dirty = DirtyTracker()
+        # วาดเฉพาะตอนที่มีอะไรเปลี่ยน ไม่งั้นรอ event เฉย ๆ (ไม่กิน CPU ตอนว่าง)
+        self.scheduler = FrameScheduler(fps)
         self.reset_game()
     def draw_abilities(self):
+        for i, ability in enumerate(self.state.player.abilities):
+            self.draw_ability(i, ability)
+    def draw_ability(self, i, ability):
         start_y = 130
-        font = pygame.font.Font(None, 24)
-        for i, ability in enumerate(self.player.abilities):
-            ability_rect = pygame.Rect(10, start_y + i*40, 100, 30)
-            color = (100, 200, 100) if self.ability_selected == ability else (100, 100, 200)
-            pygame.draw.rect(self.visualizer.screen, color, ability_rect)
-            text = font.render(ability.value, True, (255, 255, 255))
-            self.visualizer.screen.blit(text, (15, start_y + i*40 + 5))
+        ability_rect = pygame.Rect(10, start_y + i*40, 100, 30)
+        color = (100, 200, 100) if self.ability_selected == ability else (100, 100, 200)
+        pygame.draw.rect(self.visualizer.screen, color, ability_rect)
+        text = self.visualizer.cache.text(ability.value, 24, (255, 255, 255))
+        self.visualizer.screen.blit(text, (15, start_y + i*40 + 5))
     def handle_ability_click(self, pos):
         start_y = 130
-        for i, ability in enumerate(self.player.abilities):
+        for i, ability in enumerate(self.state.player.abilities):
             ability_rect = pygame.Rect(10, start_y + i*40, 100, 30)
             if ability_rect.collidepoint(pos):
                 if self.ability_selected == ability:
@@ -420,117 +296,307 @@ class Game:
         return False
 
     def reset_game(self):
-        # สร้างผู้เล่นพร้อมความสามารถเริ่มต้น
-        self.player = Player(
-            position=Position(4, 7),
-            hp=3,
-            abilities=[PlayerAbilities.SHIELD],
-            shield_active=False,
-            moves_remaining=1
-        )
-        self.current_level = 1
-        self.level_system = Level(self.current_level)
-        self.ai_pieces = self.level_system.get_ai_pieces()
+        self.cancel_ai()
+        self.state.reset()
         self.selected = False
         self.valid_moves = []
-        self.score = 0
-        self.game_over = False
-        self.victory = False
         self.ability_selected = None
-        self.level_complete = False
-
-    def next_level(self):
-        """เปลี่ยนด่านใหม่"""
-        self.current_level += 1
-        if self.current_level <= 5:
-            print(f"\nStarting Level {self.current_level}!")
-            # ให้ความสามารถใหม่
-            random_ability = random.choice([
-                PlayerAbilities.EXTRA_MOVE,
-                PlayerAbilities.SHIELD,
-                PlayerAbilities.TELEPORT,
-                PlayerAbilities.HEAL
-            ])
-            self.player.add_ability(random_ability)
-            print(f"Got new ability: {random_ability.value}!")
-            
-            # เตรียมด่านใหม่
-            self.level_system = Level(self.current_level)
-            self.player.position = Position(4, 7)
-            self.ai_pieces = self.level_system.get_ai_pieces()
-            
-            # ให้รางวัล
-            self.score += 500
-            self.player.hp = min(self.player.hp + 1, 5)  # เพิ่ม HP (ไม่เกิน 5)
-            
-            # รีเซ็ตสถานะ
-            self.level_complete = False
+        self.speculate()
+
+    def handle_move(self, clicked_pos):
+        """ส่งคลิกให้ GameState เดินตาของผู้เล่น ถ้าถึงตา AI ให้ worker คิดต่อโดยหน้าจอไม่ค้าง"""
+        action = Action(clicked_pos, self.ability_selected)
+        cursor = self.state.history.cursor
+        with self.profiler.time("update"):
+            ai_turn = self.state.begin_turn(action)
+        if ai_turn:
+            self.pending_action = action
+            self.worker.submit(self.state.ai_pieces, self.state.player)
+            pygame.time.set_timer(AI_THINKING, THINKING_DELAY_MS, 1)
+            return
+        self.clear_used_ability()
+        if self.state.history.cursor != cursor:
+            self.speculate()  # เดินครั้งแรกของ EXTRA_MOVE
+
+    def speculate(self):
+        """ให้ worker คิดตาตอบของ AI สำหรับทุกช่องที่ผู้เล่นเดินแบบคิงได้ในตานี้
+
+        ตำแหน่งหลังเดินได้จาก begin_turn แล้ว cancel_turn ทันที (state ตัวจริงไม่เปลี่ยน)
+        ผลชุดเดิมถูกทิ้งทุกครั้ง เช่นหลัง TELEPORT หรือ EXTRA_MOVE ที่ทำให้ตำแหน่งเปลี่ยน
+        """
+        state = self.state
+        if not self.speculate_ai or self.pending_action is not None:
+            return
+        positions = []
+        # ยังเหลือการเดินจาก EXTRA_MOVE: คลิกหน้ายังไม่ถึงตา AI
+        if not state.game_over and state.player.moves_remaining == 1:
+            for move in state.get_player_valid_moves():
+                if state.begin_turn(Action(move)):
+                    positions.append(snapshot(state.ai_pieces, state.player))
+                    state.cancel_turn()
+        self.worker.speculate(positions)
+
+    def poll_ai(self):
+        """ถ้า AI คิดเสร็จแล้วให้เดินตาของ AI"""
+        if self.pending_action is None:
+            return
+        ai_moves = self.worker.poll()
+        if ai_moves is None:
+            return
+        action, self.pending_action = self.pending_action, None
+        self.show_thinking = False
+        with self.profiler.time("update"):
+            self.state.finish_turn(action, ai_moves)
+        self.clear_used_ability()
+        self.scheduler.request_redraw()
+        self.speculate()
+
+    def cancel_ai(self):
+        """หยุด AI ที่กำลังคิด แล้วย้อนคลิกของผู้เล่นที่รอตา AI อยู่"""
+        if self.pending_action is None:
+            return
+        self.worker.cancel()
+        self.state.cancel_turn()
+        self.pending_action = None
+        self.show_thinking = False
+
+    def clear_used_ability(self):
+        # ความสามารถที่ใช้ไปแล้วไม่ต้องค้างไว้
+        if self.ability_selected not in self.state.player.abilities:
+            self.ability_selected = None
+
+    def undo(self, redo: bool = False):
+        """ย้อน (หรือทำซ้ำ) หนึ่งตา แล้วยกเลิกสิ่งที่เลือกค้างไว้ ถ้า AI กำลังคิด undo จะยกเลิกคลิกนั้น"""
+        if self.pending_action is not None:
+            if redo:
+                return False
+            self.cancel_ai()
+            changed = True
+        else:
+            changed = self.state.redo() if redo else self.state.undo()
+        if changed:
             self.selected = False
             self.valid_moves = []
-        else:
-            self.victory = True
-            self.game_over = True
-            print("Congratulations! You've completed all levels!")
-
-    def check_level_complete(self):
-        """ตรวจสอบว่าจบด่านหรือยัง"""
-        if len(self.ai_pieces) == 0 and not self.level_complete:
-            self.level_complete = True
-            print(f"Level {self.current_level} Complete!")
-            self.next_level()
-    def handle_move(self, clicked_pos):
-        if self.ability_selected == PlayerAbilities.TELEPORT:
-            if 0 <= clicked_pos.x < 8 and 0 <= clicked_pos.y < 8:
-                self.player.position = clicked_pos
-                self.player.use_ability(PlayerAbilities.TELEPORT)
-                return True
-                
-        for valid_move in self.valid_moves:
-            if clicked_pos.x == valid_move.x and clicked_pos.y == valid_move.y:
-                captured = False
-                for piece in self.ai_pieces[:]:
-                    if piece.position.x == clicked_pos.x and piece.position.y == clicked_pos.y:
-                        self.ai_pieces.remove(piece)
-                        self.score += 100
-                        captured = True
-                        break
-                
-                self.player.position = clicked_pos
-                self.player.moves_remaining -= 1
-                
-                if self.player.moves_remaining <= 0:
-                    return True
-        return False
-    def get_player_valid_moves(self) -> List[Position]:
-        moves = []
-        directions = [
-            (-1, -1), (-1, 0), (-1, 1),
-            (0, -1),           (0, 1),
-            (1, -1),  (1, 0),  (1, 1)
+            self.ability_selected = None
+            self.speculate()
+        return changed
+
+    def build_scene(self, mouse_pos):
+        """รายการสิ่งที่ต้องวาดตามลำดับ: (key, rect, signature, ฟังก์ชันวาด)"""
+        visualizer = self.visualizer
+        state = self.state
+        cache = visualizer.cache
+        scene = []
+        # กล้องขยับ ทุกช่องบนจอเปลี่ยนหมด
+        if visualizer.follow(state.player.position):
+            self.dirty.invalidate()
+
+        if self.selected:
+            for move in self.valid_moves:
+                danger = state.is_attacked(move)
+                scene.append((("move", move.x, move.y), visualizer.square_rect(move), danger,
+                              lambda move=move, danger=danger: visualizer.draw_valid_moves([move], [danger])))
+
+        player_pos = state.player.position
+        scene.append((("player",), visualizer.square_rect(player_pos), (player_pos.x, player_pos.y),
+                      lambda: visualizer.draw_piece(player_pos, "P", True)))
+        for i, piece in enumerate(state.ai_pieces):
+            pos, letter = piece.position, piece.piece_type.name[0]
+            if not visualizer.is_visible(pos):
+                continue
+            scene.append((("ai", i), visualizer.square_rect(pos), (pos.x, pos.y, letter),
+                          lambda pos=pos, letter=letter: visualizer.draw_piece(pos, letter, False)))
+
+        # แสดงข้อมูลผู้เล่น
+        hud = [
+            f"HP: {state.player.hp}",
+            f"Score: {state.score}",
+            f"Level: {state.current_level}" if state.max_level is None
+            else f"Level: {state.current_level}/{state.max_level}",
         ]
-        
-        for dx, dy in directions:
-            new_x = self.player.position.x + dx
-            new_y = self.player.position.y + dy
-            if 0 <= new_x < 8 and 0 <= new_y < 8:
-                moves.append(Position(new_x, new_y))
-        return moves
+        for i, message in enumerate(hud):
+            text = cache.text(message, 36, (0, 0, 0))
+            rect = text.get_rect(topleft=(10, 10 + i * 40))
+            scene.append((("hud", i), rect, message,
+                          lambda text=text, rect=rect: visualizer.screen.blit(text, rect)))
+
+        # กระดานใหญ่กว่าจอ หมากส่วนใหญ่อยู่นอกกล้อง บอกจำนวนที่เหลือไว้ที่แถบล่าง
+        if state.board_size > visualizer.view_squares:
+            message = f"Enemies: {len(state.ai_pieces)}"
+            text = cache.text(message, 24, (0, 0, 0))
+            rect = text.get_rect(topright=(visualizer.window_size - 10, visualizer.window_size + 20))
+            scene.append((("enemies",), rect, message,
+                          lambda: visualizer.screen.blit(text, rect)))
+
+        if self.show_thinking:
+            text = cache.text("AI thinking...", 24, (0, 0, 0))
+            rect = text.get_rect(topleft=(10, visualizer.window_size + 20))
+            scene.append((("thinking",), rect, None,
+                          lambda: visualizer.screen.blit(text, rect)))
+
+        # เวลาต่อเฟรมและเวลาคิดของ AI (F3)
+        if self.show_profile:
+            for i, message in enumerate(self.profile_lines()):
+                text = cache.text(message, 24, (0, 0, 0))
+                rect = text.get_rect(topleft=(220, 10 + i * 24))
+                scene.append((("profile", i), rect, message,
+                              lambda text=text, rect=rect: visualizer.screen.blit(text, rect)))
+
+        # ปุ่มความสามารถ
+        for i, ability in enumerate(state.player.abilities):
+            rect = pygame.Rect(10, 130 + i*40, 100, 30)
+            scene.append((("ability", i), rect, (ability, self.ability_selected == ability),
+                          lambda i=i, ability=ability: self.draw_ability(i, ability)))
+
+        # ปุ่ม Restart
+        hover = visualizer.button_rect.collidepoint(mouse_pos)
+        scene.append((("button",), visualizer.button_rect, hover,
+                      lambda: visualizer.draw_button(mouse_pos)))
+
+        # แสดงข้อความเมื่อจบเกม
+        if state.game_over:
+            if state.victory:
+                message = "Victory! All levels completed!"
+                color = (0, 255, 0)  # สีเขียว
+            else:
+                message = "Game Over! Click Restart to try again"
+                color = (255, 0, 0)  # สีแดง
+            game_over_text = cache.text(message, 36, color)
+            text_rect = game_over_text.get_rect(center=(visualizer.window_size // 2, visualizer.window_size // 2))
+            scene.append((("game_over",), text_rect, message,
+                          lambda: visualizer.screen.blit(game_over_text, text_rect)))
+        return scene
+
+    def profile_lines(self) -> List[str]:
+        lines = []
+        for name, label in (("frame", "frame"), ("ai", "AI")):
+            histogram = self.profiler.get(name)
+            if histogram is None or not histogram.count:
+                lines.append(f"{label}: -")
+                continue
+            lines.append(f"{label}: p50 {histogram.percentile(50) * 1000:.1f} ms  "
+                         f"p99 {histogram.percentile(99) * 1000:.1f} ms")
+        worker = self.worker
+        if worker.hits or worker.misses:
+            lines.append(f"AI precomputed: {worker.hits}/{worker.hits + worker.misses}")
+        cache = self.reply_cache
+        if cache.hits or cache.misses:
+            lines.append(f"AI cache: {cache.hits}/{cache.hits + cache.misses} ({len(cache)} positions)")
+        return lines
+
+    def toggle_profile(self):
+        self.show_profile = not self.show_profile
+        self.profiler.enabled = self.show_profile or self.profile_path is not None
+        self.scheduler.request_redraw()
+
+    def save_profile(self):
+        if self.profile_path:
+            self.profiler.dump(self.profile_path)
+
+    def draw_frame(self, mouse_pos):
+        """วาดหนึ่งเฟรม ถ้าเปิด dirty_rects จะวาดและอัปเดตจอเฉพาะส่วนที่เปลี่ยน"""
+        profiler = self.profiler
+        screen = self.visualizer.screen
+        with profiler.time("scene"):
+            scene = self.build_scene(mouse_pos)
+            dirty = None
+            if self.dirty_rects:
+                dirty = self.dirty.diff({key: (rect, signature) for key, rect, signature, _ in scene})
+
+        if dirty is None:
+            with profiler.time("draw"):
+                self.visualizer.draw_board()
+                for _, _, _, draw in scene:
+                    draw()
+            with profiler.time("flip"):
+                pygame.display.flip()
+            return
+
+        with profiler.time("draw"):
+            for area in dirty:
+                screen.set_clip(area)
+                self.visualizer.draw_board(area)
+                for _, rect, _, draw in scene:
+                    if rect.colliderect(area):
+                        draw()
+            screen.set_clip(None)
+        if dirty:
+            with profiler.time("flip"):
+                pygame.display.update(dirty)
+
     def run(self):
         running = True
+        hover = False
         while running:
+            events = self.scheduler.events()
+            frame_start = time.perf_counter()  # ไม่นับเวลาที่รอ event
             mouse_pos = pygame.mouse.get_pos()
-            
-            for event in pygame.event.get():
+
+            # เมาส์ขยับเฉย ๆ วาดใหม่เฉพาะตอนที่เข้า/ออกจากปุ่ม Restart
+            if self.visualizer.is_button_clicked(mouse_pos) != hover:
+                hover = not hover
+                self.scheduler.request_redraw()
+
+            running = self.handle_events(events, mouse_pos)
+            self.poll_ai()
+
+            # เวลาต่อเฟรมไม่นับเวลาที่หน่วงรอตาม fps ใน frame_due()
+            work = time.perf_counter() - frame_start
+            if self.scheduler.frame_due():
+                draw_start = time.perf_counter()
+                self.draw_frame(mouse_pos)
+                self.profiler.record("frame", work + time.perf_counter() - draw_start)
+
+        self.cancel_ai()
+        self.worker.shutdown()
+        self.reply_cache.save()
+        if self.levels is not None:
+            self.levels.close()
+            self.levels.save()
+        self.save_profile()
+        if self.recorder is not None:
+            self.recorder.close()
+        pygame.quit()
+
+    def handle_events(self, events, mouse_pos) -> bool:
+        """จัดการ event ของรอบนี้ คืนค่า False เมื่อปิดหน้าต่าง"""
+        running = True
+        with self.profiler.time("input"):
+            state = self.state
+            for event in events:
                 if event.type == pygame.QUIT:
                     running = False
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.dirty.invalidate()
+                    self.scheduler.request_redraw()
+                elif event.type == AI_THINKING:
+                    # AI_DONE ไม่ต้องทำอะไรที่นี่ แค่ปลุก loop ให้ไปเรียก poll_ai()
+                    if self.pending_action is not None:
+                        self.show_thinking = True
+                        self.scheduler.request_redraw()
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    self.toggle_profile()
+                elif event.type == pygame.KEYDOWN and event.mod & pygame.KMOD_CTRL:
+                    # Ctrl+Z ย้อน, Ctrl+Y หรือ Ctrl+Shift+Z ทำซ้ำ
+                    if event.key == pygame.K_z:
+                        redo = bool(event.mod & pygame.KMOD_SHIFT)
+                    elif event.key == pygame.K_y:
+                        redo = True
+                    else:
+                        continue
+                    if self.undo(redo):
+                        self.scheduler.request_redraw()
                 elif event.type == pygame.MOUSEBUTTONDOWN:
+                    self.scheduler.request_redraw()
                     if event.button == 1:  # คลิกซ้าย
                         # เช็คการคลิกปุ่ม Restart
                         if self.visualizer.is_button_clicked(mouse_pos):
                             self.reset_game()
                             continue
 
-                        if not self.game_over and not self.level_complete:
+                        # ระหว่างที่ AI คิดกดได้แค่ Restart
+                        if (self.pending_action is None
+                                and not state.game_over and not state.level_complete):
                             clicked_pos = self.visualizer.get_square_from_mouse(event.pos)
                             
                             # จัดการการคลิกความสามารถ
@@ -538,83 +604,90 @@ class Game:
                                 continue
                                 
                             if not self.selected:
-                                if clicked_pos.x == self.player.position.x and clicked_pos.y == self.player.position.y:
+                                if clicked_pos.x == state.player.position.x and clicked_pos.y == state.player.position.y:
                                     self.selected = True
-                                    self.valid_moves = self.get_player_valid_moves()
+                                    self.valid_moves = state.get_player_valid_moves()
                             else:
-                                if self.handle_move(clicked_pos):
-                                    # AI's turn
-                                    ai_moves = self.ai.choose_moves(self.ai_pieces, self.player)
-                                    for piece, move in zip(self.ai_pieces, ai_moves):
-                                        if move:
-                                            piece.position = move
-                                            if move.x == self.player.position.x and move.y == self.player.position.y:
-                                                if self.player.shield_active:
-                                                    self.player.shield_active = False
-                                                    print("Shield blocked the attack!")
-                                                else:
-                                                    self.player.hp -= 1
-                                                    print(f"Player hit! HP: {self.player.hp}")
-                                                    if self.player.hp <= 0:
-                                                        print("Game Over!")
-                                                        self.game_over = True
-                                                    else:
-                                                        self.player.position = Position(4, 7)
-                                    
-                                    self.player.moves_remaining = 1
-                                    if self.ability_selected == PlayerAbilities.EXTRA_MOVE:
-                                        self.player.use_ability(PlayerAbilities.EXTRA_MOVE)
-                                
+                                self.handle_move(clicked_pos)
                                 self.selected = False
                                 self.valid_moves = []
-                                
-                                # เช็คว่าจบด่านหรือยัง
-                                self.check_level_complete()
-
-            # วาดกราฟิก
-            self.visualizer.screen.fill((255, 255, 255))
-            self.visualizer.draw_board()
-            if self.selected:
-                self.visualizer.draw_valid_moves(self.valid_moves)
-            
-            self.visualizer.draw_piece(self.player.position, "P", True)
-            
-            for piece in self.ai_pieces:
-                self.visualizer.draw_piece(piece.position, piece.piece_type.name[0], False)
-            
-            # แสดงข้อมูลผู้เล่น
-            font = pygame.font.Font(None, 36)
-            hp_text = font.render(f"HP: {self.player.hp}", True, (0, 0, 0))
-            score_text = font.render(f"Score: {self.score}", True, (0, 0, 0))
-            level_text = font.render(f"Level: {self.current_level}/5", True, (0, 0, 0))
-            
-            self.visualizer.screen.blit(hp_text, (10, 10))
-            self.visualizer.screen.blit(score_text, (10, 50))
-            self.visualizer.screen.blit(level_text, (10, 90))
-            
-            # วาดปุ่มความสามารถ
-            self.draw_abilities()
-            
-            # วาดปุ่ม Restart
-            self.visualizer.draw_button(mouse_pos)
-            
-            # แสดงข้อความเมื่อจบเกม
-            if self.game_over:
-                if self.victory:
-                    message = "Victory! All levels completed!"
-                    color = (0, 255, 0)  # สีเขียว
-                else:
-                    message = "Game Over! Click Restart to try again"
-                    color = (255, 0, 0)  # สีแดง
-                game_over_text = font.render(message, True, color)
-                text_rect = game_over_text.get_rect(center=(self.visualizer.window_size // 2, self.visualizer.window_size // 2))
-                self.visualizer.screen.blit(game_over_text, text_rect)
-            
-            pygame.display.flip()
-
+        return running
+
+    def play_replay(self, path: str, speed: float = 2.0):
+        """เล่นไฟล์ replay ในหน้าต่าง speed ตาต่อวินาที ตรวจ hash ทุกตาเหมือนแบบไม่มีหน้าจอ
+
+        ตาของ AI มาจากไฟล์ worker จึงไม่ต้องคิดอะไร สร้าง Game ด้วย speculate=False
+        ไม่งั้นจะเริ่มคิดตาตอบล่วงหน้าของเกมที่ถูกแทนที่ด้วย replay
+        """
+        player = ReplayPlayer(path)
+        player.state.log = print
+        player.state.profiler = self.profiler
+        self.state = player.state
+        self.visualizer.set_board_size(player.state.board_size)
+        self.dirty.invalidate()
+        pygame.time.set_timer(REPLAY_STEP, max(1, int(1000 / speed)))
+        running = True
+        while running:
+            events = self.scheduler.events()
+            frame_start = time.perf_counter()
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.dirty.invalidate()
+                    self.scheduler.request_redraw()
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    self.toggle_profile()
+                elif event.type == REPLAY_STEP:
+                    try:
+                        record = player.step()
+                    except ReplayDivergence as error:
+                        print(f"Replay diverged: {error}")
+                        pygame.display.set_caption("Replay diverged")
+                        record = None
+                    if record is None:
+                        pygame.time.set_timer(REPLAY_STEP, 0)
+                    self.scheduler.request_redraw()
+            work = time.perf_counter() - frame_start
+            if self.scheduler.frame_due():
+                draw_start = time.perf_counter()
+                self.draw_frame(pygame.mouse.get_pos())
+                self.profiler.record("frame", work + time.perf_counter() - draw_start)
+        player.close()
+        self.cancel_ai()
+        self.worker.shutdown()
+        self.save_profile()
         pygame.quit()
 
 
 if __name__ == "__main__":
-    game = Game()
-    game.run()
+    parser = argparse.ArgumentParser(description="Moodeng chess")
+    parser.add_argument("--seed", type=int, help="seed of the game's random numbers")
+    parser.add_argument("--board-size", type=int, default=8,
+                        help="squares per side, 8-64 (bigger boards get waves of enemies)")
+    parser.add_argument("--record", help="write a replay of this game to the file")
+    parser.add_argument("--replay", help="watch a recorded replay instead of playing")
+    parser.add_argument("--speed", type=float, default=2.0, help="replay turns per second")
+    parser.add_argument("--no-speculate", action="store_true",
+                        help="do not precompute AI replies while the player is choosing")
+    parser.add_argument("--ai-cache", help="keep the AI's replies in this file between games")
+    parser.add_argument("--endless", action="store_true",
+                        help="keep going after the last level with generated levels")
+    parser.add_argument("--level-cache", help="keep the generated levels in this file between games")
+    parser.add_argument("--profile", help="time each part of the loop and write a JSON summary "
+                                          "to the file on exit (F3 shows it on screen)")
+    args = parser.parse_args()
+    if args.seed is not None and not 0 <= args.seed < SEED_LIMIT:
+        parser.error(f"--seed must be 0-{SEED_LIMIT - 1}")
+    # ตรวจก่อนสร้าง Game เพราะหน้าต่างถูกเปิดก่อนที่ GameState จะตรวจขนาดกระดาน
+    if not MIN_BOARD_SIZE <= args.board_size <= MAX_BOARD_SIZE:
+        parser.error(f"--board-size must be {MIN_BOARD_SIZE}-{MAX_BOARD_SIZE}")
+
+    if args.replay:
+        Game(profile=args.profile, speculate=False).play_replay(args.replay, args.speed)
+    else:
+        game = Game(seed=args.seed, record=args.record, profile=args.profile,
+                    speculate=not args.no_speculate, ai_cache=args.ai_cache,
+                    board_size=args.board_size, endless=args.endless,
+                    level_cache=args.level_cache)
+        game.run()
\ No newline at end of file
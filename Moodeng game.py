@@ -2,6 +2,9 @@ import pygame
 import random
 from enum import Enum
 
+from moodeng_bitboard import Occupancy, ThreatMap, iter_squares, square
+from moodeng_render import FrameScheduler
+
 # Initialize Pygame
 pygame.init()
 
@@ -15,6 +18,8 @@ GRAY = (128, 128, 128)
 RED = (255, 0, 0)
 BLUE = (0, 0, 255)
 GREEN = (0, 255, 0)
+ORANGE = (255, 140, 0)
+FPS = 60  # Frame cap while something is animating
 
 class PieceType(Enum):
     PLAYER = "P"
@@ -35,22 +40,28 @@ class Game:
     def __init__(self):
         self.screen = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE))
         pygame.display.set_caption("Chess Demo")
-        self.board = [[None for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
+        # Square index -> pieces, updated on every move instead of rescanning
+        self.board = Occupancy(BOARD_SIZE)
+        # Squares the AI pieces can reach next turn (they all step like a king here)
+        self.threats = ThreatMap(BOARD_SIZE)
         self.player = None
         self.ai_pieces = []
         self.player_hp = 3
         self.selected = False
         self.valid_moves = []
+        # Only redraw when something changed, otherwise block waiting for events
+        self.scheduler = FrameScheduler(FPS)
         self.reset_game()
 
     def reset_game(self):
         # Clear board
-        self.board = [[None for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
+        self.board.clear()
+        self.threats.clear()
         self.ai_pieces = []
 
         # Set player
         self.player = Piece(PieceType.PLAYER, 4, 7, True)
-        self.board[self.player.y][self.player.x] = self.player
+        self.board.add(square(self.player.x, self.player.y), self.player)
 
         # Set AI pieces (simplified setup)
         ai_setups = [
@@ -62,7 +73,8 @@ class Game:
         for piece_type, x, y in ai_setups:
             piece = Piece(piece_type, x, y)
             self.ai_pieces.append(piece)
-            self.board[y][x] = piece
+            self.board.add(square(x, y), piece)
+            self.threats.add(piece, "KING", square(x, y), self.board.mask)
 
     def get_valid_moves(self, piece):
         moves = []
@@ -86,19 +98,18 @@ class Game:
                                   (x * SQUARE_SIZE, y * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
 
     def draw_pieces(self):
-        for y in range(BOARD_SIZE):
-            for x in range(BOARD_SIZE):
-                piece = self.board[y][x]
-                if piece:
-                    color = BLUE if piece.is_player else RED
-                    pygame.draw.circle(self.screen, color,
-                                    (x * SQUARE_SIZE + SQUARE_SIZE//2,
-                                     y * SQUARE_SIZE + SQUARE_SIZE//2),
-                                    SQUARE_SIZE//3)
+        for sq, piece in self.board.items():
+            x, y = sq % BOARD_SIZE, sq // BOARD_SIZE
+            color = BLUE if piece.is_player else RED
+            pygame.draw.circle(self.screen, color,
+                            (x * SQUARE_SIZE + SQUARE_SIZE//2,
+                             y * SQUARE_SIZE + SQUARE_SIZE//2),
+                            SQUARE_SIZE//3)
 
     def draw_valid_moves(self):
         for x, y in self.valid_moves:
-            pygame.draw.circle(self.screen, GREEN,
+            color = ORANGE if self.threats.is_attacked(square(x, y)) else GREEN
+            pygame.draw.circle(self.screen, color,
                             (x * SQUARE_SIZE + SQUARE_SIZE//2,
                              y * SQUARE_SIZE + SQUARE_SIZE//2),
                             SQUARE_SIZE//8)
@@ -116,9 +127,9 @@ class Game:
             
             if possible_moves:
                 new_x, new_y = random.choice(possible_moves)
-                self.board[piece.y][piece.x] = None
+                self.board.move(piece, square(piece.x, piece.y), square(new_x, new_y))
+                self.threats.move(piece, square(new_x, new_y), self.board.mask)
                 piece.x, piece.y = new_x, new_y
-                self.board[new_y][new_x] = piece
 
                 # Check if AI captured player
                 if self.player.x == new_x and self.player.y == new_y:
@@ -131,45 +142,38 @@ class Game:
         return False
 
     def respawn_player(self):
-        safe_spots = []
-        for y in range(BOARD_SIZE):
-            for x in range(BOARD_SIZE):
-                if self.board[y][x] is None:
-                    is_safe = True
-                    for piece in self.ai_pieces:
-                        if abs(piece.x - x) <= 1 and abs(piece.y - y) <= 1:
-                            is_safe = False
-                            break
-                    if is_safe:
-                        safe_spots.append((x, y))
+        # Empty squares no AI piece can reach next turn
+        safe = self.threats.safe_squares() & ~self.board.mask
+        safe_spots = [(sq % BOARD_SIZE, sq // BOARD_SIZE) for sq in iter_squares(safe)]
         
         if safe_spots:
             new_x, new_y = random.choice(safe_spots)
-            self.board[self.player.y][self.player.x] = None
+            self.board.move(self.player, square(self.player.x, self.player.y), square(new_x, new_y))
             self.player.x, self.player.y = new_x, new_y
-            self.board[new_y][new_x] = self.player
 
     def run(self):
         running = True
         while running:
-            for event in pygame.event.get():
+            for event in self.scheduler.events():
                 if event.type == pygame.QUIT:
                     running = False
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.scheduler.request_redraw()
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     if event.button == 1:  # Left click
+                        self.scheduler.request_redraw()
                         x = event.pos[0] // SQUARE_SIZE
                         y = event.pos[1] // SQUARE_SIZE
                         
                         if not self.selected:
-                            if self.board[y][x] == self.player:
+                            if self.player in self.board.pieces_at(square(x, y)):
                                 self.selected = True
                                 self.valid_moves = self.get_valid_moves(self.player)
                         else:
                             if (x, y) in self.valid_moves:
                                 # Move player
-                                self.board[self.player.y][self.player.x] = None
+                                self.board.move(self.player, square(self.player.x, self.player.y), square(x, y))
                                 self.player.x, self.player.y = x, y
-                                self.board[y][x] = self.player
                                 self.selected = False
                                 self.valid_moves = []
                                 
@@ -180,11 +184,12 @@ class Game:
                             self.selected = False
                             self.valid_moves = []
 
-            self.draw_board()
-            if self.selected:
-                self.draw_valid_moves()
-            self.draw_pieces()
-            pygame.display.flip()
+            if self.scheduler.frame_due():
+                self.draw_board()
+                if self.selected:
+                    self.draw_valid_moves()
+                self.draw_pieces()
+                pygame.display.flip()
 
         pygame.quit()
 
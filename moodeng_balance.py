@@ -0,0 +1,249 @@
+"""จำลองเกมแบบไม่มีหน้าจอเพื่อวัดความยากของแต่ละด่าน
+
+    python moodeng_balance.py --games 1000 --levels 1-5 --policy flee --workers 8
+"""
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+import argparse
+import json
+import os
+import random
+import time
+
+from moodeng_core import ChessAI, PlayerAbilities, Position
+from moodeng_engine import Action, GameState, SEARCH_FROM_LEVEL
+
+Policy = Callable[[GameState, random.Random], Action]
+
+GAMES_PER_TASK = 50  # เกมต่อหนึ่งงานที่ส่งให้ process ลูก (ลดค่าใช้จ่ายในการส่งข้อมูล)
+
+
+def random_policy(state: GameState, rng: random.Random) -> Action:
+    """เดินแบบสุ่มไปช่องที่เดินได้"""
+    return Action(rng.choice(state.get_player_valid_moves()))
+
+
+def flee_policy(state: GameState, rng: random.Random) -> Action:
+    """กินหมากที่ไม่มีใครคุ้มกันก่อน ไม่งั้นหนีไปช่องที่ไม่ถูกโจมตี ถ้าติดมุมก็ใช้ TELEPORT"""
+    ai = state.ai
+    size = ai.board_size
+    occupied = ai.get_occupancy(state.ai_pieces, state.player)
+    attacked = 0
+    for piece in state.ai_pieces:
+        attacked |= ai.get_move_mask(piece, occupied)
+    occupied_by_ai = occupied & ~(1 << (state.player.position.y * size + state.player.position.x))
+
+    moves = state.get_player_valid_moves()
+    rng.shuffle(moves)
+    safe = [move for move in moves if not attacked >> (move.y * size + move.x) & 1]
+    captures = [move for move in safe if occupied_by_ai >> (move.y * size + move.x) & 1]
+    if captures:
+        return Action(captures[0])
+    if safe:
+        return Action(safe[0])
+    if PlayerAbilities.TELEPORT in state.player.abilities:
+        free = [sq for sq in range(size * size) if not (attacked | occupied) >> sq & 1]
+        if free:
+            sq = rng.choice(free)
+            return Action(Position(sq % size, sq // size), PlayerAbilities.TELEPORT)
+    return Action(moves[0])
+
+
+POLICIES: Dict[str, Policy] = {
+    "random": random_policy,
+    "flee": flee_policy,
+}
+
+
+@dataclass
+class GameResult:
+    level: int
+    ability: str
+    outcome: str  # "win", "loss" หรือ "timeout"
+    turns: int
+    hp_loss: int
+
+
+@dataclass
+class LevelStats:
+    """ผลรวมของหลายเกม เก็บเป็น Counter เพื่อรวมข้ามหลาย process ได้ง่าย"""
+    games: int = 0
+    outcomes: Counter = field(default_factory=Counter)
+    turns_to_death: Counter = field(default_factory=Counter)
+    hp_loss: Counter = field(default_factory=Counter)
+
+    def add(self, result: GameResult):
+        self.games += 1
+        self.outcomes[result.outcome] += 1
+        self.hp_loss[result.hp_loss] += 1
+        if result.outcome == "loss":
+            self.turns_to_death[result.turns] += 1
+
+    def merge(self, other: "LevelStats"):
+        self.games += other.games
+        self.outcomes.update(other.outcomes)
+        self.turns_to_death.update(other.turns_to_death)
+        self.hp_loss.update(other.hp_loss)
+
+    def summary(self) -> dict:
+        return {
+            "games": self.games,
+            "win_rate": self.outcomes["win"] / self.games if self.games else 0.0,
+            "outcomes": dict(self.outcomes),
+            "turns_to_death": _percentiles(self.turns_to_death),
+            "hp_loss": {str(k): v for k, v in sorted(self.hp_loss.items())},
+        }
+
+
+def _percentiles(counts: Counter, points=(10, 50, 90)) -> dict:
+    """เปอร์เซ็นไทล์จาก histogram"""
+    total = sum(counts.values())
+    if not total:
+        return {}
+    result = {}
+    values = sorted(counts.items())
+    for point in points:
+        rank = point / 100 * (total - 1)
+        seen = 0
+        for value, count in values:
+            seen += count
+            if seen > rank:
+                result[f"p{point}"] = value
+                break
+    return result
+
+
+def make_state(rng: random.Random, ai_mode: str, search_depth: Optional[int]) -> GameState:
+    """สร้าง GameState ที่ผลออกมาเหมือนเดิมทุกครั้งสำหรับ seed เดียวกัน"""
+    search_from_level = SEARCH_FROM_LEVEL if ai_mode == "game" else None
+    state = GameState(ai=ChessAI(), search_from_level=search_from_level, rng=rng,
+                      keep_history=False)
+    # ไม่จำกัดเวลาคิด ให้ผลขึ้นกับ seed อย่างเดียว ไม่ขึ้นกับความเร็วเครื่อง
+    state.searcher.time_budget_ms = float("inf")
+    state.searcher.depth = search_depth
+    return state
+
+
+def play_game(level: int, seed: str, policy: Policy, max_turns: int,
+              ai_mode: str = "game", search_depth: Optional[int] = None) -> GameResult:
+    """เล่นหนึ่งด่านจนชนะ แพ้ หรือครบ max_turns"""
+    rng = random.Random(seed)
+    state = make_state(rng, ai_mode, search_depth)
+    state.jump_to_level(level)
+    ability = state.player.abilities[-1].name if level > 1 else "NONE"
+    start_hp = state.player.hp
+
+    turns = 0
+    hp = start_hp
+    while turns < max_turns and not state.game_over and state.current_level == level:
+        # เก็บ HP ก่อนเดิน เพราะตอนผ่านด่านจะได้ HP เพิ่ม
+        hp = state.player.hp
+        state.step(policy(state, rng))
+        turns += 1
+
+    if state.current_level > level:
+        outcome = "win"
+    else:
+        outcome = "loss" if state.game_over else "timeout"
+        hp = state.player.hp
+    return GameResult(level, ability, outcome, turns, start_hp - hp)
+
+
+def run_task(task: Tuple[int, int, int, int, str, int, str, Optional[int]]
+             ) -> Dict[Tuple[int, str], LevelStats]:
+    """งานของ process ลูก: เล่นเกมหลายเกมในด่านเดียวแล้วคืนผลรวม"""
+    level, first_game, count, base_seed, policy_name, max_turns, ai_mode, search_depth = task
+    policy = POLICIES[policy_name]
+    stats: Dict[Tuple[int, str], LevelStats] = defaultdict(LevelStats)
+    for game in range(first_game, first_game + count):
+        result = play_game(level, f"{base_seed}:{level}:{game}", policy, max_turns,
+                           ai_mode, search_depth)
+        stats[(level, "ALL")].add(result)
+        stats[(level, result.ability)].add(result)
+    return dict(stats)
+
+
+def run_balance(levels: List[int], games: int, seed: int = 0, policy: str = "flee",
+                max_turns: int = 200, workers: Optional[int] = None,
+                ai_mode: str = "game", search_depth: Optional[int] = None
+                ) -> Dict[Tuple[int, str], LevelStats]:
+    """แบ่งเกมเป็นงานย่อยแล้วกระจายให้ทุก core"""
+    tasks = []
+    for level in levels:
+        for first_game in range(0, games, GAMES_PER_TASK):
+            count = min(GAMES_PER_TASK, games - first_game)
+            tasks.append((level, first_game, count, seed, policy, max_turns,
+                          ai_mode, search_depth))
+
+    totals: Dict[Tuple[int, str], LevelStats] = defaultdict(LevelStats)
+    if workers == 1:
+        for partial in map(run_task, tasks):
+            for key, stats in partial.items():
+                totals[key].merge(stats)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for partial in pool.map(run_task, tasks):
+                for key, stats in partial.items():
+                    totals[key].merge(stats)
+    return dict(totals)
+
+
+def format_report(totals: Dict[Tuple[int, str], LevelStats]) -> str:
+    lines = [f"{'level':>5} {'ability':<11} {'games':>7} {'win%':>6} "
+             f"{'death p10/p50/p90':>18} {'hp loss p50':>11}"]
+    for (level, ability), stats in sorted(totals.items(),
+                                          key=lambda item: (item[0][0], item[0][1] != "ALL", item[0][1])):
+        summary = stats.summary()
+        deaths = summary["turns_to_death"]
+        death_text = "/".join(str(deaths.get(p, "-")) for p in ("p10", "p50", "p90"))
+        hp_p50 = _percentiles(stats.hp_loss, (50,)).get("p50", "-")
+        lines.append(f"{level:>5} {ability:<11} {stats.games:>7} "
+                     f"{summary['win_rate'] * 100:>5.1f}% {death_text:>18} {hp_p50:>11}")
+    return "\n".join(lines)
+
+
+def _parse_levels(text: str) -> List[int]:
+    levels = []
+    for part in text.split(","):
+        if "-" in part:
+            low, high = part.split("-")
+            levels.extend(range(int(low), int(high) + 1))
+        else:
+            levels.append(int(part))
+    return levels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo level balancing for Moodeng chess")
+    parser.add_argument("--games", type=int, default=200, help="games per level")
+    parser.add_argument("--levels", default="1-5", help="e.g. 1-5 or 2,4")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="flee")
+    parser.add_argument("--max-turns", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--ai", choices=["game", "greedy"], default="game",
+                        help="game = same AI as the real game (search from level 4)")
+    parser.add_argument("--search-depth", type=int, default=None,
+                        help="fixed search depth (default: from difficulty level)")
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    totals = run_balance(_parse_levels(args.levels), args.games, args.seed, args.policy,
+                         args.max_turns, args.workers, args.ai, args.search_depth)
+    elapsed = time.perf_counter() - start
+    print(format_report(totals))
+    played = sum(stats.games for (_, ability), stats in totals.items() if ability == "ALL")
+    print(f"\n{played} games in {elapsed:.1f}s ({played / elapsed:.0f} games/s)")
+
+    if args.json:
+        report = {f"{level}:{ability}": stats.summary()
+                  for (level, ability), stats in sorted(totals.items())}
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""วัดความเร็วของการสร้างตาเดิน AI เกมทั้งเกม และการวาดหน้าจอ
+
+    python moodeng_bench.py --json bench.json                    # วัดทุกกลุ่ม เก็บผลเป็น JSON
+    python moodeng_bench.py --save-baseline bench_baseline.json  # เก็บเป็นค่าอ้างอิง
+    python moodeng_bench.py --baseline bench_baseline.json       # เทียบกับค่าอ้างอิง (exit 1 ถ้าช้าลง)
+    python moodeng_bench.py --groups micro --quick
+
+กลุ่ม micro วัด get_moves, _evaluate_move และ choose_moves ของทุกด่านใน Level.ai_setups
+กลุ่ม macro เล่นเกมเต็มด้วย seed คงที่ กลุ่ม render วาดหน้าจอแบบ offscreen (SDL dummy driver)
+กลุ่ม scale วัดตาของ AI บนกระดาน 8x8 ถึง 64x64 (คลื่นหมากของด่าน 1)
+"""
+from typing import Callable, Dict, Iterator, List, Tuple
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+from moodeng_balance import flee_policy, make_state
+from moodeng_core import ChessAI, Level, Player, PlayerAbilities, Position
+from moodeng_engine import GameState, start_position
+from moodeng_search import TranspositionTable
+
+Benchmark = Tuple[str, Callable[[], object]]
+
+GROUPS = ("micro", "macro", "render", "scale")
+SCALE_SIZES = (8, 16, 32, 64)
+ROLES = ["blocker", "attacker", "supporter"]
+# ตาราง TT เล็ก ๆ ของ benchmark choose_moves ล้างทุกครั้งให้งานเท่ากัน ตารางขนาดเกม (65536 ช่อง)
+# ใช้เวลาล้างมากกว่าตัวการค้นหาของด่านต้น ๆ
+BENCH_TT_BITS = 10
+V2_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Moodeng game v2.py")
+
+
+def measure(fn: Callable[[], object], min_time: float = 0.1, repeat: int = 5) -> Dict[str, float]:
+    """เวลาต่อครั้ง (µs): วนจนแต่ละรอบนานอย่างน้อย min_time แล้ววัดซ้ำ repeat รอบ"""
+    fn()  # อุ่นเครื่อง (cache ของหมากไถล ตารางระยะ font)
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    samples = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - start) / loops)
+    return {
+        "min_us": min(samples) * 1e6,
+        "median_us": statistics.median(samples) * 1e6,
+        "loops": loops,
+        "repeat": repeat,
+    }
+
+
+def _level_player() -> Player:
+    return Player(start_position(), hp=3, abilities=[PlayerAbilities.SHIELD])
+
+
+def micro_benchmarks() -> Iterator[Benchmark]:
+    """get_moves, _evaluate_move และ choose_moves บนตำแหน่งเริ่มของแต่ละด่าน"""
+    for level_number in sorted(Level(1).ai_setups):
+        level = Level(level_number)
+        player = _level_player()
+
+        for movegen in ("bitboard", "reference"):
+            ai = ChessAI(movegen=movegen)
+            pieces = level.get_ai_pieces()
+            occupied = ai.get_occupancy(pieces, player)
+
+            def get_moves(ai=ai, pieces=pieces, occupied=occupied):
+                for piece in pieces:
+                    ai.get_moves(piece, occupied)
+            name = "get_moves" if movegen == "bitboard" else "get_moves_reference"
+            yield f"{name}/level{level_number}", get_moves
+
+        ai = ChessAI()
+        pieces = level.get_ai_pieces()
+        occupied = ai.get_occupancy(pieces, player)
+        work = [(piece, move, ROLES[i % len(ROLES)])
+                for i, piece in enumerate(pieces) for move in ai.get_moves(piece, occupied)]
+
+        def evaluate(ai=ai, work=work, player=player):
+            for piece, move, role in work:
+                ai._evaluate_move(piece, move, player, role)
+        yield f"evaluate_move/level{level_number}", evaluate
+
+        # choose_moves ตามที่เกมตั้งค่าจริง (ด่านสูงใช้การค้นหา) แต่ไม่จำกัดเวลา ให้งานเท่ากันทุกครั้ง
+        state = make_state(random.Random(level_number), "game", None)
+        state.jump_to_level(level_number)
+        state.searcher.time_budget_ms = float("inf")
+        state.searcher.tt = TranspositionTable(BENCH_TT_BITS)
+
+        def choose(state=state):
+            state.searcher.tt.clear()
+            state.ai.choose_moves(state.ai_pieces, state.player)
+        yield f"choose_moves/level{level_number}", choose
+
+
+def macro_benchmarks(games: int = 20) -> Iterator[Benchmark]:
+    """เกมเต็มตั้งแต่ด่าน 1 ด้วย flee_policy และ seed คงที่"""
+    def play(games=games):
+        for game in range(games):
+            rng = random.Random(f"bench:{game}")
+            state = make_state(rng, "game", None)
+            turns = 0
+            while not state.game_over and turns < 300:
+                state.step(flee_policy(state, rng))
+                turns += 1
+    yield f"full_games/x{games}", play
+
+
+def render_benchmarks() -> Iterator[Benchmark]:
+    """วาดหน้าจอของเกม v2 บน surface offscreen"""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    if importlib.util.find_spec("pygame") is None:
+        print("pygame is not installed, skipping render benchmarks", file=sys.stderr)
+        return
+    spec = importlib.util.spec_from_file_location("moodeng_game_v2", V2_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    # ไม่ให้ AI คิดล่วงหน้าบน thread แยกระหว่างที่จับเวลาการวาด
+    game = module.Game(seed=0, speculate=False)
+    game.state.log = lambda message: None
+    game.state.jump_to_level(5)
+    visualizer = game.visualizer
+    state = game.state
+
+    def draw_board():
+        visualizer.draw_board()
+    yield "render/draw_board", draw_board
+
+    def draw_pieces():
+        visualizer.draw_piece(state.player.position, "P", True)
+        for piece in state.ai_pieces:
+            visualizer.draw_piece(piece.position, piece.piece_type.name[0], False)
+    yield "render/draw_pieces", draw_pieces
+
+    def full_frame():
+        game.dirty_rects = False
+        game.draw_frame((0, 0))
+    yield "render/frame_full", full_frame
+
+    # เฟรมที่ขยับหมากหนึ่งตัว (กรณีปกติของ dirty rect)
+    piece = state.ai_pieces[0]
+    squares = [Position(piece.position.x, piece.position.y),
+               Position(piece.position.x, piece.position.y + 1)]
+    flip = [0]
+
+    def dirty_frame():
+        game.dirty_rects = True
+        flip[0] ^= 1
+        piece.position = squares[flip[0]]
+        game.draw_frame((0, 0))
+    yield "render/frame_dirty", dirty_frame
+
+    # กระดาน 64x64 วาดเฉพาะช่องและหมากที่อยู่ในกล้อง
+    big = module.Game(seed=0, board_size=64, speculate=False)
+    big.state.log = lambda message: None
+
+    def big_frame():
+        big.dirty_rects = False
+        big.draw_frame((0, 0))
+    yield "render/frame_full_board64", big_frame
+
+    for finished in (game, big):
+        finished.worker.shutdown()
+
+
+def scale_benchmarks() -> Iterator[Benchmark]:
+    """choose_moves ของคลื่นหมากด่าน 1 ตามขนาดกระดาน (ไม่ใช้การค้นหา)"""
+    for size in SCALE_SIZES:
+        state = GameState(seed=0, search_from_level=None, board_size=size)
+
+        def choose(state=state):
+            state.ai.choose_moves(state.ai_pieces, state.player)
+        yield f"choose_moves/board{size}x{len(state.ai_pieces)}", choose
+
+
+def run(groups: List[str], quick: bool = False) -> Dict[str, Dict[str, float]]:
+    min_time, repeat = (0.02, 3) if quick else (0.1, 5)
+    sources = {
+        "micro": micro_benchmarks,
+        "macro": lambda: macro_benchmarks(5 if quick else 20),
+        "render": render_benchmarks,
+        "scale": scale_benchmarks,
+    }
+    results = {}
+    for group in groups:
+        for name, fn in sources[group]():
+            results[name] = measure(fn, min_time, repeat)
+            print(f"{name:<32} {results[name]['min_us']:>12.1f} µs", file=sys.stderr)
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float) -> Tuple[List[str], List[str]]:
+    """คืน (บรรทัดรายงาน, ชื่อที่ช้าลงเกิน threshold) เทียบด้วยเวลาที่ดีที่สุดของแต่ละตัว"""
+    lines = [f"{'benchmark':<32} {'baseline µs':>12} {'now µs':>12} {'change':>8}"]
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            lines.append(f"{name:<32} {'-':>12} {result['min_us']:>12.1f} {'new':>8}")
+            continue
+        change = result["min_us"] / old["min_us"] - 1
+        mark = ""
+        if change > threshold:
+            regressions.append(name)
+            mark = "  REGRESSION"
+        lines.append(f"{name:<32} {old['min_us']:>12.1f} {result['min_us']:>12.1f} "
+                     f"{change * 100:>+7.1f}%{mark}")
+    return lines, regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Moodeng chess benchmark suite")
+    parser.add_argument("--groups", default=",".join(GROUPS),
+                        help="comma separated: " + ", ".join(GROUPS))
+    parser.add_argument("--quick", action="store_true", help="shorter runs (noisier)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--save-baseline", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="slowdown that counts as a regression (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    groups = [group.strip() for group in args.groups.split(",") if group.strip()]
+    for group in groups:
+        if group not in GROUPS:
+            parser.error(f"unknown group {group!r}")
+
+    results = run(groups, args.quick)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        lines, regressions = compare(results, baseline, args.threshold)
+        print("\n".join(lines))
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold * 100:.0f}%")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,429 @@
+from functools import lru_cache
+from typing import Dict, Iterator, List, Tuple
+
+# บิตบอร์ด: ช่อง (x, y) คือบิตที่ y * size + x ของ int หนึ่งตัว (กระดาน 8x8 = 64 บิต ถึง 64x64 = 4096 บิต)
+
+PAWN_STEPS = [(0, 1), (1, 1), (-1, 1)]  # เดินหน้า 1 ช่อง และแนวทแยง
+KNIGHT_STEPS = [
+    (2, 1), (2, -1), (-2, 1), (-2, -1),
+    (1, 2), (1, -2), (-1, 2), (-1, -2)
+]
+KING_STEPS = [
+    (-1, -1), (-1, 0), (-1, 1),
+    (0, -1),           (0, 1),
+    (1, -1),  (1, 0),  (1, 1)
+]
+# ทิศของหมากที่เดินได้ไกล (ไถลไปจนกว่าจะชนหมากตัวอื่นหรือขอบกระดาน)
+ORTHOGONAL = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+DIAGONAL = [(1, 1), (-1, 1), (1, -1), (-1, -1)]
+SLIDER_DIRECTIONS = {
+    "ROOK": ORTHOGONAL,
+    "BISHOP": DIAGONAL,
+    "QUEEN": ORTHOGONAL + DIAGONAL,
+}
+# ตารางระยะที่เก็บไว้พร้อมกันได้ นับเป็นจำนวนช่องรวม (กระดาน 8x8 เก็บได้ทุกตาราง
+# กระดาน 64x64 ได้ 1024 ตาราง) เต็มแล้วล้างทิ้งทั้งหมด ตารางที่ใช้อยู่จะถูกคำนวณใหม่ทีละตัว
+DISTANCE_CACHE_SQUARES = 1 << 22
+# ผลของหมากไถลที่จำไว้ได้ (ทุกชนิดทุกช่องรวมกัน) นับเป็นจำนวนช่องรวมเหมือนตารางระยะ
+# เพราะ key และผลแต่ละตัวยาวเท่าจำนวนช่อง (กระดาน 8x8 จำได้ 65536 ผล กระดาน 64x64 ได้ 1024)
+# เต็มแล้วล้างทิ้งทั้งหมด
+SLIDER_CACHE_SQUARES = 1 << 22
+
+
+def square(x: int, y: int, size: int = 8) -> int:
+    """แปลงพิกัดเป็นเลขช่อง"""
+    return y * size + x
+
+
+def iter_squares(mask: int) -> Iterator[int]:
+    """ไล่เลขช่องของบิตที่เปิดอยู่ทีละตัว จากช่องเลขน้อยไปมาก"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def respawn_square(size: int, start: int, safe: int) -> int:
+    """จุดเกิดใหม่ของผู้เล่น: start ถ้าปลอดภัย (หรือไม่มีช่องปลอดภัยเลย)
+    ไม่งั้นช่องใน safe ที่ใกล้ start ที่สุดแบบระยะคิง (เท่ากันเลือกช่องเลขน้อย)
+
+    ใช้ทั้ง GameState.respawn_position และการค้นหาของ AI ให้ผู้เล่นเกิดใหม่ที่เดียวกัน
+    """
+    if not safe or safe >> start & 1:
+        return start
+    x, y = start % size, start // size
+    return min(iter_squares(safe), key=lambda sq: max(abs(sq % size - x), abs(sq // size - y)))
+
+
+class MoveTables:
+    """ตารางการเดินที่คำนวณไว้ล่วงหน้าสำหรับกระดานขนาด size x size"""
+
+    def __init__(self, size: int = 8):
+        self.size = size
+        self.num_squares = size * size
+        self.full = (1 << self.num_squares) - 1
+        self.pawn = self._step_table(PAWN_STEPS)
+        self.knight = self._step_table(KNIGHT_STEPS)
+        self.king = self._step_table(KING_STEPS)
+        self.by_type: Dict[str, List[int]] = {
+            "PAWN": self.pawn,
+            "KNIGHT": self.knight,
+            "KING": self.king,
+        }
+        # rays[(dx, dy)][sq] = ทุกช่องในทิศนั้นจนถึงขอบกระดาน
+        self.rays: Dict[Tuple[int, int], List[int]] = {
+            direction: self._ray_table(direction)
+            for direction in ORTHOGONAL + DIAGONAL
+        }
+        # ช่องที่มีผลต่อการเดินของหมากไถล (ไม่รวมช่องสุดขอบ) ใช้เป็น key ของ cache
+        self.relevant: Dict[str, List[int]] = {
+            name: self._relevant_table(directions)
+            for name, directions in SLIDER_DIRECTIONS.items()
+        }
+        self._slider_cache: Dict[str, List[Dict[int, int]]] = {
+            name: [{} for _ in range(self.num_squares)]
+            for name in SLIDER_DIRECTIONS
+        }
+        self.max_slider_entries = max(1, SLIDER_CACHE_SQUARES // self.num_squares)
+        self._slider_entries = 0
+        self._slider_used: List[Dict[int, int]] = []  # dict ที่มีผลอยู่ ล้างเฉพาะพวกนี้
+        # เบี้ยเดินทางเดียว การค้นย้อนจากเป้าหมายจึงต้องใช้ตารางกลับทิศ
+        self.reverse_pawn = self._step_table([(-dx, -dy) for dx, dy in PAWN_STEPS])
+        # ระยะที่เดินไปไม่ถึง (เช่นเบี้ยที่อยู่ต่ำกว่าเป้าหมาย)
+        self.unreachable = 2 * size
+        self.max_distance_tables = max(1, DISTANCE_CACHE_SQUARES // self.num_squares)
+        self._distance_cache: Dict[Tuple[str, int], List[int]] = {}
+
+    def _step_table(self, steps: List[Tuple[int, int]]) -> List[int]:
+        table = []
+        size = self.size
+        for sq in range(self.num_squares):
+            x, y = sq % size, sq // size
+            mask = 0
+            for dx, dy in steps:
+                new_x, new_y = x + dx, y + dy
+                if 0 <= new_x < size and 0 <= new_y < size:
+                    mask |= 1 << (new_y * size + new_x)
+            table.append(mask)
+        return table
+
+    def _ray_table(self, direction: Tuple[int, int]) -> List[int]:
+        """ray ของช่อง sq = ช่องถัดไป + ray ของช่องถัดไป (สร้างจากปลายทางย้อนมา ไม่ต้องไล่ทีละช่องจนถึงขอบ)"""
+        dx, dy = direction
+        size = self.size
+        table = [0] * self.num_squares
+        squares = range(self.num_squares)
+        for sq in reversed(squares) if self._is_forward(direction) else squares:
+            x, y = sq % size + dx, sq // size + dy
+            if 0 <= x < size and 0 <= y < size:
+                following = y * size + x
+                table[sq] = 1 << following | table[following]
+        return table
+
+    def _relevant_table(self, directions: List[Tuple[int, int]]) -> List[int]:
+        table = []
+        for sq in range(self.num_squares):
+            mask = 0
+            for direction in directions:
+                ray = self.rays[direction][sq]
+                if ray:
+                    # ช่องสุดท้ายของ ray ไม่มีผล เพราะจะเดินไปถึงได้อยู่แล้ว
+                    if self._is_forward(direction):
+                        last = ray.bit_length() - 1
+                    else:
+                        last = (ray & -ray).bit_length() - 1
+                    mask |= ray & ~(1 << last)
+            table.append(mask)
+        return table
+
+    def _is_forward(self, direction: Tuple[int, int]) -> bool:
+        """ทิศที่เลขช่องเพิ่มขึ้น"""
+        dx, dy = direction
+        return dy * self.size + dx > 0
+
+    def slide(self, type_name: str, sq: int, occupied: int) -> int:
+        """ช่องที่หมากไถลเดินได้ หยุดที่หมากตัวแรกที่ขวาง (รวมช่องนั้น)"""
+        key = occupied & self.relevant[type_name][sq]
+        cache = self._slider_cache[type_name][sq]
+        attacks = cache.get(key)
+        if attacks is None:
+            attacks = 0
+            for direction in SLIDER_DIRECTIONS[type_name]:
+                ray = self.rays[direction][sq]
+                blockers = ray & key
+                if blockers:
+                    if self._is_forward(direction):
+                        blocker = (blockers & -blockers).bit_length() - 1
+                    else:
+                        blocker = blockers.bit_length() - 1
+                    ray ^= self.rays[direction][blocker]
+                attacks |= ray
+            if self._slider_entries >= self.max_slider_entries:
+                self.clear_slider_cache()
+            if not cache:
+                self._slider_used.append(cache)
+            self._slider_entries += 1
+            cache[key] = attacks
+        return attacks
+
+    def clear_slider_cache(self):
+        """ทิ้งผลของหมากไถลที่จำไว้ทั้งหมด"""
+        for cache in self._slider_used:
+            cache.clear()
+        self._slider_used.clear()
+        self._slider_entries = 0
+
+    def moves(self, type_name: str, sq: int, occupied: int = 0) -> int:
+        """mask ของช่องที่หมากชนิดนี้เดินไปได้จากช่อง sq"""
+        table = self.by_type.get(type_name)
+        if table is not None:
+            return table[sq]
+        if type_name in SLIDER_DIRECTIONS:
+            return self.slide(type_name, sq, occupied)
+        return 0
+
+
+    def reverse_moves(self, type_name: str, sq: int, occupied: int = 0) -> int:
+        """mask ของช่องที่หมากชนิดนี้เดินมาถึง sq ได้ในหนึ่งตา"""
+        if type_name == "PAWN":
+            return self.reverse_pawn[sq]
+        # อัศวิน คิง และหมากไถล เดินไป-กลับได้เหมือนกัน
+        return self.moves(type_name, sq, occupied)
+
+    def bfs_distances(self, type_name: str, target: int,
+                      occupied: int = 0) -> Tuple[List[int], int]:
+        """จำนวนตาที่น้อยที่สุดจากทุกช่องถึง target ตามการเดินจริงของหมาก
+
+        คืน (ระยะของทุกช่อง, mask ของช่องที่ถ้ามีหมากเข้า/ออกแล้วระยะอาจเปลี่ยน)
+        """
+        distances = [self.unreachable] * self.num_squares
+        distances[target] = 0
+        relevant = self.relevant.get(type_name)
+        depends = 0
+        visited = frontier = 1 << target
+        depth = 0
+        while frontier:
+            depth += 1
+            reached = 0
+            remaining = self.full & ~visited
+            for sq in iter_squares(frontier):
+                reached |= self.reverse_moves(type_name, sq, occupied)
+                if relevant is not None:
+                    depends |= relevant[sq]
+                if reached & remaining == remaining:
+                    # ถึงทุกช่องแล้ว (เช่นควีนบนกระดานโล่งใช้ไม่กี่ช่องก็ครบ)
+                    # ช่องที่เหลือใน frontier จะมีหมากหรือไม่ก็ไม่ทำให้ระยะเปลี่ยน
+                    break
+            frontier = reached & ~visited
+            visited |= frontier
+            for sq in iter_squares(frontier):
+                distances[sq] = depth
+        return distances, depends
+
+    def distances(self, type_name: str, target: int) -> List[int]:
+        """ระยะบนกระดานว่างถึง target (คำนวณครั้งแรกที่ใช้ แล้วเก็บไว้)"""
+        key = (type_name, target)
+        table = self._distance_cache.get(key)
+        if table is None:
+            if len(self._distance_cache) >= self.max_distance_tables:
+                self._distance_cache.clear()
+            table = self.bfs_distances(type_name, target)[0]
+            self._distance_cache[key] = table
+        return table
+
+
+@lru_cache(maxsize=None)
+def get_tables(size: int = 8) -> MoveTables:
+    """สร้างตารางครั้งเดียวต่อขนาดกระดาน"""
+    return MoveTables(size)
+
+
+class DistanceField:
+    """ระยะ (จำนวนตา) จากทุกช่องถึงเป้าหมายของหมากหนึ่งชนิด โดยคิดหมากที่ขวางทางด้วย
+
+    เมื่อ occupancy เปลี่ยน จะคำนวณใหม่เฉพาะเมื่อช่องที่เปลี่ยนมีผลกับระยะจริง ๆ
+    (หมากกระโดดไม่เคยต้องคำนวณใหม่ หมากไถลคำนวณใหม่เมื่อมีหมากเข้าออกในแนวที่ใช้)
+    """
+
+    def __init__(self, tables: MoveTables, type_name: str, target: int, occupied: int = 0):
+        self.tables = tables
+        self.type_name = type_name
+        self.target = target
+        self.occupied = occupied
+        self.distances, self.depends = tables.bfs_distances(type_name, target, occupied)
+
+    def update(self, occupied: int) -> bool:
+        """ปรับตาม occupancy ใหม่ คืนค่า True ถ้าต้องคำนวณระยะใหม่"""
+        changed = occupied ^ self.occupied
+        self.occupied = occupied
+        if not changed & self.depends:
+            return False
+        self.distances, self.depends = self.tables.bfs_distances(
+            self.type_name, self.target, occupied)
+        return True
+
+
+class Occupancy:
+    """ดัชนีช่อง -> หมาก ที่อัปเดตทีละการเดิน ใช้ถามว่าช่องไหนมีหมากได้ใน O(1)
+
+    ช่องเดียวอาจมีหมากซ้อนกัน (เช่นหมากเดินทับผู้เล่น) จึงเก็บเป็นรายการต่อช่อง
+    เทียบหมากด้วย identity ไม่ใช่ == (หมากชนิดเดียวกันที่ช่องเดียวกันยังเป็นคนละตัว)
+    เก็บลำดับของหมากใน list ของเจ้าของด้วย (index_of) เจ้าของต้องเรียก reindex เมื่อลำดับเลื่อน
+    """
+
+    def __init__(self, size: int = 8):
+        self.size = size
+        self.mask = 0
+        self._squares: Dict[int, List[object]] = {}
+        self._index: Dict[int, int] = {}  # id(หมาก) -> ลำดับใน list
+
+    def clear(self):
+        self.mask = 0
+        self._squares.clear()
+        self._index.clear()
+
+    def add(self, sq: int, piece: object):
+        self._squares.setdefault(sq, []).append(piece)
+        self.mask |= 1 << sq
+
+    def remove(self, sq: int, piece: object):
+        stack = self._squares[sq]
+        for i, other in enumerate(stack):
+            if other is piece:
+                del stack[i]
+                break
+        else:
+            raise KeyError(f"piece not at square {sq}")
+        if not stack:
+            del self._squares[sq]
+            self.mask &= ~(1 << sq)
+        self._index.pop(id(piece), None)
+
+    def move(self, piece: object, from_sq: int, to_sq: int):
+        if from_sq != to_sq:
+            index = self._index.get(id(piece))
+            self.remove(from_sq, piece)
+            self.add(to_sq, piece)
+            if index is not None:
+                self._index[id(piece)] = index
+
+    def reindex(self, pieces: List[object], start: int = 0):
+        """บันทึกลำดับของ pieces[start:] (หลังเพิ่ม/ลบหมากที่ลำดับ start ตัวหลังจากนั้นเลื่อนหมด)"""
+        index = self._index
+        for i in range(start, len(pieces)):
+            index[id(pieces[i])] = i
+
+    def index_of(self, piece: object) -> int:
+        """ลำดับของหมากใน list ของเจ้าของ (จาก reindex)"""
+        return self._index[id(piece)]
+
+    def piece_at(self, sq: int):
+        """หมากตัวแรกที่ช่องนี้ หรือ None"""
+        stack = self._squares.get(sq)
+        return stack[0] if stack else None
+
+    def pieces_at(self, sq: int) -> List[object]:
+        return list(self._squares.get(sq, ()))
+
+    def __contains__(self, sq: int) -> bool:
+        return bool(self.mask >> sq & 1)
+
+    def items(self) -> Iterator[Tuple[int, object]]:
+        """(ช่อง, หมาก) ทุกตัว"""
+        for sq, stack in self._squares.items():
+            for piece in stack:
+                yield sq, piece
+
+
+class ThreatMap:
+    """ช่องที่หมากแต่ละตัวโจมตีได้ (เดินไปถึงในตาเดียว) อัปเดตทีละการเดิน
+
+    counts[sq] คือจำนวนหมากที่โจมตีช่อง sq และ attacked คือ mask ของช่องที่ counts > 0
+    add/move แค่จดไว้ แล้วคำนวณรวมทีเดียวตอนมีคนถาม (is_attacked, safe_squares)
+    ตาของ AI ที่หมากหลายร้อยตัวขยับจึงไล่หมากไถลรอบเดียว ไม่ใช่ทุกครั้งที่มีหมากขยับ
+    ตอนคำนวณ หมากไถลที่ไม่ได้ขยับจะคำนวณใหม่เฉพาะตัวที่แนวเดินผ่านช่องที่เปลี่ยน
+    """
+
+    def __init__(self, size: int = 8):
+        self.tables = get_tables(size)
+        self.counts = [0] * self.tables.num_squares
+        self.attacked = 0
+        self.occupied = 0
+        # id(หมาก) -> [หมาก, ชนิด, ช่อง, mask ที่โจมตี]
+        self._pieces: Dict[int, list] = {}
+        # occupancy ล่าสุด และหมากที่เพิ่มหรือขยับแล้วแต่ยังไม่ได้คำนวณ
+        self._pending = 0
+        self._stale: Dict[int, list] = {}
+
+    def clear(self):
+        self.counts = [0] * self.tables.num_squares
+        self.attacked = 0
+        self.occupied = 0
+        self._pieces.clear()
+        self._pending = 0
+        self._stale.clear()
+
+    def add(self, piece: object, type_name: str, sq: int, occupied: int):
+        entry = [piece, type_name, sq, 0]
+        self._pieces[id(piece)] = entry
+        self._stale[id(piece)] = entry
+        self._pending = occupied
+
+    def remove(self, piece: object, occupied: int):
+        entry = self._pieces.pop(id(piece))
+        self._stale.pop(id(piece), None)
+        self._set_attacks(entry, 0)
+        self._pending = occupied
+
+    def move(self, piece: object, sq: int, occupied: int):
+        entry = self._pieces[id(piece)]
+        entry[2] = sq
+        self._stale[id(piece)] = entry
+        self._pending = occupied
+
+    def is_attacked(self, sq: int) -> bool:
+        self._refresh()
+        return bool(self.attacked >> sq & 1)
+
+    def safe_squares(self) -> int:
+        """mask ของช่องที่ไม่มีหมากและไม่ถูกโจมตี"""
+        self._refresh()
+        return self.tables.full & ~(self.attacked | self.occupied)
+
+    def _refresh(self):
+        """คำนวณหมากที่จดไว้ และหมากไถลที่ช่องที่มีหมากเข้า/ออกอยู่ในแนวเดิน"""
+        occupied = self._pending
+        changed = occupied ^ self.occupied
+        stale = self._stale
+        if not changed and not stale:
+            return
+        self.occupied = occupied
+        relevant = self.tables.relevant
+        moves = self.tables.moves
+        for key, entry in self._pieces.items():
+            type_name = entry[1]
+            if (key in stale or type_name in relevant
+                    and relevant[type_name][entry[2]] & changed):
+                self._set_attacks(entry, moves(type_name, entry[2], occupied))
+        stale.clear()
+
+    def _set_attacks(self, entry: list, attacks: int):
+        old = entry[3]
+        entry[3] = attacks
+        counts = self.counts
+        # ไล่บิตเองแทน iter_squares เพราะเรียกทุกครั้งที่หมากขยับ
+        removed = old & ~attacks
+        cleared = 0
+        while removed:
+            low = removed & -removed
+            removed ^= low
+            sq = low.bit_length() - 1
+            counts[sq] -= 1
+            if not counts[sq]:
+                cleared |= low
+        added = attacks & ~old
+        while added:
+            low = added & -added
+            added ^= low
+            counts[low.bit_length() - 1] += 1
+        self.attacked = (self.attacked & ~cleared) | attacks
@@ -0,0 +1,123 @@
+from collections import OrderedDict
+from typing import List, Optional
+import hashlib
+import os
+import struct
+
+from moodeng_core import Piece, PieceType, Player, Position
+
+# ไฟล์ cache: header แล้วตามด้วย entry เรียงจากเก่าไปใหม่
+#
+#   header  "MDRC", version (u8)
+#   entry   key (16 byte), จำนวนตา (u16), ช่องปลายทางของหมากแต่ละตัว (u16 ต่อตัว, NO_MOVE = ไม่เดิน)
+#
+# เปลี่ยน VERSION เมื่อวิธีคิดของ AI เปลี่ยน ไฟล์เก่าจะถูกข้ามไปเอง
+
+MAGIC = b"MDRC"
+VERSION = 2
+HEADER = struct.Struct("<4sB")
+_COUNT = struct.Struct("<H")
+KEY_BYTES = 16
+NO_MOVE = 0xFFFF
+
+PIECE_CODE = {piece_type: i + 1 for i, piece_type in enumerate(PieceType)}
+MOVEGEN_CODE = {"bitboard": 0, "reference": 0}  # สอง backend ให้ผลเหมือนกัน (ตรวจด้วย moodeng_perft)
+EVALUATOR_CODE = {"scalar": 0, "numpy": 1}
+
+
+class ReplyCache:
+    """จำผลของ ChessAI.choose_moves ตามตำแหน่งบนกระดาน ตั้งเป็น ChessAI.cache แล้วจะใช้เอง
+
+    key คือ blake2b ของหมาก (ชนิดและช่องตามลำดับใน list เพราะบทบาทของ AI ขึ้นกับลำดับ)
+    ช่องผู้เล่น และค่าตั้งของ AI ที่มีผลต่อการเลือก hp และโล่นับเฉพาะตอนที่เปิดการค้นหา
+    ค่าเหมือนกันทุกครั้งที่รัน (ไม่ขึ้นกับ PYTHONHASHSEED) จึงเก็บลงไฟล์ได้
+    เก็บแบบ LRU ไม่เกิน max_entries ถ้าให้ path จะโหลดตอนสร้างและเขียนกลับด้วย save()
+    """
+
+    def __init__(self, max_entries: int = 4096, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self._entries: "OrderedDict[bytes, bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, ai, pieces: List[Piece], player: Player) -> bytes:
+        size = ai.board_size
+        search = ai.search
+        digest = hashlib.blake2b(digest_size=KEY_BYTES)
+        digest.update(struct.pack("<HBBBH", size, MOVEGEN_CODE.get(ai.movegen, 1),
+                                  EVALUATOR_CODE.get(ai.evaluator, 2), ai.blocked_distances,
+                                  player.position.y * size + player.position.x))
+        if search is not None:
+            depth, time_budget_ms = search.budget()
+            digest.update(struct.pack("<BdBBB", depth, time_budget_ms,
+                                      search.candidates_per_piece, max(player.hp, 0),
+                                      player.shield_active))
+        digest.update(b"".join(
+            struct.pack("<BH", PIECE_CODE[piece.piece_type],
+                        piece.position.y * size + piece.position.x)
+            for piece in pieces))
+        return digest.digest()
+
+    def get(self, key: bytes, size: int) -> Optional[List[Optional[Position]]]:
+        """ผลที่เคยเก็บไว้ของ key จาก key() (list ใหม่ทุกครั้ง) หรือ None ถ้าไม่มี"""
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return [Position(sq % size, sq // size) if sq != NO_MOVE else None
+                for sq in struct.unpack(f"<{len(value) // 2}H", value)]
+
+    def put(self, key: bytes, size: int, moves: List[Optional[Position]]):
+        self._entries[key] = struct.pack(
+            f"<{len(moves)}H",
+            *(move.y * size + move.x if move else NO_MOVE for move in moves))
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def load(self, path: str):
+        """เพิ่ม entry จากไฟล์ (ไฟล์เสียหรือคนละ version จะถูกข้าม)"""
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            return
+        magic, version = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            return
+        offset = HEADER.size
+        while offset + KEY_BYTES + _COUNT.size <= len(data):
+            key = data[offset:offset + KEY_BYTES]
+            count = _COUNT.unpack_from(data, offset + KEY_BYTES)[0]
+            offset += KEY_BYTES + _COUNT.size
+            value = data[offset:offset + 2 * count]
+            if len(value) != 2 * count:
+                break  # ไฟล์ขาดกลาง entry
+            offset += 2 * count
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def save(self, path: Optional[str] = None):
+        """เขียนทุก entry ลงไฟล์ (เขียนไฟล์ชั่วคราวแล้วแทนที่ ไฟล์เดิมไม่เสียถ้าพังกลางทาง)"""
+        path = path if path is not None else self.path
+        if path is None:
+            return
+        parts = [HEADER.pack(MAGIC, VERSION)]
+        for key, value in self._entries.items():
+            parts.append(key + _COUNT.pack(len(value) // 2) + value)
+        temp = path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(b"".join(parts))
+        os.replace(temp, path)
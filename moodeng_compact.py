@@ -0,0 +1,199 @@
+from typing import Dict, Iterator, List, Tuple
+
+from moodeng_core import Piece, PieceType, Player, PlayerAbilities, Position
+
+# สถานะเกมทั้งกระดานอัดอยู่ใน bytearray เดียว clone ได้ด้วยการ copy ครั้งเดียว
+#
+#   byte 0      HP
+#   byte 1      โล่ (0/1)
+#   byte 2      จำนวนครั้งที่เดินได้ในตานี้
+#   byte 3-6    จำนวนความสามารถแต่ละชนิด (ตามลำดับใน PlayerAbilities)
+#   byte 7-8    ช่องของผู้เล่น (little endian)
+#   byte 9-     หมาก AI ตัวละ 3 byte: ชนิด, ช่อง (little endian) เรียงตามลำดับใน ai_pieces
+
+PIECE_TYPES = list(PieceType)
+PIECE_CODE = {piece_type: i + 1 for i, piece_type in enumerate(PIECE_TYPES)}
+ABILITIES = list(PlayerAbilities)
+
+HP, SHIELD, MOVES = 0, 1, 2
+ABILITY_OFFSET = 3
+PLAYER_SQ = ABILITY_OFFSET + len(ABILITIES)
+HEADER = PLAYER_SQ + 2
+PIECE_BYTES = 3
+FIELDS = ("hp", "shield_active", "moves_remaining")
+
+
+class CompactState:
+    """ผู้เล่นและหมาก AI แบบอัดแน่น copy ได้ถูก
+
+    ใช้ใน GameState.to_compact/load_compact/restart_from, state_hash ของ replay
+    และตำแหน่งเริ่มของ rollout ใน moodeng_levelgen (เกมละไม่กี่สิบ byte แทน GameState ใหม่ทุกเกม)
+    รับ event ของ moodeng_history.make/unmake ได้ด้วย (การค้นหาของ AI ใช้ SearchState แทน
+    เพราะต้องอัปเดต Zobrist hash ไปพร้อมกัน)
+    แปลงกลับเป็น Player/Piece ได้ด้วย to_game() ความสามารถเก็บเป็นจำนวนต่อชนิด
+    ตอนแปลงกลับจึงเรียงตามลำดับใน PlayerAbilities
+    """
+
+    __slots__ = ("size", "data")
+
+    def __init__(self, size: int = 8, data: bytearray = None):
+        self.size = size
+        self.data = data if data is not None else bytearray(HEADER)
+
+    @classmethod
+    def from_game(cls, player: Player, pieces: List[Piece], size: int = 8) -> "CompactState":
+        data = bytearray(HEADER + PIECE_BYTES * len(pieces))
+        data[HP] = max(player.hp, 0)
+        data[SHIELD] = int(player.shield_active)
+        data[MOVES] = player.moves_remaining
+        for ability in player.abilities:
+            data[ABILITY_OFFSET + ABILITIES.index(ability)] += 1
+        _write_square(data, PLAYER_SQ, player.position.y * size + player.position.x)
+        offset = HEADER
+        for piece in pieces:
+            data[offset] = PIECE_CODE[piece.piece_type]
+            _write_square(data, offset + 1, piece.position.y * size + piece.position.x)
+            offset += PIECE_BYTES
+        return cls(size, data)
+
+    def to_game(self) -> Tuple[Player, List[Piece]]:
+        """สร้าง Player และรายการ Piece ใหม่จากสถานะนี้"""
+        abilities = []
+        for ability, count in self.abilities().items():
+            abilities.extend([ability] * count)
+        player = Player(
+            position=self._position(self.player_square),
+            hp=self.hp,
+            abilities=abilities,
+            shield_active=self.shield_active,
+            moves_remaining=self.moves_remaining,
+        )
+        pieces = [Piece(piece_type, self._position(sq)) for piece_type, sq in self.pieces()]
+        return player, pieces
+
+    def copy(self) -> "CompactState":
+        clone = CompactState.__new__(CompactState)
+        clone.size = self.size
+        clone.data = bytearray(self.data)
+        return clone
+
+    @property
+    def hp(self) -> int:
+        return self.data[HP]
+
+    @hp.setter
+    def hp(self, value: int):
+        self.data[HP] = max(value, 0)
+
+    @property
+    def shield_active(self) -> bool:
+        return bool(self.data[SHIELD])
+
+    @shield_active.setter
+    def shield_active(self, value: bool):
+        self.data[SHIELD] = int(value)
+
+    @property
+    def moves_remaining(self) -> int:
+        return self.data[MOVES]
+
+    @moves_remaining.setter
+    def moves_remaining(self, value: int):
+        self.data[MOVES] = value
+
+    @property
+    def player_square(self) -> int:
+        return self.data[PLAYER_SQ] | self.data[PLAYER_SQ + 1] << 8
+
+    @player_square.setter
+    def player_square(self, sq: int):
+        _write_square(self.data, PLAYER_SQ, sq)
+
+    def abilities(self) -> Dict[PlayerAbilities, int]:
+        """จำนวนความสามารถที่เหลือของแต่ละชนิด (เฉพาะชนิดที่มี)"""
+        return {ability: self.data[ABILITY_OFFSET + i]
+                for i, ability in enumerate(ABILITIES) if self.data[ABILITY_OFFSET + i]}
+
+    def add_ability(self, ability: PlayerAbilities, count: int = 1):
+        self.data[ABILITY_OFFSET + ABILITIES.index(ability)] += count
+
+    @property
+    def piece_count(self) -> int:
+        return (len(self.data) - HEADER) // PIECE_BYTES
+
+    def pieces(self) -> Iterator[Tuple[PieceType, int]]:
+        """(ชนิด, ช่อง) ของหมาก AI ตามลำดับ"""
+        data = self.data
+        for offset in range(HEADER, len(data), PIECE_BYTES):
+            yield PIECE_TYPES[data[offset] - 1], data[offset + 1] | data[offset + 2] << 8
+
+    def piece_square(self, index: int) -> int:
+        offset = HEADER + index * PIECE_BYTES + 1
+        return self.data[offset] | self.data[offset + 1] << 8
+
+    def move_piece(self, index: int, sq: int):
+        _write_square(self.data, HEADER + index * PIECE_BYTES + 1, sq)
+
+    def add_piece(self, piece_type: PieceType, sq: int, index: int = None):
+        """เพิ่มหมาก (ไม่ระบุ index = ต่อท้าย)"""
+        if index is None:
+            index = self.piece_count
+        offset = HEADER + index * PIECE_BYTES
+        self.data[offset:offset] = bytes((PIECE_CODE[piece_type], sq & 0xFF, sq >> 8))
+
+    def remove_piece(self, index: int) -> Tuple[PieceType, int]:
+        """เอาหมากตัวที่ index ออก คืน (ชนิด, ช่อง) ไว้ใช้ใส่คืน"""
+        offset = HEADER + index * PIECE_BYTES
+        data = self.data
+        removed = PIECE_TYPES[data[offset] - 1], data[offset + 1] | data[offset + 2] << 8
+        del data[offset:offset + PIECE_BYTES]
+        return removed
+
+    def occupied(self) -> int:
+        """mask ของช่องที่มีหมาก AI"""
+        mask = 0
+        data = self.data
+        for offset in range(HEADER, len(data), PIECE_BYTES):
+            mask |= 1 << (data[offset + 1] | data[offset + 2] << 8)
+        return mask
+
+    # method ชุดเดียวกับ GameState ที่ moodeng_history.make/unmake เรียก
+    # ค่าที่ไม่ได้เก็บในรูปแบบนี้ (score, current_level, ...) จะถูกข้าม
+
+    def set_player_square(self, sq: int):
+        self.player_square = sq
+
+    def set_field(self, name: str, value):
+        if name in FIELDS:
+            setattr(self, name, value)
+
+    def remove_ability(self, index: int, ability: PlayerAbilities):
+        self.data[ABILITY_OFFSET + ABILITIES.index(ability)] -= 1
+
+    def insert_ability(self, index: int, ability: PlayerAbilities):
+        self.add_ability(ability)
+
+    def replace_pieces(self, pieces: tuple):
+        del self.data[HEADER:]
+        for piece_type, sq in pieces:
+            self.add_piece(piece_type, sq)
+
+    def _position(self, sq: int) -> Position:
+        return Position(sq % self.size, sq // self.size)
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, CompactState)
+                and self.size == other.size and self.data == other.data)
+
+    def __hash__(self) -> int:
+        return hash((self.size, bytes(self.data)))
+
+    def __repr__(self) -> str:
+        pieces = ", ".join(f"{piece_type.name}@{sq}" for piece_type, sq in self.pieces())
+        return (f"CompactState(hp={self.hp}, shield={self.shield_active}, "
+                f"player={self.player_square}, pieces=[{pieces}])")
+
+
+def _write_square(data: bytearray, offset: int, sq: int):
+    data[offset] = sq & 0xFF
+    data[offset + 1] = sq >> 8
@@ -0,0 +1,433 @@
+from enum import Enum
+from dataclasses import dataclass
+from heapq import heappop, heappush
+from typing import Dict, List, Optional, Tuple
+import threading
+
+from moodeng_bitboard import DistanceField, get_tables, iter_squares
+from moodeng_eval import BatchEvaluator
+
+# กำหนดประเภทของหมาก
+class PieceType(Enum):
+    PAWN = "PAWN"
+    KNIGHT = "KNIGHT"
+    BISHOP = "BISHOP"
+    ROOK = "ROOK"
+    QUEEN = "QUEEN"
+
+@dataclass
+class Position:
+    x: int
+    y: int
+
+@dataclass
+class Piece:
+    piece_type: PieceType
+    position: Position
+
+# @dataclass
+# class Player:
+#     position: Position
+#     hp: int
+#     abilities: List[str]
+
+class PlayerAbilities(Enum):
+    EXTRA_MOVE = "Double Move"  # เดินได้ 2 ครั้ง
+    SHIELD = "Shield"          # โล่ป้องกัน 1 ครั้ง
+    TELEPORT = "Teleport"      # เคลื่อนที่ข้ามฝั่งได้
+    HEAL = "Heal"             # ฟื้นฟู HP 1 หน่วย
+    
+@dataclass
+class Player:
+    position: Position
+    hp: int
+    abilities: List[PlayerAbilities]
+    shield_active: bool = False
+    moves_remaining: int = 1
+
+    def add_ability(self, ability: PlayerAbilities):
+        """เพิ่มความสามารถให้ผู้เล่น"""
+        self.abilities.append(ability)
+
+    def use_ability(self, ability: PlayerAbilities) -> bool:
+        """ใช้ความสามารถ"""
+        if ability in self.abilities:
+            if ability == PlayerAbilities.EXTRA_MOVE:
+                self.moves_remaining = 2
+            elif ability == PlayerAbilities.SHIELD:
+                self.shield_active = True
+            elif ability == PlayerAbilities.HEAL:
+                self.hp = min(self.hp + 1, 5)
+            self.abilities.remove(ability)
+            return True
+        return False
+
+class ChessAI:
+    def __init__(self, board_size: int = 8, movegen: str = "bitboard",
+                 evaluator: str = "scalar", blocked_distances: bool = False):
+        self.board_size = board_size
+        self.difficulty_level = 1
+        # "bitboard" ใช้ตารางที่คำนวณไว้แล้ว, "reference" ใช้โค้ดเดิมทีละช่อง
+        self.movegen = movegen
+        # "scalar" เรียก _evaluate_move ทีละช่อง, "numpy" ประเมินทุกช่องพร้อมกัน
+        self.evaluator = evaluator
+        self._batch = BatchEvaluator(board_size) if evaluator == "numpy" else None
+        # ระยะจริงตามการเดินของหมากแต่ละชนิด ปกติใช้ตารางกระดานว่าง
+        # ถ้า blocked_distances จะคิดหมากที่ขวางทางด้วย (แยกตาม (ชนิด, ช่องผู้เล่น))
+        self.blocked_distances = blocked_distances
+        self._distance_fields: Dict[Tuple[str, int], DistanceField] = {}
+        self._occupied = 0
+        # ตัวค้นหาล่วงหน้า (เช่น AlphaBetaSearch) ถ้าไม่กำหนดจะเลือกทีละตัวแบบเดิม
+        self.search = None
+        # จำผลของ choose_moves ตามตำแหน่ง (เช่น moodeng_cache.ReplyCache) ถ้าไม่กำหนดจะคิดใหม่ทุกครั้ง
+        self.cache = None
+        self.tables = get_tables(board_size)
+        # Position ของทุกช่องสร้างไว้ครั้งเดียว ใช้ตอนประเมินเท่านั้น
+        self._square_positions = [Position(sq % board_size, sq // board_size)
+                                  for sq in range(board_size * board_size)]
+
+    def get_move_mask(self, piece: Piece, occupied: int = 0) -> int:
+        """คืน mask ของช่องที่หมากเดินได้ (บิตละหนึ่งช่อง)"""
+        sq = piece.position.y * self.board_size + piece.position.x
+        return self.tables.moves(piece.piece_type.name, sq, occupied)
+
+    def get_occupancy(self, pieces: List[Piece], player: Player) -> int:
+        """mask ของทุกช่องที่มีหมาก (รวมผู้เล่น) ใช้หาจุดที่หมากไถลต้องหยุด"""
+        size = self.board_size
+        occupied = 1 << (player.position.y * size + player.position.x)
+        for piece in pieces:
+            occupied |= 1 << (piece.position.y * size + piece.position.x)
+        return occupied
+
+    def get_moves(self, piece: Piece, occupied: int = 0) -> List[Position]:
+        """คำนวณการเดินที่เป็นไปได้ของหมากแต่ละตัว"""
+        if self.movegen == "reference":
+            return self.get_moves_reference(piece, occupied)
+        size = self.board_size
+        return [Position(sq % size, sq // size)
+                for sq in iter_squares(self.get_move_mask(piece, occupied))]
+
+    def get_moves_reference(self, piece: Piece, occupied: int = 0) -> List[Position]:
+        """คำนวณการเดินแบบเดิมทีละช่อง (ใช้เทียบความถูกต้องกับบิตบอร์ด)"""
+        moves = []
+        
+        if piece.piece_type == PieceType.PAWN:
+            # เดินหน้า 1 ช่อง และแนวทแยง
+            possible_moves = [
+                (0, 1),   # เดินหน้า
+                (1, 1),   # ทแยงขวา
+                (-1, 1),  # ทแยงซ้าย
+            ]
+            for dx, dy in possible_moves:
+                new_x = piece.position.x + dx
+                new_y = piece.position.y + dy
+                if self._is_valid_position(new_x, new_y):
+                    moves.append(Position(new_x, new_y))
+            
+        elif piece.piece_type == PieceType.KNIGHT:
+            knight_moves = [
+                (2, 1), (2, -1), (-2, 1), (-2, -1),
+                (1, 2), (1, -2), (-1, 2), (-1, -2)
+            ]
+            for dx, dy in knight_moves:
+                new_x = piece.position.x + dx
+                new_y = piece.position.y + dy
+                if self._is_valid_position(new_x, new_y):
+                    moves.append(Position(new_x, new_y))
+                    
+        elif piece.piece_type in (PieceType.ROOK, PieceType.BISHOP, PieceType.QUEEN):
+            # เดินไกลจนกว่าจะชนหมากตัวแรก (เดินไปช่องนั้นได้) หรือขอบกระดาน
+            orthogonal = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+            diagonal = [(1, 1), (-1, 1), (1, -1), (-1, -1)]
+            if piece.piece_type == PieceType.ROOK:
+                directions = orthogonal
+            elif piece.piece_type == PieceType.BISHOP:
+                directions = diagonal
+            else:
+                directions = orthogonal + diagonal
+            for dx, dy in directions:
+                new_x = piece.position.x + dx
+                new_y = piece.position.y + dy
+                while self._is_valid_position(new_x, new_y):
+                    moves.append(Position(new_x, new_y))
+                    if occupied >> (new_y * self.board_size + new_x) & 1:
+                        break
+                    new_x += dx
+                    new_y += dy
+        
+        return moves
+
+    def _is_valid_position(self, x: int, y: int) -> bool:
+        """ตรวจสอบว่าตำแหน่งอยู่ในกระดานหรือไม่"""
+        return 0 <= x < self.board_size and 0 <= y < self.board_size
+
+    def choose_moves(self, pieces: List[Piece], player: Player,
+                     cancel: Optional[threading.Event] = None) -> List[Position]:
+        """เลือกการเดินของ AI ด้วยการค้นหาล่วงหน้าถ้าเปิดไว้ ไม่งั้นใช้แบบเดิม
+
+        cancel ส่งต่อให้การค้นหา (ดู AlphaBetaSearch.choose_moves)
+        ผลของการค้นหาที่ไม่ครบ (หมดเวลาหรือถูก cancel ก่อนถึงความลึกสูงสุด) ไม่เก็บลง cache
+        """
+        cache = self.cache
+        key = None
+        if cache is not None:
+            # คิด key ก่อนค้นหา ค่าตั้งของ AI ที่อยู่ใน key ต้องเป็นของตอนเริ่มคิด
+            key = cache.key(self, pieces, player)
+            moves = cache.get(key, self.board_size)
+            if moves is not None:
+                return moves
+        search = self.search
+        if search is not None:
+            moves = search.choose_moves(pieces, player, cancel=cancel)
+            complete = search.complete
+        else:
+            moves = self.choose_moves_greedy(pieces, player)
+            complete = True
+        if cache is not None and complete:
+            cache.put(key, self.board_size, moves)
+        return moves
+
+    def choose_moves_greedy(self, pieces: List[Piece], player: Player) -> List[Position]:
+        """เลือกช่องให้หมาก AI ทุกตัวพร้อมกันตามบทบาท โดยไม่ให้สองตัวจบที่ช่องเดียวกัน"""
+        size = self.board_size
+        occupied = self.get_occupancy(pieces, player)
+        self._occupied = occupied
+        roles = self.assign_roles(pieces, player)
+        if self._batch is not None:
+            options = self._move_costs_batched(pieces, player, roles, occupied)
+        else:
+            options = [[(-self._evaluate_move(piece, move, player, role), move.y * size + move.x)
+                        for move in self._candidate_moves(piece, occupied)]
+                       for piece, role in zip(pieces, roles)]
+        current = [piece.position.y * size + piece.position.x for piece in pieces]
+        return [Position(sq % size, sq // size) for sq in assign_targets(options, current)]
+
+    def assign_roles(self, pieces: List[Piece], player: Player) -> List[str]:
+        """บทบาทของหมากทุกตัว: ตัวที่ถึงผู้เล่นได้ในไม่กี่ตาเป็น attacker ถัดมาเป็น blocker
+        ที่เหลือเป็น supporter อย่างละประมาณหนึ่งในสาม (3 ตัวได้บทบาทละตัว)"""
+        count = len(pieces)
+        distances = [self.move_distance(piece.piece_type, piece.position, player)
+                     for piece in pieces]
+        order = sorted(range(count), key=lambda i: (distances[i], i))
+        roles = [""] * count
+        for rank, i in enumerate(order):
+            roles[i] = ROLES_BY_DISTANCE[rank * len(ROLES_BY_DISTANCE) // count]
+        return roles
+
+    def _move_costs_batched(self, pieces: List[Piece], player: Player,
+                            roles: List[str], occupied: int) -> List[List[Tuple[float, int]]]:
+        """(cost, ช่อง) ของทุกช่องที่หมากแต่ละตัวเดินได้ ให้ BatchEvaluator ประเมินพร้อมกัน"""
+        size = self.board_size
+        candidates = [list(iter_squares(self.get_move_mask(piece, occupied)))
+                      for piece in pieces]
+        rows = [self.distance_table(piece.piece_type, player) for piece in pieces]
+        types = [piece.piece_type.name for piece in pieces]
+        player_sq = player.position.y * size + player.position.x
+        return self._batch.move_costs(candidates, roles, rows, types, player_sq)
+
+    def _candidate_moves(self, piece: Piece, occupied: int) -> List[Position]:
+        """ช่องที่จะประเมิน เรียงตามเลขช่อง"""
+        if self.movegen == "reference":
+            size = self.board_size
+            return sorted(self.get_moves_reference(piece, occupied),
+                          key=lambda move: move.y * size + move.x)
+        squares = self._square_positions
+        return [squares[sq] for sq in iter_squares(self.get_move_mask(piece, occupied))]
+
+    def distance_field(self, piece_type: PieceType, player: Player) -> DistanceField:
+        """ตารางระยะถึงผู้เล่นของหมากชนิดนี้ ปรับตาม occupancy ของตาปัจจุบัน"""
+        target = player.position.y * self.board_size + player.position.x
+        key = (piece_type.name, target)
+        field = self._distance_fields.get(key)
+        if field is None:
+            if len(self._distance_fields) >= self.tables.max_distance_tables:
+                self._distance_fields.clear()
+            field = DistanceField(self.tables, piece_type.name, target, self._occupied)
+            self._distance_fields[key] = field
+        else:
+            field.update(self._occupied)
+        return field
+
+    def distance_table(self, piece_type: PieceType, player: Player) -> List[int]:
+        """จำนวนตาจากทุกช่องถึงผู้เล่นของหมากชนิดนี้"""
+        if self.blocked_distances:
+            return self.distance_field(piece_type, player).distances
+        target = player.position.y * self.board_size + player.position.x
+        return self.tables.distances(piece_type.name, target)
+
+    def move_distance(self, piece_type: PieceType, move: Position, player: Player) -> int:
+        """จำนวนตาที่หมากชนิดนี้ต้องเดินจาก move ไปถึงผู้เล่น"""
+        return self.distance_table(piece_type, player)[move.y * self.board_size + move.x]
+
+    def _evaluate_move(self, piece: Piece, move: Position, player: Player, role: str) -> float:
+        """ประเมินคะแนนของการเดิน"""
+        score = 0.0
+        
+        # ระยะห่างจากผู้เล่น นับเป็นจำนวนตาที่หมากตัวนี้ต้องเดินจริง
+        distance = self.move_distance(piece.piece_type, move, player)
+        
+        # คะแนนพื้นฐานตามบทบาท
+        if role == "blocker":
+            # ต้องการอยู่ใกล้ผู้เล่นแต่ไม่ต้องเข้าไปติด
+            score = 20 - distance if distance > 2 else 10
+        elif role == "attacker":
+            # ต้องการเข้าใกล้ผู้เล่นมากที่สุด
+            score = 30 - distance
+        else:  # supporter
+            # พยายามอยู่ห่างพอประมาณและควบคุมพื้นที่
+            ideal_distance = 3
+            score = 20 - abs(distance - ideal_distance)
+
+        # โบนัสถ้าสามารถกินผู้เล่นได้
+        if move.x == player.position.x and move.y == player.position.y:
+            score += 100
+
+        # หักคะแนนถ้าเดินชิดขอบเกินไป
+        last = self.board_size - 1
+        if move.x in (0, last) or move.y in (0, last):
+            score -= 5
+
+        return score
+    
+
+# บทบาทเรียงจากหมากที่อยู่ใกล้ผู้เล่นที่สุด (นับเป็นจำนวนตา) ไปไกลที่สุด
+ROLES_BY_DISTANCE = ("attacker", "blocker", "supporter")
+
+
+def assign_targets(options: List[List[Tuple[object, int]]], current: List[int]) -> List[int]:
+    """เลือกช่องปลายทางให้หมากทุกตัวพร้อมกัน ไม่ให้สองตัวจบที่ช่องเดียวกัน
+
+    options[i] คือ (cost, ช่อง) ที่หมากตัวที่ i เดินไปได้ (cost น้อยดีกว่า เท่ากันเลือกช่องเลขน้อย)
+    current[i] คือช่องที่หมากตัวนั้นอยู่ตอนนี้ ไล่จากคู่ (หมาก, ช่อง) ที่ cost ต่ำสุดของทั้งกระดาน:
+    ช่องที่มีคนจองแล้วให้ลองช่องรองของหมากตัวนั้น ช่องที่หมากอีกตัวยังยืนอยู่ต้องรอจนตัวนั้นได้ที่ไปก่อน
+    หมากที่ไม่เหลือช่องให้ไปอยู่ที่เดิม ใช้เวลา O(E log E) เมื่อ E คือจำนวนคู่ทั้งหมด
+    """
+    count = len(options)
+    ranked = [sorted(moves) for moves in options]
+    holder = {sq: i for i, sq in enumerate(current)}
+    result: List[Optional[int]] = [None] * count
+    cursor = [0] * count
+    taken = set()
+    waiting: Dict[int, List[int]] = {}  # หมาก -> หมากที่รอช่องของมัน
+    heap: list = []
+
+    def push(i: int):
+        if cursor[i] < len(ranked[i]):
+            cost, sq = ranked[i][cursor[i]]
+            heappush(heap, (cost, sq, i))
+
+    def assign(i: int, sq: int):
+        result[i] = sq
+        taken.add(sq)
+        for j in waiting.pop(i, ()):
+            push(j)
+
+    for i in range(count):
+        push(i)
+    while True:
+        while heap:
+            _, sq, i = heappop(heap)
+            if sq in taken:
+                cursor[i] += 1
+                push(i)
+                continue
+            other = holder.get(sq)
+            if other is not None and other != i and result[other] is None:
+                waiting.setdefault(other, []).append(i)
+                continue
+            assign(i, sq)
+
+        idle = [i for i in range(count) if result[i] is None]
+        if not idle:
+            return result
+        waiters = {j for queue in waiting.values() for j in queue}
+        stuck = [i for i in idle if i not in waiters]
+        if stuck:
+            # ไม่เหลือช่องให้ไป อยู่ที่เดิม (หมากที่รอช่องนี้จะได้ลองช่องถัดไป)
+            for i in stuck:
+                assign(i, current[i])
+        else:
+            # รอช่องของกันและกันเป็นวง ให้ตัวแรกข้ามช่องที่รออยู่
+            i = idle[0]
+            for queue in waiting.values():
+                if i in queue:
+                    queue.remove(i)
+            cursor[i] += 1
+            push(i)
+
+
+# ai_setups วางบนกระดาน 8x8 กระดานที่ใหญ่กว่าจะวางชุดเดิมซ้ำทีละบล็อกขนาดนี้
+SETUP_SIZE = 8
+
+
+class Level:
+    def __init__(self, level_number: int, board_size: int = SETUP_SIZE,
+                 layout: Optional[List[Tuple[PieceType, Position]]] = None):
+        self.level_number = level_number
+        self.board_size = board_size
+        # หมากของด่านที่สร้างมาจากที่อื่น (เช่น moodeng_levelgen) วางตามนี้ทั้งกระดาน ไม่วางซ้ำเป็นบล็อก
+        self.layout = layout
+        self.ai_setups = {
+            1: [ # ด่าน 1 - เริ่มต้น
+                (PieceType.PAWN, Position(1, 1)),
+                (PieceType.KNIGHT, Position(3, 1)),
+                (PieceType.ROOK, Position(6, 1))
+            ],
+            2: [ # ด่าน 2 - เพิ่มความยาก
+                (PieceType.PAWN, Position(1, 1)),
+                (PieceType.KNIGHT, Position(3, 1)),
+                (PieceType.ROOK, Position(6, 1)),
+                (PieceType.BISHOP, Position(4, 1))
+            ],
+            3: [ # ด่าน 3 - ปานกลาง
+                (PieceType.KNIGHT, Position(2, 1)),
+                (PieceType.BISHOP, Position(3, 1)),
+                (PieceType.ROOK, Position(5, 1)),
+                (PieceType.QUEEN, Position(4, 1)),
+                (PieceType.PAWN, Position(1, 2))
+            ],
+            4: [ # ด่าน 4 - ยาก
+                (PieceType.QUEEN, Position(4, 1)),
+                (PieceType.BISHOP, Position(3, 1)),
+                (PieceType.BISHOP, Position(5, 1)),
+                (PieceType.KNIGHT, Position(2, 1)),
+                (PieceType.KNIGHT, Position(6, 1)),
+                (PieceType.PAWN, Position(4, 2))
+            ],
+            5: [ # ด่าน 5 - ท้าทาย
+                (PieceType.QUEEN, Position(4, 1)),
+                (PieceType.ROOK, Position(1, 1)),
+                (PieceType.ROOK, Position(7, 1)),
+                (PieceType.BISHOP, Position(3, 1)),
+                (PieceType.BISHOP, Position(5, 1)),
+                (PieceType.KNIGHT, Position(2, 2)),
+                (PieceType.KNIGHT, Position(6, 2))
+            ]
+        }
+
+    def get_ai_pieces(self) -> List[Piece]:
+        """สร้างหมาก AI สำหรับด่านปัจจุบัน
+
+        กระดานที่ใหญ่กว่า 8x8 เป็นคลื่นหมาก: วางชุดของด่านซ้ำทุกบล็อก 8x8 ในครึ่งบนของกระดาน
+        (64x64 ได้ 32 ชุด หรือ 96-224 ตัว) ผู้เล่นเริ่มที่ขอบล่างเหมือนเดิม
+        """
+        if self.layout is not None:
+            return [Piece(piece_type, Position(position.x, position.y))
+                    for piece_type, position in self.layout]
+        if self.level_number not in self.ai_setups:
+            return []
+
+        blocks_x = self.board_size // SETUP_SIZE
+        blocks_y = max(1, blocks_x // 2)
+        left = (self.board_size - blocks_x * SETUP_SIZE) // 2  # กระดานที่ไม่ลงตัวกับ 8 ให้อยู่กลาง
+        pieces = []
+        for block_y in range(blocks_y):
+            for block_x in range(blocks_x):
+                x0, y0 = left + block_x * SETUP_SIZE, block_y * SETUP_SIZE
+                for piece_type, position in self.ai_setups[self.level_number]:
+                    pieces.append(Piece(piece_type, Position(x0 + position.x, y0 + position.y)))
+        return pieces
+
+    def get_difficulty(self) -> int:
+        """คำนวณความยากของด่าน"""
+        return min(5, self.level_number)
@@ -0,0 +1,441 @@
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+import random
+
+from moodeng_bitboard import Occupancy, ThreatMap, get_tables, iter_squares, respawn_square
+from moodeng_compact import CompactState
+from moodeng_core import (
+    ChessAI, Level, Piece, PieceType, Player, PlayerAbilities, Position,
+)
+from moodeng_history import (
+    ABILITY_GAINED, ABILITY_USED, CAPTURE, FIELD, PIECE, PIECES, PLAYER, TurnLog, make,
+)
+from moodeng_profile import Profiler
+from moodeng_search import AlphaBetaSearch
+
+BOARD_SIZE = 8
+MIN_BOARD_SIZE, MAX_BOARD_SIZE = 8, 64
+MAX_LEVEL = 5
+MAX_HP = 5
+SEARCH_FROM_LEVEL = 4  # ด่านที่ AI เริ่มคิดล่วงหน้าหลายตา
+SEED_LIMIT = 1 << 64  # seed ต้องอยู่ใน 0 ถึง 2^64 - 1 (เก็บเป็น u64 ในไฟล์ replay)
+PLAYER_FIELDS = ("hp", "shield_active", "moves_remaining")
+
+
+
+@dataclass
+class Action:
+    """การกระทำของผู้เล่นหนึ่งครั้ง: ช่องที่เลือก และความสามารถที่เลือกไว้ (ถ้ามี)"""
+    target: Position
+    ability: Optional[PlayerAbilities] = None
+
+
+class GameState:
+    """กฎของเกมทั้งหมดแบบไม่ต้องใช้ pygame ใช้ได้ทั้งหน้าจอเกมและการจำลองบนเครื่อง build"""
+
+    def __init__(self, ai: Optional[ChessAI] = None,
+                 log: Optional[Callable[[str], None]] = None,
+                 search_from_level: Optional[int] = SEARCH_FROM_LEVEL,
+                 rng: Optional[random.Random] = None, seed: Optional[int] = None,
+                 board_size: int = BOARD_SIZE, max_level: Optional[int] = MAX_LEVEL,
+                 keep_history: bool = True):
+        if not MIN_BOARD_SIZE <= board_size <= MAX_BOARD_SIZE:
+            raise ValueError(f"board size must be {MIN_BOARD_SIZE}-{MAX_BOARD_SIZE}, got {board_size}")
+        if ai is not None and ai.board_size != board_size:
+            raise ValueError(f"ChessAI is for a {ai.board_size}x{ai.board_size} board, "
+                             f"the game is {board_size}x{board_size}")
+        if seed is not None and not 0 <= seed < SEED_LIMIT:
+            raise ValueError(f"seed must be 0-{SEED_LIMIT - 1}, got {seed}")
+        self.board_size = board_size
+        # ช่องเริ่มและจุดเกิดใหม่ของผู้เล่น
+        self.start = start_position(board_size)
+        self.ai = ai if ai is not None else ChessAI(board_size)
+        self.log = log if log is not None else _silent
+        # สุ่มด้วย random.Random ของเกมเอง เก็บ seed ไว้ให้เล่นซ้ำได้
+        # (ส่ง rng มาเองได้ แต่ seed จะเป็น None ถ้าไม่ได้บอกมาด้วย)
+        if rng is None:
+            if seed is None:
+                seed = random.randrange(1 << 63)
+            rng = random.Random(seed)
+        self.seed = seed
+        self.rng = rng
+        # ตัวบันทึก replay (ดู moodeng_replay.ReplayWriter) ถ้ามีจะถูกเรียกหลังทุกตา
+        self.recorder = None
+        # จับเวลาคิดของ AI (ปิดไว้ ไม่เสียเวลา) หน้าจอเกมจะเอา Profiler ของตัวเองมาใส่แทน
+        self.profiler = Profiler()
+        self.last_ai_moves: List[Position] = []
+        self.search_from_level = search_from_level
+        self.searcher = AlphaBetaSearch(self.ai, respawn=self.start)
+        # ด่านสุดท้าย (None = เล่นไปเรื่อย ๆ จนกว่าจะไม่มีด่านให้เล่น)
+        self.max_level = max_level
+        # ที่มาของหมากในด่านที่ไม่มีใน Level.ai_setups (ดู moodeng_levelgen.LevelGenerator)
+        # ต้องมี layout(ด่าน) และ prefetch(ด่าน) ถ้าไม่กำหนด เกมจะจบที่ด่านสุดท้ายของ ai_setups
+        self.levels = None
+        self.tables = get_tables(board_size)
+        self.current_level = 1
+        self.level_system = Level(self.current_level, board_size)
+        self.player: Player = None
+        self.ai_pieces: List[Piece] = []
+        # ช่อง -> หมาก AI อัปเดตทุกครั้งที่หมากเดินหรือถูกกิน
+        self.occupancy = Occupancy(board_size)
+        # ช่องที่หมาก AI โจมตีได้ ใช้หาจุดเกิดใหม่ที่ปลอดภัยและแรเงาช่องอันตราย
+        self.threats = ThreatMap(board_size)
+        # event ของแต่ละตา ใช้ undo/redo และ cancel_turn
+        # keep_history=False ไม่บันทึกเลย (การจำลองบนเครื่อง build ที่ไม่เคย undo)
+        # undo/redo จะคืนค่า False และ cancel_turn ย้อนตาไม่ได้
+        self.history = TurnLog()
+        self.keep_history = keep_history
+        self.score = 0
+        self.game_over = False
+        self.victory = False
+        self.level_complete = False
+        self.reset()
+
+    def _configure_ai(self):
+        """ตั้งความยากของ AI ตามด่าน และเปิดการค้นหาล่วงหน้าเมื่อถึงด่านที่กำหนด"""
+        self.ai.difficulty_level = self.level_system.get_difficulty()
+        if self.search_from_level is not None and self.current_level >= self.search_from_level:
+            self.ai.search = self.searcher
+        else:
+            self.ai.search = None
+
+    def reset(self):
+        """เริ่มเกมใหม่ที่ด่าน 1"""
+        self._reset()
+        if self.recorder is not None:
+            self.recorder.reset(self)
+
+    def _reset(self):
+        self.player = Player(
+            position=Position(self.start.x, self.start.y),
+            hp=3,
+            abilities=[PlayerAbilities.SHIELD],
+            shield_active=False,
+            moves_remaining=1
+        )
+        self.current_level = 1
+        self.level_system = self._make_level(self.current_level)
+        self.ai_pieces = self.level_system.get_ai_pieces()
+        self.sync_occupancy()
+        self.score = 0
+        self.game_over = False
+        self.victory = False
+        self.level_complete = False
+        self.history.clear()
+        self._configure_ai()
+
+    def jump_to_level(self, level_number: int):
+        """เริ่มเกมใหม่ที่ด่านที่กำหนด (ได้ความสามารถและรางวัลเหมือนเล่นผ่านมา 1 ด่าน)"""
+        self._reset()
+        if level_number > 1:
+            self.current_level = level_number - 1
+            self.next_level()
+        if self.recorder is not None:
+            self.recorder.jump(level_number, self)
+
+    def _make_level(self, number: int) -> Level:
+        """ด่านที่ไม่มีใน Level.ai_setups ขอหมากจาก levels แล้วให้ levels เตรียมด่านถัดไปไว้ก่อน
+        (ระหว่างที่ผู้เล่นเล่นด่านนี้ ตอนผ่านด่านจะได้ไม่ต้องรอ)"""
+        level = Level(number, self.board_size)
+        if self.levels is not None:
+            if number not in level.ai_setups and self._has_level(number):
+                level.layout = self.levels.layout(number)
+            if number + 1 not in level.ai_setups and self._has_level(number + 1):
+                self.levels.prefetch(number + 1)
+        return level
+
+    def _has_level(self, number: int) -> bool:
+        return self.max_level is None or number <= self.max_level
+
+    def next_level(self):
+        """เปลี่ยนด่านใหม่"""
+        self._set("current_level", self.current_level + 1)
+        new_pieces = tuple((piece.piece_type, self._square(piece.position))
+                           for piece in self.level_system.get_ai_pieces())
+        if new_pieces and self._has_level(self.current_level):
+            self.log(f"\nStarting Level {self.current_level}!")
+            # ให้ความสามารถใหม่
+            random_ability = self.rng.choice([
+                PlayerAbilities.EXTRA_MOVE,
+                PlayerAbilities.SHIELD,
+                PlayerAbilities.TELEPORT,
+                PlayerAbilities.HEAL
+            ])
+            self._do((ABILITY_GAINED, len(self.player.abilities), random_ability))
+            self.log(f"Got new ability: {random_ability.value}!")
+
+            # เตรียมด่านใหม่
+            self._move_player(self._square(self.start))
+            self._do((PIECES, self._piece_squares(), new_pieces))
+
+            # ให้รางวัล
+            self._set("score", self.score + 500)
+            self._set("hp", min(self.player.hp + 1, MAX_HP))
+
+            self._set("level_complete", False)
+        else:
+            self._set("victory", True)
+            self._set("game_over", True)
+            self.log("Congratulations! You've completed all levels!")
+
+    def sync_occupancy(self):
+        """สร้างดัชนีช่องและ threat map ใหม่จาก ai_pieces (เรียกหลังแทนที่ ai_pieces ทั้งชุด)"""
+        self.occupancy.clear()
+        self.threats.clear()
+        for piece in self.ai_pieces:
+            self.occupancy.add(self._square(piece.position), piece)
+        self.occupancy.reindex(self.ai_pieces)
+        for piece in self.ai_pieces:
+            self.threats.add(piece, piece.piece_type.name, self._square(piece.position),
+                             self.occupancy.mask)
+
+    # --- การเปลี่ยน state ทีละ event (ใช้ร่วมกับ moodeng_history.make/unmake) ---
+
+    def _do(self, event: tuple):
+        """ทำ event แล้วบันทึกลงตาปัจจุบัน ทุกการเปลี่ยน state ระหว่างเล่นต้องผ่านตรงนี้"""
+        make(self, event)
+        self.history.record(event)
+
+    def _set(self, name: str, value):
+        old = getattr(self.player, name) if name in PLAYER_FIELDS else getattr(self, name)
+        if old != value:
+            self._do((FIELD, name, old, value))
+
+    def _move_player(self, sq: int):
+        old = self._player_square()
+        if old != sq:
+            self._do((PLAYER, old, sq))
+
+    def _use_ability(self, ability: PlayerAbilities):
+        """ใช้ความสามารถแบบเดียวกับ Player.use_ability แต่บันทึกเป็น event"""
+        if ability not in self.player.abilities:
+            return
+        if ability == PlayerAbilities.EXTRA_MOVE:
+            self._set("moves_remaining", 2)
+        elif ability == PlayerAbilities.SHIELD:
+            self._set("shield_active", True)
+        elif ability == PlayerAbilities.HEAL:
+            self._set("hp", min(self.player.hp + 1, MAX_HP))
+        self._do((ABILITY_USED, self.player.abilities.index(ability), ability))
+
+    def _piece_squares(self) -> tuple:
+        return tuple((piece.piece_type, self._square(piece.position)) for piece in self.ai_pieces)
+
+    def set_player_square(self, sq: int):
+        self.player.position = self._position(sq)
+
+    def move_piece(self, index: int, sq: int):
+        piece = self.ai_pieces[index]
+        self.occupancy.move(piece, self._square(piece.position), sq)
+        self.threats.move(piece, sq, self.occupancy.mask)
+        piece.position = self._position(sq)
+
+    def remove_piece(self, index: int):
+        piece = self.ai_pieces.pop(index)
+        self.occupancy.remove(self._square(piece.position), piece)
+        self.occupancy.reindex(self.ai_pieces, index)
+        self.threats.remove(piece, self.occupancy.mask)
+
+    def add_piece(self, piece_type: PieceType, sq: int, index: int):
+        piece = Piece(piece_type, self._position(sq))
+        self.ai_pieces.insert(index, piece)
+        self.occupancy.add(sq, piece)
+        self.occupancy.reindex(self.ai_pieces, index)
+        self.threats.add(piece, piece_type.name, sq, self.occupancy.mask)
+
+    def replace_pieces(self, pieces: tuple):
+        self.ai_pieces = [Piece(piece_type, self._position(sq))
+                          for piece_type, sq in pieces]
+        self.sync_occupancy()
+
+    def set_field(self, name: str, value):
+        if name in PLAYER_FIELDS:
+            setattr(self.player, name, value)
+            return
+        setattr(self, name, value)
+        if name == "current_level":
+            self.level_system = self._make_level(value)
+            self._configure_ai()
+
+    def remove_ability(self, index: int, ability: PlayerAbilities):
+        del self.player.abilities[index]
+
+    def insert_ability(self, index: int, ability: PlayerAbilities):
+        self.player.abilities.insert(index, ability)
+
+    # --- undo/redo ---
+
+    def undo(self) -> bool:
+        """ย้อนหนึ่งตา (คลิกของผู้เล่นพร้อมตาของ AI) คืนค่า False ถ้าไม่มีให้ย้อน"""
+        changed = self.history.undo(self)
+        if changed and self.recorder is not None:
+            self.recorder.undo(self)
+        return changed
+
+    def redo(self) -> bool:
+        changed = self.history.redo(self)
+        if changed and self.recorder is not None:
+            self.recorder.redo(self)
+        return changed
+
+    def to_compact(self) -> CompactState:
+        """ผู้เล่นและหมาก AI ตอนนี้ในรูปแบบอัดแน่น (copy ได้ถูก)"""
+        return CompactState.from_game(self.player, self.ai_pieces, self.board_size)
+
+    def load_compact(self, compact: CompactState):
+        """แทนที่ผู้เล่นและหมาก AI ด้วยสถานะจาก to_compact()"""
+        self.player, self.ai_pieces = compact.to_game()
+        self.sync_occupancy()
+
+    def restart_from(self, compact: CompactState):
+        """เริ่มเกมใหม่ที่ด่าน 1 จากผู้เล่นและหมากใน compact
+
+        ใช้กับการจำลองหลายเกมจากตำแหน่งเดียวกัน: เก็บตำแหน่งเริ่มเป็น CompactState ไม่กี่สิบ byte
+        แล้วใช้ GameState ตัวเดิมซ้ำ แทนการสร้าง GameState ใหม่ทุกเกม (ซึ่งสร้างตัวค้นหาและตารางของมันใหม่ด้วย)
+        """
+        self._reset()
+        self.load_compact(compact)
+
+    def check_level_complete(self):
+        """ตรวจสอบว่าจบด่านหรือยัง"""
+        if len(self.ai_pieces) == 0 and not self.level_complete:
+            self._set("level_complete", True)
+            self.log(f"Level {self.current_level} Complete!")
+            self.next_level()
+
+    def get_player_valid_moves(self) -> List[Position]:
+        """ช่องที่ผู้เล่นเดินได้ (เดินแบบคิง)"""
+        mask = self.tables.king[self._player_square()]
+        return [self._position(sq) for sq in iter_squares(mask)]
+
+    def is_player_move(self, target: Position) -> bool:
+        """เช็คว่าเดินไปช่องนี้ได้ไหม โดยไม่ต้องสร้างรายการ Position"""
+        if not self._on_board(target):
+            return False
+        mask = self.tables.king[self._player_square()]
+        return bool(mask >> self._square(target) & 1)
+
+    def _player_square(self) -> int:
+        return self._square(self.player.position)
+
+    def _square(self, position: Position) -> int:
+        return position.y * self.board_size + position.x
+
+    def _position(self, sq: int) -> Position:
+        return Position(sq % self.board_size, sq // self.board_size)
+
+    def _on_board(self, position: Position) -> bool:
+        return 0 <= position.x < self.board_size and 0 <= position.y < self.board_size
+
+    def is_attacked(self, position: Position) -> bool:
+        """ช่องนี้มีหมาก AI เดินมาถึงได้ในตาหน้าหรือไม่"""
+        return self.threats.is_attacked(self._square(position))
+
+    def respawn_position(self) -> Position:
+        """จุดเกิดใหม่: ช่องเริ่มต้นถ้าปลอดภัย ไม่งั้นช่องปลอดภัยที่ใกล้ที่สุด"""
+        sq = respawn_square(self.board_size, self._square(self.start), self.threats.safe_squares())
+        return self._position(sq)
+
+    def handle_move(self, action: Action) -> bool:
+        """ขยับผู้เล่น คืนค่า True เมื่อจบตาของผู้เล่นแล้ว (ถึงตา AI)"""
+        target = action.target
+        if (action.ability == PlayerAbilities.TELEPORT
+                and PlayerAbilities.TELEPORT in self.player.abilities):
+            if self._on_board(target):
+                self._move_player(self._square(target))
+                self._use_ability(PlayerAbilities.TELEPORT)
+                return True
+
+        if not self.is_player_move(target):
+            return False
+
+        sq = self._square(target)
+        captured = self.occupancy.piece_at(sq)
+        if captured is not None:
+            index = self.occupancy.index_of(captured)
+            self._do((CAPTURE, index, captured.piece_type, sq))
+            self._set("score", self.score + 100)
+
+        self._move_player(sq)
+        self._set("moves_remaining", self.player.moves_remaining - 1)
+        return self.player.moves_remaining <= 0
+
+    def apply_ai_moves(self, ai_moves: List[Position]):
+        """ขยับหมาก AI และคิดดาเมจ/โล่ เมื่อหมากเดินทับผู้เล่น"""
+        player_sq = self._player_square()
+        for index, move in enumerate(ai_moves[:len(self.ai_pieces)]):
+            if move:
+                sq = self._square(move)
+                old = self._square(self.ai_pieces[index].position)
+                if sq != old:
+                    self._do((PIECE, index, old, sq))
+                if sq == player_sq:
+                    if self.player.shield_active:
+                        self._set("shield_active", False)
+                        self.log("Shield blocked the attack!")
+                    else:
+                        self._set("hp", self.player.hp - 1)
+                        self.log(f"Player hit! HP: {self.player.hp}")
+                        if self.player.hp <= 0:
+                            self.log("Game Over!")
+                            self._set("game_over", True)
+                        else:
+                            self._move_player(self._square(self.respawn_position()))
+                            player_sq = self._player_square()
+
+    def step(self, action: Action, ai_moves: Optional[List[Position]] = None) -> bool:
+        """เล่นหนึ่งคลิกของผู้เล่น ถ้าจบตาก็ให้ AI เดินต่อ คืนค่า True เมื่อ AI ได้เดิน
+
+        ai_moves ใช้บังคับตาของ AI (เช่นตอนเล่น replay) แทนการให้ AI คิดใหม่
+        """
+        if not self.begin_turn(action):
+            return False
+        if ai_moves is None:
+            with self.profiler.time("ai"):
+                ai_moves = self.ai.choose_moves(self.ai_pieces, self.player)
+        self.finish_turn(action, ai_moves)
+        return True
+
+    def begin_turn(self, action: Action) -> bool:
+        """ตาของผู้เล่นครึ่งแรก คืนค่า True ถ้าถึงตา AI แล้ว
+
+        ถ้าได้ True ต้องเรียก finish_turn (หรือ cancel_turn) ต่อ ระหว่างนั้นให้ AI คิดที่อื่นได้
+        ถ้าได้ False ตานี้จบไปแล้ว (เดินไม่ได้ หรือยังเหลือการเดินจาก EXTRA_MOVE)
+        """
+        if self.game_over or self.level_complete:
+            return False
+        if self.keep_history:
+            self.history.begin()
+        if self.handle_move(action):
+            return True
+        self.last_ai_moves = []
+        self._end_turn(action)
+        return False
+
+    def finish_turn(self, action: Action, ai_moves: List[Position]):
+        """ตาของ AI ต่อจาก begin_turn ด้วยช่องที่ AI เลือกแล้ว"""
+        self.last_ai_moves = ai_moves
+        self.apply_ai_moves(ai_moves)
+        self._set("moves_remaining", 1)
+        if action.ability == PlayerAbilities.EXTRA_MOVE:
+            self._use_ability(PlayerAbilities.EXTRA_MOVE)
+        self._end_turn(action)
+
+    def cancel_turn(self):
+        """ยกเลิกตาที่ begin_turn ไปแล้วแต่ยังไม่ finish_turn (ผู้เล่นกลับที่เดิม ไม่บันทึกอะไร)"""
+        self.history.abort(self)
+
+    def _end_turn(self, action: Action):
+        self.check_level_complete()
+        self.history.end()
+        if self.recorder is not None:
+            self.recorder.turn(action, self.last_ai_moves, self)
+
+
+def start_position(board_size: int = BOARD_SIZE) -> Position:
+    """ช่องเริ่มของผู้เล่น: กลางขอบล่างของกระดาน ((4, 7) บนกระดาน 8x8)"""
+    return Position(board_size // 2, board_size - 1)
+
+
+def _silent(message: str):
+    pass
@@ -0,0 +1,88 @@
+from itertools import chain
+from typing import Dict, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy เป็นตัวเลือกเสริม ใช้เฉพาะ evaluator="numpy"
+    np = None
+
+ROLES = ["blocker", "attacker", "supporter"]
+ROLE_INDEX = {role: i for i, role in enumerate(ROLES)}
+# ตารางระยะที่แปลงเป็น array เก็บไว้ได้ (ชนิดละหนึ่งตารางต่อช่องผู้เล่น ใช้จริงแค่ของช่องปัจจุบัน)
+ROW_CACHE_ENTRIES = 64
+
+
+class BatchEvaluator:
+    """ประเมินทุกช่องที่หมากทุกตัวเดินได้ในครั้งเดียวด้วย NumPy
+
+    ใช้ตารางระยะชุดเดียวกับ ChessAI._evaluate_move จึงได้คะแนนเท่ากันทุกช่อง
+    """
+
+    def __init__(self, board_size: int = 8):
+        if np is None:
+            raise ImportError("evaluator='numpy' ต้องติดตั้ง numpy ก่อน")
+        self.board_size = board_size
+        squares = np.arange(board_size * board_size)
+        self.xs = squares % board_size
+        self.ys = squares // board_size
+        # ช่องชิดขอบที่โดนหักคะแนน (ตรงกับเงื่อนไขใน _evaluate_move)
+        last = board_size - 1
+        self.edge = np.isin(self.xs, [0, last]) | np.isin(self.ys, [0, last])
+        # ตารางระยะที่แปลงเป็น array แล้ว: (ชนิด, ช่องผู้เล่น) -> (list, array)
+        # ถ้า list ของ key เดิมเปลี่ยน (DistanceField คำนวณใหม่) array เก่าจะถูกแทนที่ ไม่ค้างอยู่
+        self._rows: Dict[Tuple[str, int], Tuple[List[int], "np.ndarray"]] = {}
+        self._max_rows = ROW_CACHE_ENTRIES
+
+    def _distance_row(self, key: Tuple[str, int], row: List[int]) -> "np.ndarray":
+        cached = self._rows.get(key)
+        if cached is None or cached[0] is not row:
+            if cached is None and len(self._rows) >= self._max_rows:
+                self._rows.clear()
+            cached = (row, np.array(row, dtype=np.int64))
+            self._rows[key] = cached
+        return cached[1]
+
+    def scores(self, candidates: List[List[int]], roles: List[str],
+               rows: List[List[int]], types: List[str], player_sq: int) -> "np.ndarray":
+        """คะแนนของทุกช่องใน candidates ต่อกันเป็น array เดียว
+
+        rows[i] คือตารางระยะถึง player_sq ของหมากชนิด types[i]
+        """
+        if not candidates:
+            return np.zeros(0)
+        lengths = [len(squares) for squares in candidates]
+        flat = np.fromiter(chain.from_iterable(candidates), dtype=np.int64,
+                           count=sum(lengths))
+        # หมากชนิดเดียวกันใช้ตารางระยะเดียวกัน stack แค่ตารางที่ต่างกัน (คลื่นหมากหลายร้อยตัวมีไม่กี่ชนิด)
+        row_index: Dict[int, int] = {}
+        unique = []
+        for row, type_name in zip(rows, types):
+            if id(row) not in row_index:
+                row_index[id(row)] = len(unique)
+                unique.append(self._distance_row((type_name, player_sq), row))
+        row_of = np.repeat(np.array([row_index[id(row)] for row in rows], dtype=np.int64),
+                           lengths)
+        role_of = np.repeat(np.array([ROLE_INDEX[role] for role in roles], dtype=np.int64),
+                            lengths)
+        distance = np.stack(unique)[row_of, flat]
+
+        score = np.choose(role_of, [
+            np.where(distance > 2, 20 - distance, 10),  # blocker
+            30 - distance,                              # attacker
+            20 - np.abs(distance - 3),                  # supporter
+        ])
+        score = score + np.where(flat == player_sq, 100, 0)  # กินผู้เล่นได้
+        return score - np.where(self.edge[flat], 5, 0)
+
+    def move_costs(self, candidates: List[List[int]], roles: List[str],
+                   rows: List[List[int]], types: List[str],
+                   player_sq: int) -> List[List[Tuple[int, int]]]:
+        """(cost, ช่อง) ของหมากแต่ละตัว cost = -คะแนน ใช้กับ moodeng_core.assign_targets"""
+        scores = self.scores(candidates, roles, rows, types, player_sq).tolist()
+        result = []
+        start = 0
+        for squares in candidates:
+            end = start + len(squares)
+            result.append([(-score, sq) for score, sq in zip(scores[start:end], squares)])
+            start = end
+        return result
@@ -0,0 +1,127 @@
+from typing import List, Optional, Tuple
+
+# event หนึ่งตัวคือ tuple เล็ก ๆ ที่เก็บทั้งค่าเก่าและค่าใหม่ จึงย้อนกลับได้โดยไม่ต้องเก็บทั้งเกม
+#
+#   (PLAYER, ช่องเดิม, ช่องใหม่)
+#   (PIECE, ลำดับหมาก, ช่องเดิม, ช่องใหม่)
+#   (CAPTURE, ลำดับหมาก, ชนิด, ช่อง)
+#   (FIELD, ชื่อ, ค่าเดิม, ค่าใหม่)           เช่น hp, shield_active, score, current_level
+#   (ABILITY_USED, ลำดับ, ความสามารถ)
+#   (ABILITY_GAINED, ลำดับ, ความสามารถ)
+#   (PIECES, หมากชุดเดิม, หมากชุดใหม่)       เปลี่ยนด่าน: tuple ของ (ชนิด, ช่อง)
+#
+# make/unmake เรียก method ชุดเดียวกันของ state ทั้ง GameState, CompactState
+# และ moodeng_search.SearchState: set_player_square, move_piece, remove_piece, add_piece,
+# set_field, remove_ability, insert_ability, replace_pieces (SearchState มีเฉพาะที่การค้นหาใช้)
+#
+# ใช้ทั้ง undo/redo ของ GameState (TurnLog) และการค้นหาของ AI ที่เดินแล้วย้อนบน SearchState ตัวเดียว
+
+Event = tuple
+
+PLAYER, PIECE, CAPTURE, FIELD, ABILITY_USED, ABILITY_GAINED, PIECES = range(7)
+
+
+def make(state, event: Event):
+    """ทำ event กับ state"""
+    kind = event[0]
+    if kind == PLAYER:
+        state.set_player_square(event[2])
+    elif kind == PIECE:
+        state.move_piece(event[1], event[3])
+    elif kind == CAPTURE:
+        state.remove_piece(event[1])
+    elif kind == FIELD:
+        state.set_field(event[1], event[3])
+    elif kind == ABILITY_USED:
+        state.remove_ability(event[1], event[2])
+    elif kind == ABILITY_GAINED:
+        state.insert_ability(event[1], event[2])
+    elif kind == PIECES:
+        state.replace_pieces(event[2])
+    else:
+        raise ValueError(f"unknown event {event!r}")
+
+
+def unmake(state, event: Event):
+    """ย้อน event ที่ make ไปแล้ว (ต้องย้อนตามลำดับกลับหลัง)"""
+    kind = event[0]
+    if kind == PLAYER:
+        state.set_player_square(event[1])
+    elif kind == PIECE:
+        state.move_piece(event[1], event[2])
+    elif kind == CAPTURE:
+        state.add_piece(event[2], event[3], event[1])
+    elif kind == FIELD:
+        state.set_field(event[1], event[2])
+    elif kind == ABILITY_USED:
+        state.insert_ability(event[1], event[2])
+    elif kind == ABILITY_GAINED:
+        state.remove_ability(event[1], event[2])
+    elif kind == PIECES:
+        state.replace_pieces(event[1])
+    else:
+        raise ValueError(f"unknown event {event!r}")
+
+
+class TurnLog:
+    """บันทึก event แยกเป็นตา (หนึ่งคลิกของผู้เล่นรวมตาของ AI) สำหรับ undo/redo
+
+    ตาที่บันทึกแล้วไม่ถูกแก้ไข undo แค่เลื่อน cursor ถอยหลัง
+    ถ้าเล่นตาใหม่หลัง undo ตาที่ redo ได้จะถูกตัดทิ้ง
+    """
+
+    def __init__(self):
+        self.turns: List[Tuple[Event, ...]] = []
+        self.cursor = 0
+        self._current: Optional[List[Event]] = None
+
+    def clear(self):
+        self.turns.clear()
+        self.cursor = 0
+        self._current = None
+
+    def begin(self):
+        """เริ่มบันทึกตาใหม่"""
+        self._current = []
+
+    def record(self, event: Event):
+        if self._current is not None:
+            self._current.append(event)
+
+    def end(self):
+        """จบตา เก็บเฉพาะตาที่มี event จริง"""
+        events, self._current = self._current, None
+        if events:
+            del self.turns[self.cursor:]
+            self.turns.append(tuple(events))
+            self.cursor += 1
+
+    def abort(self, state):
+        """ย้อน event ของตาที่ begin ไว้แต่ยังไม่ end แล้วทิ้งตานั้น"""
+        events, self._current = self._current, None
+        for event in reversed(events or ()):
+            unmake(state, event)
+
+    @property
+    def can_undo(self) -> bool:
+        return self.cursor > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self.cursor < len(self.turns)
+
+    def undo(self, state) -> bool:
+        if not self.can_undo:
+            return False
+        self.cursor -= 1
+        for event in reversed(self.turns[self.cursor]):
+            unmake(state, event)
+        return True
+
+    def redo(self, state) -> bool:
+        if not self.can_redo:
+            return False
+        for event in self.turns[self.cursor]:
+            make(state, event)
+        self.cursor += 1
+        return True
@@ -0,0 +1,321 @@
+"""สร้างด่านต่อจาก Level.ai_setups ได้ไม่จำกัด (โหมด endless)
+
+    python moodeng_levelgen.py --seed 1 --levels 6-10             # ดูด่านที่สร้างและความยาก
+    python moodeng_levelgen.py --seed 1 --levels 6-30 --cache levels.mdlv
+
+ด่านเดียวกันได้หมากเหมือนเดิมทุกครั้งสำหรับ (seed, ขนาดกระดาน, ด่าน) เดียวกัน ไม่ขึ้นกับความเร็วเครื่อง
+replay ของเกม endless จึงสร้างด่านใหม่ได้ตรงกับตอนเล่นจริง
+
+แต่ละด่านสุ่มหมากหลายชุดตามงบแต้ม (PAWN 1, KNIGHT/BISHOP 3, ROOK 5, QUEEN 9)
+แล้ววัดความยากของแต่ละชุดด้วยการเล่นแบบไม่มีหน้าจอ (flee_policy กับ AI แบบ greedy)
+เลือกชุดที่ยากใกล้เส้นเป้าหมายที่สุด เส้นเป้าหมายเริ่มจากความยากของด่านสุดท้ายที่ทำมือ
+แล้วเพิ่มเข้าหา 1 ทีละน้อย
+
+ไฟล์ cache: header แล้วตามด้วย entry
+
+    header  "MDLV", version (u8)
+    entry   seed (u64), ขนาดกระดาน (u8), ด่าน (u16), ความยาก (f32), จำนวนหมาก (u16),
+            หมาก (ชนิด u8, ช่อง u16 ต่อตัว)
+
+เปลี่ยน VERSION เมื่อวิธีสร้างด่านเปลี่ยน ไฟล์เก่าจะถูกข้ามไปเอง
+"""
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import argparse
+import os
+import random
+import struct
+import threading
+import time
+
+from moodeng_balance import flee_policy
+from moodeng_core import ChessAI, Level, PieceType, Position, SETUP_SIZE
+from moodeng_engine import GameState, MAX_BOARD_SIZE, MIN_BOARD_SIZE, SEED_LIMIT
+
+Layout = List[Tuple[PieceType, Position]]
+
+MAGIC = b"MDLV"
+VERSION = 1
+HEADER = struct.Struct("<4sB")
+_ENTRY = struct.Struct("<QBHfH")
+_PIECE = struct.Struct("<BH")
+
+PIECE_POINTS = {
+    PieceType.PAWN: 1,
+    PieceType.KNIGHT: 3,
+    PieceType.BISHOP: 3,
+    PieceType.ROOK: 5,
+    PieceType.QUEEN: 9,
+}
+# โอกาสที่จะสุ่มได้แต่ละชนิด (ในชนิดที่งบยังพอ)
+PIECE_WEIGHTS = {
+    PieceType.PAWN: 3,
+    PieceType.KNIGHT: 3,
+    PieceType.BISHOP: 3,
+    PieceType.ROOK: 2,
+    PieceType.QUEEN: 1,
+}
+PIECE_CODE = {piece_type: i + 1 for i, piece_type in enumerate(PieceType)}
+CODE_PIECE = {code: piece_type for piece_type, code in PIECE_CODE.items()}
+
+ROLLOUT_TURNS = 40
+# ความยากเป้าหมายเข้าใกล้ 1 ด้วยอัตรานี้ต่อด่าน (0.85 = ช่องว่างที่เหลือลดลง 15% ทุกด่าน)
+TARGET_GROWTH = 0.85
+
+
+def point_budget(level: int, board_size: int) -> int:
+    """แต้มรวมของหมากในด่าน (8x8: ด่าน 1 ได้ 9 แต้มเท่ากับด่านทำมือ ด่าน 5 ได้ 33)
+    กระดานใหญ่คูณด้วยจำนวนบล็อก 8x8 ที่ Level วางคลื่นหมาก"""
+    blocks_x = board_size // SETUP_SIZE
+    return (3 + 6 * level) * blocks_x * max(1, blocks_x // 2)
+
+
+def spawn_squares(board_size: int) -> List[int]:
+    """ช่องที่วางหมากได้: แถวบนของกระดาน ห่างจากผู้เล่นที่เริ่มแถวล่างสุด"""
+    rows = max(3, board_size // 2 - 1)
+    return list(range(rows * board_size))
+
+
+def search_effort(board_size: int) -> Tuple[int, int]:
+    """(จำนวนชุดที่ลอง, จำนวนเกมต่อชุด) กระดานใหญ่เล่นช้ากว่ามากจึงลองน้อยลง"""
+    if board_size <= 16:
+        return 6, 6
+    if board_size <= 32:
+        return 3, 3
+    return 2, 2
+
+
+def random_layout(rng: random.Random, level: int, board_size: int) -> Layout:
+    """สุ่มหมากตามงบแต้มของด่าน (ไม่เกินครึ่งหนึ่งของช่องที่วางได้)"""
+    squares = spawn_squares(board_size)
+    budget = point_budget(level, board_size)
+    limit = len(squares) // 2
+    types = list(PIECE_POINTS)
+    chosen: List[PieceType] = []
+    while len(chosen) < limit:
+        affordable = [piece_type for piece_type in types if PIECE_POINTS[piece_type] <= budget]
+        if not affordable:
+            break
+        piece_type = rng.choices(affordable, [PIECE_WEIGHTS[t] for t in affordable])[0]
+        budget -= PIECE_POINTS[piece_type]
+        chosen.append(piece_type)
+    placed = rng.sample(squares, len(chosen))
+    return [(piece_type, Position(sq % board_size, sq // board_size))
+            for piece_type, sq in zip(chosen, placed)]
+
+
+def estimate_difficulty(layout: Layout, board_size: int, games: int, seed: str) -> float:
+    """ความยาก 0-1 จากการเล่น games เกมด้วย flee_policy ไม่เกิน ROLLOUT_TURNS ตาต่อเกม
+
+    ตายได้ 0.5-1 (ตายเร็วยิ่งยาก) รอดหรือเคลียร์ด่านได้ 0-0.5 ตาม HP ที่เสีย
+    AI ไม่ใช้การค้นหา (การค้นหาจำกัดเวลา ผลขึ้นกับความเร็วเครื่อง) จึงได้ค่าเดิมทุกครั้ง
+    """
+    pieces = tuple((piece_type, position.y * board_size + position.x)
+                   for piece_type, position in layout)
+    state = GameState(ai=ChessAI(board_size), search_from_level=None, seed=0,
+                      board_size=board_size, keep_history=False)
+    state.replace_pieces(pieces)
+    start = state.to_compact()
+    total = 0.0
+    for game in range(games):
+        rng = random.Random(f"{seed}:{game}")
+        state.rng = rng
+        state.restart_from(start)
+        start_hp = hp = state.player.hp
+        turns = 0
+        while turns < ROLLOUT_TURNS and not state.game_over and state.current_level == 1:
+            hp = state.player.hp  # เก็บก่อนเดิน เพราะตอนผ่านด่านจะได้ HP เพิ่ม
+            state.step(flee_policy(state, rng))
+            turns += 1
+        if state.game_over:
+            total += 1 - 0.5 * turns / ROLLOUT_TURNS
+        else:
+            if state.current_level == 1:
+                hp = state.player.hp
+            total += 0.5 * (start_hp - hp) / start_hp
+    return total / games
+
+
+def target_difficulty(level: int, anchor: float, anchor_level: int) -> float:
+    """เส้นความยากเป้าหมาย: เท่ากับ anchor ที่ anchor_level แล้วเพิ่มเข้าหา 1 ทุกด่าน"""
+    return 1 - (1 - anchor) * TARGET_GROWTH ** max(0, level - anchor_level)
+
+
+class LevelGenerator:
+    """สร้างด่านของโหมด endless ตั้งเป็น GameState.levels แล้วเกมจะขอด่านเอง
+
+    สร้างบน thread แยก GameState เรียก prefetch(ด่านถัดไป) ตั้งแต่เริ่มด่านก่อนหน้า
+    พอผ่านด่านจริง layout() จึงได้ผลทันทีโดยไม่ต้องรอ
+    เก็บด่านที่สร้างแล้วแบบ LRU ไม่เกิน max_entries ถ้าให้ path จะโหลดตอนสร้างและเขียนกลับด้วย save()
+    """
+
+    def __init__(self, seed: int, board_size: int = 8, path: Optional[str] = None,
+                 max_entries: int = 1024):
+        if not 0 <= seed < SEED_LIMIT:  # เก็บเป็น u64 ในไฟล์ cache
+            raise ValueError(f"seed must be 0-{SEED_LIMIT - 1}, got {seed}")
+        if not MIN_BOARD_SIZE <= board_size <= MAX_BOARD_SIZE:  # ไม่งั้นจะพังบน thread ที่สร้างด่าน
+            raise ValueError(f"board size must be {MIN_BOARD_SIZE}-{MAX_BOARD_SIZE}, got {board_size}")
+        self.seed = seed
+        self.board_size = board_size
+        self.path = path
+        self.max_entries = max_entries
+        # (seed, ขนาดกระดาน, ด่าน) -> (ความยาก, หมาก)
+        self._entries: "OrderedDict[Tuple[int, int, int], Tuple[float, Layout]]" = OrderedDict()
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="moodeng-levelgen")
+        self._anchor: Optional[Tuple[int, float]] = None
+        self.generated = 0
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def prefetch(self, level: int) -> Future:
+        """เริ่มสร้างด่านบน thread แยก (ถ้ายังไม่มี) คืน Future ของ (ความยาก, หมาก)"""
+        key = (self.seed, self.board_size, level)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                future = Future()
+                future.set_result(entry)
+                return future
+            future = self._pending.get(level)
+            if future is None:
+                future = self._executor.submit(self._build, level)
+                self._pending[level] = future
+            return future
+
+    def layout(self, level: int) -> Layout:
+        """หมากของด่าน (รอถ้ายังสร้างไม่เสร็จ)"""
+        return list(self.prefetch(level).result()[1])
+
+    def difficulty(self, level: int) -> float:
+        return self.prefetch(level).result()[0]
+
+    def _build(self, level: int) -> Tuple[float, Layout]:
+        entry = self.generate(level)
+        with self._lock:
+            key = (self.seed, self.board_size, level)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            del self._pending[level]
+            self.generated += 1
+        return entry
+
+    def generate(self, level: int) -> Tuple[float, Layout]:
+        """สุ่มหลายชุดแล้วเลือกชุดที่ความยากใกล้เป้าหมายที่สุด (ไม่ใช้ cache)"""
+        size = self.board_size
+        anchor_level, anchor = self._calibrate()
+        target = target_difficulty(level, anchor, anchor_level)
+        candidates, games = search_effort(size)
+        rng = random.Random(f"{self.seed}:{size}:{level}")
+        best = None
+        for candidate in range(candidates):
+            layout = random_layout(rng, level, size)
+            difficulty = estimate_difficulty(layout, size, games,
+                                             f"{self.seed}:{size}:{level}:{candidate}")
+            if best is None or abs(difficulty - target) < abs(best[0] - target):
+                best = (difficulty, layout)
+        return best
+
+    def _calibrate(self) -> Tuple[int, float]:
+        """ความยากของด่านทำมือด่านสุดท้ายบนกระดานนี้ (วัดแบบเดียวกับด่านที่สร้าง)"""
+        if self._anchor is None:
+            size = self.board_size
+            anchor_level = max(Level(1).ai_setups)
+            layout = [(piece.piece_type, piece.position)
+                      for piece in Level(anchor_level, size).get_ai_pieces()]
+            games = search_effort(size)[1] * 2
+            self._anchor = (anchor_level,
+                            estimate_difficulty(layout, size, games, f"anchor:{size}"))
+        return self._anchor
+
+    def close(self):
+        """หยุด thread (งานที่ยังไม่เริ่มถูกยกเลิก)"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def load(self, path: str):
+        """เพิ่มด่านจากไฟล์ (ไฟล์เสียหรือคนละ version จะถูกข้าม)"""
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            return
+        magic, version = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            return
+        offset = HEADER.size
+        with self._lock:
+            while offset + _ENTRY.size <= len(data):
+                seed, size, level, difficulty, count = _ENTRY.unpack_from(data, offset)
+                offset += _ENTRY.size
+                if offset + count * _PIECE.size > len(data):
+                    break  # ไฟล์ขาดกลาง entry
+                layout = []
+                for _ in range(count):
+                    code, sq = _PIECE.unpack_from(data, offset)
+                    offset += _PIECE.size
+                    layout.append((CODE_PIECE[code], Position(sq % size, sq // size)))
+                key = (seed, size, level)
+                self._entries[key] = (difficulty, layout)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self, path: Optional[str] = None):
+        """เขียนทุกด่านลงไฟล์ (เขียนไฟล์ชั่วคราวแล้วแทนที่ ไฟล์เดิมไม่เสียถ้าพังกลางทาง)"""
+        path = path if path is not None else self.path
+        if path is None:
+            return
+        parts = [HEADER.pack(MAGIC, VERSION)]
+        with self._lock:
+            for (seed, size, level), (difficulty, layout) in self._entries.items():
+                parts.append(_ENTRY.pack(seed, size, level, difficulty, len(layout)))
+                parts.extend(_PIECE.pack(PIECE_CODE[piece_type], position.y * size + position.x)
+                             for piece_type, position in layout)
+        temp = path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(b"".join(parts))
+        os.replace(temp, path)
+
+
+def _parse_levels(text: str) -> List[int]:
+    first, _, last = text.partition("-")
+    return list(range(int(first), int(last or first) + 1))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate Moodeng chess endless levels")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the game")
+    parser.add_argument("--board-size", type=int, default=8)
+    parser.add_argument("--levels", default="6-10", help="range of levels, e.g. 6-10")
+    parser.add_argument("--cache", help="load and save the generated levels in this file")
+    args = parser.parse_args(argv)
+    if not 0 <= args.seed < SEED_LIMIT:
+        parser.error(f"--seed must be 0-{SEED_LIMIT - 1}")
+    if not MIN_BOARD_SIZE <= args.board_size <= MAX_BOARD_SIZE:
+        parser.error(f"--board-size must be {MIN_BOARD_SIZE}-{MAX_BOARD_SIZE}")
+
+    generator = LevelGenerator(args.seed, args.board_size, path=args.cache)
+    try:
+        for level in _parse_levels(args.levels):
+            start = time.perf_counter()
+            difficulty, layout = generator.prefetch(level).result()
+            elapsed = time.perf_counter() - start
+            counts = Counter(piece_type for piece_type, _ in layout)
+            counts = ", ".join(f"{counts[t]} {t.name}" for t in PieceType if counts[t])
+            print(f"level {level:>3}: difficulty {difficulty:.2f}, {len(layout)} pieces "
+                  f"({counts}) in {elapsed:.2f}s")
+    finally:
+        generator.close()
+        generator.save()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,196 @@
+"""นับทุกตำแหน่งที่ไปถึงได้ในจำนวนตาที่กำหนด (แบบ perft ของหมากรุก) ใช้ตรวจตัวสร้างตาเดิน
+
+    python moodeng_perft.py --level 1 --depth 3
+    python moodeng_perft.py --level 3 --depth 2 --movegen reference,bitboard   # เทียบสอง backend
+    python moodeng_perft.py --level 1 --depth 2 --divide                       # แยกตามตาแรก
+
+หนึ่งตา (depth 1) คือการเรียก GameState.step หนึ่งครั้ง: ผู้เล่นเดินแบบคิง (กินหมากได้)
+เลือก EXTRA_MOVE ไว้ หรือ TELEPORT ไปช่องใดก็ได้ ถ้าจบตาของผู้เล่น AI ตอบด้วยทุกชุดการเดินร่วม
+(ผลคูณของช่องที่หมากแต่ละตัวเดินได้จาก ChessAI.get_moves หมากที่เดินไม่ได้อยู่ที่เดิม)
+SHIELD และ HEAL ไม่นับเป็นตาแยก เพราะ GameState.step ไม่ได้ใช้สองอย่างนี้จาก Action
+
+ทุกตาเดินผ่าน step/undo ของเกมจริง ตัวเลขจึงตรวจทั้งตัวสร้างตาเดินและ make/unmake ไปพร้อมกัน
+ตาสุดท้ายนับด้วยผลคูณโดยไม่เดินจริง (bulk counting) ปิดได้ด้วย --no-bulk
+"""
+from dataclasses import dataclass, field
+from itertools import product
+from math import prod
+from typing import Dict, List, Optional
+import argparse
+import time
+
+from moodeng_core import ChessAI, PlayerAbilities, Position
+from moodeng_engine import Action, GameState, SEED_LIMIT
+
+MOVEGENS = ("bitboard", "reference")
+
+
+@dataclass
+class PerftResult:
+    movegen: str
+    leaves: int
+    positions: int  # จำนวนครั้งที่เรียก step จริง
+    seconds: float
+    divide: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def leaves_per_second(self) -> float:
+        return self.leaves / max(self.seconds, 1e-9)
+
+
+def action_name(action: Action) -> str:
+    name = f"{action.target.x},{action.target.y}"
+    if action.ability is not None:
+        name += f" {action.ability.name}"
+    return name
+
+
+class Perft:
+    """เดินทุกกิ่งของเกมบน GameState เดียว แล้วย้อนกลับด้วย undo"""
+
+    def __init__(self, state: GameState, bulk: bool = True):
+        self.state = state
+        self.bulk = bulk
+        self.positions = 0
+
+    def player_actions(self) -> List[Action]:
+        """ทุกการกระทำของผู้เล่นที่ให้ผลต่างกัน"""
+        state = self.state
+        player = state.player
+        moves = state.get_player_valid_moves()
+        actions = [Action(move) for move in moves]
+        # EXTRA_MOVE มีผลเฉพาะตาที่จบตาของผู้เล่น (เดินครั้งเดียวก็จบเมื่อเหลือ 1 ครั้ง)
+        if player.moves_remaining == 1 and PlayerAbilities.EXTRA_MOVE in player.abilities:
+            actions += [Action(move, PlayerAbilities.EXTRA_MOVE) for move in moves]
+        if PlayerAbilities.TELEPORT in player.abilities:
+            size = state.board_size
+            actions += [Action(Position(sq % size, sq // size),
+                               PlayerAbilities.TELEPORT)
+                        for sq in range(size * size)]
+        return actions
+
+    def ai_options(self, action: Action) -> Optional[List[List[Position]]]:
+        """ช่องที่หมาก AI แต่ละตัวเดินได้หลังผู้เล่นทำ action (None ถ้ายังไม่ถึงตา AI)"""
+        state = self.state
+        ai = state.ai
+        cursor = state.history.cursor
+        state.history.begin()
+        options = None
+        if state.handle_move(action):
+            occupied = ai.get_occupancy(state.ai_pieces, state.player)
+            options = [ai.get_moves(piece, occupied) or [piece.position]
+                       for piece in state.ai_pieces]
+        state.history.end()
+        self._undo_to(cursor)
+        return options
+
+    def count(self, depth: int, divide: Optional[Dict[str, int]] = None) -> int:
+        """จำนวนตำแหน่งที่ความลึก depth พอดี (เกมที่จบก่อนไม่นับ)"""
+        state = self.state
+        if depth == 0:
+            return 1
+        if state.game_over:
+            return 0
+        # next_level สุ่มความสามารถ ให้ทุกกิ่งเริ่มจาก rng เดียวกัน ตัวเลขจึงไม่ขึ้นกับลำดับที่เดิน
+        rng_state = state.rng.getstate()
+        total = 0
+        for action in self.player_actions():
+            leaves = self._count_action(action, depth)
+            state.rng.setstate(rng_state)
+            if divide is not None:
+                divide[action_name(action)] = leaves
+            total += leaves
+        return total
+
+    def _count_action(self, action: Action, depth: int) -> int:
+        options = self.ai_options(action)
+        if options is None:
+            replies = [None]
+        elif depth == 1 and self.bulk:
+            return prod(len(moves) for moves in options)
+        else:
+            replies = product(*options)
+
+        state = self.state
+        total = 0
+        for reply in replies:
+            cursor = state.history.cursor
+            state.step(action, list(reply) if reply is not None else None)
+            self.positions += 1
+            total += self.count(depth - 1)
+            self._undo_to(cursor)
+        return total
+
+    def _undo_to(self, cursor: int):
+        state = self.state
+        if state.history.cursor != cursor + 1:
+            raise RuntimeError(f"turn was not recorded (history at {state.history.cursor}, "
+                               f"expected {cursor + 1})")
+        state.undo()
+
+
+def run_perft(level: int, depth: int, movegen: str = "bitboard", seed: int = 0,
+              bulk: bool = True, divide: bool = False) -> PerftResult:
+    state = GameState(ai=ChessAI(movegen=movegen), search_from_level=None, seed=seed)
+    state.jump_to_level(level)
+    perft = Perft(state, bulk)
+    split = {} if divide else None
+    start = time.perf_counter()
+    leaves = perft.count(depth, split)
+    elapsed = time.perf_counter() - start
+    return PerftResult(movegen, leaves, perft.positions, elapsed, split or {})
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Count reachable Moodeng chess positions")
+    parser.add_argument("--level", type=int, default=1)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the game rng (abilities gained on new levels)")
+    parser.add_argument("--movegen", default="bitboard",
+                        help="comma separated backends to run and compare: " + ", ".join(MOVEGENS))
+    parser.add_argument("--divide", action="store_true", help="print counts per first action")
+    parser.add_argument("--no-bulk", action="store_true",
+                        help="play the last ply instead of multiplying move counts")
+    args = parser.parse_args(argv)
+    if not 0 <= args.seed < SEED_LIMIT:
+        parser.error(f"--seed must be 0-{SEED_LIMIT - 1}")
+
+    movegens = [name.strip() for name in args.movegen.split(",") if name.strip()]
+    for name in movegens:
+        if name not in MOVEGENS:
+            parser.error(f"unknown movegen {name!r}")
+    compare = len(movegens) > 1
+
+    print(f"level {args.level}, depth {args.depth}, seed {args.seed}")
+    results = [run_perft(args.level, args.depth, name, args.seed, not args.no_bulk,
+                         args.divide or compare)
+               for name in movegens]
+
+    if args.divide:
+        for name in results[0].divide:
+            counts = "  ".join(f"{result.divide[name]:>12}" for result in results)
+            print(f"{name:<16} {counts}")
+        print()
+    print(f"{'movegen':<10} {'leaves':>14} {'positions':>12} {'seconds':>9} {'leaves/s':>12}")
+    for result in results:
+        print(f"{result.movegen:<10} {result.leaves:>14} {result.positions:>12} "
+              f"{result.seconds:>9.3f} {result.leaves_per_second:>12.0f}")
+
+    if compare:
+        expected = results[0]
+        mismatched = False
+        for result in results[1:]:
+            for name, leaves in expected.divide.items():
+                if result.divide.get(name) != leaves:
+                    mismatched = True
+                    print(f"MISMATCH {result.movegen} after {name}: "
+                          f"{result.divide.get(name)} != {leaves} ({expected.movegen})")
+        if mismatched:
+            return 1
+        print("all backends agree")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
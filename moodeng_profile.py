@@ -0,0 +1,133 @@
+from array import array
+from typing import Dict, List, Optional
+import json
+import time
+
+
+class RingHistogram:
+    """เก็บค่าล่าสุด capacity ค่าใน array วนทับของเก่า (หน่วยความจำคงที่ ไม่ต้องสร้าง object ต่อค่า)
+
+    percentile คำนวณตอนขอดูเท่านั้น ตอนเก็บแค่เขียนทับหนึ่งช่อง
+    """
+
+    __slots__ = ("samples", "capacity", "index", "count", "total", "maximum")
+
+    def __init__(self, capacity: int = 512):
+        self.samples = array("d", bytes(8 * capacity))
+        self.capacity = capacity
+        self.index = 0
+        self.count = 0    # จำนวนค่าทั้งหมดที่เคยเก็บ
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, value: float):
+        self.samples[self.index] = value
+        self.index = (self.index + 1) % self.capacity
+        self.count += 1
+        self.total += value
+        if value > self.maximum:
+            self.maximum = value
+
+    def window(self) -> List[float]:
+        """ค่าที่ยังอยู่ใน buffer"""
+        if self.count >= self.capacity:
+            return list(self.samples)
+        return list(self.samples[:self.count])
+
+    def percentile(self, p: float) -> float:
+        values = sorted(self.window())
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+    def last(self) -> float:
+        if not self.count:
+            return 0.0
+        return self.samples[self.index - 1]
+
+    def summary(self, scale: float = 1000.0) -> dict:
+        """ค่าสรุปเป็น ms (p50/p99/max ของค่าใน buffer, mean ของทั้งหมด)"""
+        values = sorted(self.window())
+        if not values:
+            return {"count": 0}
+        n = len(values)
+        return {
+            "count": self.count,
+            "mean": self.total / self.count * scale,
+            "p50": values[n // 2] * scale,
+            "p99": values[min(n - 1, n * 99 // 100)] * scale,
+            "max": self.maximum * scale,
+        }
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: RingHistogram):
+        self.histogram = histogram
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.add(time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Profiler:
+    """จับเวลาเป็นช่วง ๆ ตามชื่อ เช่น with profiler.time("ai"): ...
+
+    ตอนปิด (enabled = False) time() คืน timer เปล่าตัวเดียวกันทุกครั้ง ไม่จับเวลาและไม่สร้าง object
+    timer ของแต่ละชื่อสร้างครั้งเดียวแล้วใช้ซ้ำ (ชื่อเดียวกันซ้อนกันเองไม่ได้)
+    """
+
+    def __init__(self, enabled: bool = False, capacity: int = 512):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.histograms: Dict[str, RingHistogram] = {}
+        self._timers: Dict[str, _Timer] = {}
+
+    def time(self, name: str):
+        if not self.enabled:
+            return NULL_TIMER
+        timer = self._timers.get(name)
+        if timer is None:
+            timer = _Timer(self.histogram(name))
+            self._timers[name] = timer
+        return timer
+
+    def record(self, name: str, seconds: float):
+        if self.enabled:
+            self.histogram(name).add(seconds)
+
+    def histogram(self, name: str) -> RingHistogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = RingHistogram(self.capacity)
+            self.histograms[name] = histogram
+        return histogram
+
+    def get(self, name: str) -> Optional[RingHistogram]:
+        return self.histograms.get(name)
+
+    def summary(self) -> Dict[str, dict]:
+        return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+    def dump(self, path: str):
+        """เขียนค่าสรุป (ms) ของทุกช่วงเป็น JSON"""
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
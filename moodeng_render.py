@@ -0,0 +1,151 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pygame
+
+Color = Tuple[int, int, int]
+
+
+class RenderCache:
+    """เก็บ font และ surface ของข้อความที่ render แล้ว จะได้ไม่ต้องสร้างใหม่ทุกเฟรม
+
+    ข้อความเก็บแบบ LRU มีขนาดจำกัด (ข้อความ HUD ที่ค่าเปลี่ยนเรื่อย ๆ หรือข้อความแปลภาษา
+    จะไม่ทำให้หน่วยความจำโตไม่หยุด) ข้อความที่ prerender ไว้จะไม่ถูกลบ
+    """
+
+    def __init__(self, max_texts: int = 256):
+        self.max_texts = max_texts
+        self._fonts: Dict[Tuple[Optional[str], int], pygame.font.Font] = {}
+        self._texts: "OrderedDict[tuple, pygame.Surface]" = OrderedDict()
+        self._pinned: Dict[tuple, pygame.Surface] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size: int, name: Optional[str] = None) -> pygame.font.Font:
+        """โหลด font ครั้งเดียวต่อขนาด"""
+        key = (name, size)
+        font = self._fonts.get(key)
+        if font is None:
+            font = pygame.font.Font(name, size)
+            self._fonts[key] = font
+        return font
+
+    def text(self, message: str, size: int, color: Color) -> pygame.Surface:
+        """surface ของข้อความ render ใหม่เฉพาะข้อความที่ยังไม่เคยเห็น"""
+        key = (message, size, color)
+        surface = self._pinned.get(key)
+        if surface is not None:
+            self.hits += 1
+            return surface
+        surface = self._texts.get(key)
+        if surface is not None:
+            self._texts.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = self.font(size).render(message, True, color)
+        self._texts[key] = surface
+        if len(self._texts) > self.max_texts:
+            self._texts.popitem(last=False)
+        return surface
+
+    def prerender(self, messages: Iterable[str], size: int, color: Color):
+        """render ข้อความที่ใช้ตลอด (ตัวอักษรหมาก ปุ่ม) ไว้ก่อนและไม่ให้ถูกลบ"""
+        for message in messages:
+            key = (message, size, color)
+            if key not in self._pinned:
+                self._pinned[key] = self.font(size).render(message, True, color)
+
+
+class DirtyTracker:
+    """เทียบสิ่งที่จะวาดในเฟรมนี้กับเฟรมก่อน แล้วบอกว่าพื้นที่ไหนต้องวาดใหม่
+
+    แต่ละชิ้นมี key, rect และ signature (ค่าที่ถ้าเปลี่ยนแปลว่าหน้าตาเปลี่ยน)
+    ชิ้นที่ย้ายที่หรือหายไปจะได้ทั้ง rect เก่าและ rect ใหม่
+    """
+
+    def __init__(self):
+        self._last: Optional[Dict[object, Tuple[pygame.Rect, object]]] = None
+
+    def invalidate(self):
+        """บังคับให้เฟรมหน้าวาดใหม่ทั้งจอ (เช่น หน้าต่างถูกบังแล้วกลับมา)"""
+        self._last = None
+
+    def diff(self, scene: Dict[object, Tuple[pygame.Rect, object]]) -> Optional[List[pygame.Rect]]:
+        """คืนรายการ rect ที่ต้องวาดใหม่ หรือ None ถ้าต้องวาดทั้งจอ"""
+        last, self._last = self._last, scene
+        if last is None:
+            return None
+        dirty = []
+        for key in last.keys() | scene.keys():
+            old = last.get(key)
+            new = scene.get(key)
+            if old == new:
+                continue
+            if old is not None:
+                dirty.append(old[0])
+            if new is not None:
+                dirty.append(new[0])
+        return _merge_rects(dirty)
+
+
+def _merge_rects(rects: List[pygame.Rect]) -> List[pygame.Rect]:
+    """รวม rect ที่ซ้อนกันให้เหลือน้อยที่สุด จะได้ไม่วาดพื้นที่เดียวกันซ้ำ"""
+    merged: List[pygame.Rect] = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        i = 0
+        while i < len(merged):
+            if merged[i].colliderect(rect):
+                rect.union_ip(merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
+
+
+class FrameScheduler:
+    """คุมจังหวะของ main loop: ไม่มีอะไรเปลี่ยนก็ block รอ event แทนการวนวาดตลอดเวลา
+
+    loop เรียก events() เอา event ของรอบนี้ เรียก request_redraw() เมื่อ state หรือ hover เปลี่ยน
+    แล้ววาดเฉพาะตอนที่ frame_due() เป็น True ระหว่าง animate() จะวาดทุกเฟรมแต่ไม่เกิน fps
+    """
+
+    def __init__(self, fps: int = 60, idle_timeout_ms: int = 500):
+        self.fps = fps
+        # ตื่นมาเช็คเป็นระยะแม้ไม่มี event (กันค้างถ้ามีงานเบื้องหลัง)
+        self.idle_timeout_ms = idle_timeout_ms
+        self.clock = pygame.time.Clock()
+        self.frames = 0
+        self._redraw = True
+        self._animate_until = 0
+
+    def request_redraw(self):
+        self._redraw = True
+
+    def animate(self, duration_ms: int):
+        """วาดต่อเนื่องอีก duration_ms (สำหรับ transition)"""
+        self._animate_until = max(self._animate_until, pygame.time.get_ticks() + duration_ms)
+
+    @property
+    def animating(self) -> bool:
+        return pygame.time.get_ticks() < self._animate_until
+
+    def events(self) -> List[pygame.event.Event]:
+        """event ของรอบนี้ ถ้าไม่มีอะไรต้องวาดจะ block รอจนมี event หรือครบ idle_timeout_ms"""
+        if self._redraw or self.animating:
+            return pygame.event.get()
+        event = pygame.event.wait(self.idle_timeout_ms)
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    def frame_due(self) -> bool:
+        """True ถ้าต้องวาดเฟรมนี้ (หน่วงเวลาให้ไม่เกิน fps ด้วย)"""
+        if not (self._redraw or self.animating):
+            return False
+        self._redraw = False
+        self.clock.tick(self.fps)
+        self.frames += 1
+        return True
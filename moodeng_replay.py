@@ -0,0 +1,269 @@
+"""บันทึกเกมเป็นไฟล์ binary และเล่นซ้ำเพื่อหาบั๊ก
+
+    python moodeng_replay.py game.mdr                 # เล่นซ้ำแบบไม่มีหน้าจอ เร็วที่สุด
+    python moodeng_replay.py game.mdr --verify-ai     # ให้ AI คิดใหม่แล้วเทียบกับที่บันทึกไว้
+    python "Moodeng game v2.py" --replay game.mdr --speed 4   # ดูในหน้าต่าง 4 ตาต่อวินาที
+
+รูปแบบไฟล์: header แล้วตามด้วย record ทีละตา (เขียนต่อท้ายระหว่างเล่น ไม่ต้องรอจบเกม)
+
+    header  "MDRP", version (u8), ขนาดกระดาน (u8), seed (u64), ด่านสุดท้าย (u16, 0 = endless)
+    TURN    tag, x, y (i8), ความสามารถ (u8), จำนวนตาของ AI (u16), ช่องของ AI (u16 ต่อตัว), hash
+    RESET   tag, hash
+    UNDO    tag, hash
+    REDO    tag, hash
+    JUMP    tag, ด่าน (u16), hash
+
+hash (u64) คือ state_hash() หลังทำ record นั้น ใช้จับว่าการเล่นซ้ำเริ่มต่างจากของจริงตั้งแต่ตาไหน
+ไฟล์ version 1 ไม่มีด่านสุดท้ายใน header (เล่นถึง MAX_LEVEL) ยังอ่านได้
+ไฟล์ version 1 และ 2 เก็บด่านของ JUMP เป็น u8
+ด่านของเกม endless ไม่ได้บันทึกไว้ สร้างใหม่จาก seed ด้วย moodeng_levelgen (ได้หมากชุดเดิม)
+"""
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+import argparse
+import hashlib
+import struct
+import time
+
+from moodeng_core import PlayerAbilities, Position
+from moodeng_engine import Action, GameState, MAX_LEVEL
+from moodeng_levelgen import LevelGenerator
+
+MAGIC = b"MDRP"
+VERSION = 3
+HEADER = struct.Struct("<4sBBQH")
+HEADER_V1 = struct.Struct("<4sBBQ")
+ENDLESS = 0  # ด่านสุดท้ายใน header ของเกม endless
+TURN, RESET, UNDO, REDO, JUMP = 1, 2, 3, 4, 5
+
+_TAG = struct.Struct("<B")
+_TURN = struct.Struct("<bbBH")
+_SQUARE = struct.Struct("<H")
+_LEVEL = struct.Struct("<H")
+_LEVEL_V2 = struct.Struct("<B")  # JUMP ของไฟล์ version 1-2
+_MAX_LEVEL = struct.Struct("<H")
+_HASH = struct.Struct("<Q")
+_FIELDS = struct.Struct("<qHBBB")
+NO_MOVE = 0xFFFF  # หมากตัวนั้นไม่เดิน
+
+ABILITIES = list(PlayerAbilities)
+
+
+def state_hash(state: GameState) -> int:
+    """hash 64 บิตของทุกอย่างที่มีผลต่อการเล่นต่อ (เหมือนกันทุกเครื่อง ไม่ขึ้นกับ PYTHONHASHSEED)"""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(state.to_compact().data)
+    digest.update(bytes(ABILITIES.index(ability) for ability in state.player.abilities))
+    digest.update(_FIELDS.pack(state.score, state.current_level, state.game_over,
+                               state.victory, state.level_complete))
+    return _HASH.unpack(digest.digest())[0]
+
+
+class ReplayDivergence(Exception):
+    """การเล่นซ้ำได้ state ไม่ตรงกับที่บันทึกไว้"""
+
+    def __init__(self, index: int, message: str):
+        super().__init__(f"record {index}: {message}")
+        self.index = index
+
+
+@dataclass
+class ReplayRecord:
+    kind: int
+    state_hash: int
+    action: Optional[Action] = None
+    ai_moves: Optional[List[Optional[Position]]] = None
+    level: int = 0
+
+
+class ReplayWriter:
+    """เขียน replay ระหว่างเล่น ตั้งเป็น GameState.recorder แล้วจะบันทึกทุกตาเอง
+
+    flush ทุก record ไฟล์จึงใช้ได้แม้โปรแกรมพังกลางเกม
+    """
+
+    def __init__(self, file: Union[str, BinaryIO], state: GameState):
+        if state.seed is None:
+            raise ValueError("ต้องสร้าง GameState ด้วย seed (หรือไม่ส่ง rng มาเอง) จึงจะบันทึกได้")
+        self._owns_file = isinstance(file, str)
+        self.file = open(file, "wb") if self._owns_file else file
+        self.size = state.board_size
+        self.records = 0
+        max_level = state.max_level if state.max_level is not None else ENDLESS
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.size, state.seed, max_level))
+        state.recorder = self
+
+    def turn(self, action: Action, ai_moves: List[Optional[Position]], state: GameState):
+        ability = ABILITIES.index(action.ability) + 1 if action.ability is not None else 0
+        target = action.target
+        parts = [_TAG.pack(TURN), _TURN.pack(target.x, target.y, ability, len(ai_moves))]
+        for move in ai_moves:
+            parts.append(_SQUARE.pack(move.y * self.size + move.x if move else NO_MOVE))
+        parts.append(_HASH.pack(state_hash(state)))
+        self._write(b"".join(parts))
+
+    def reset(self, state: GameState):
+        self._write(_TAG.pack(RESET) + _HASH.pack(state_hash(state)))
+
+    def undo(self, state: GameState):
+        self._write(_TAG.pack(UNDO) + _HASH.pack(state_hash(state)))
+
+    def redo(self, state: GameState):
+        self._write(_TAG.pack(REDO) + _HASH.pack(state_hash(state)))
+
+    def jump(self, level: int, state: GameState):
+        self._write(_TAG.pack(JUMP) + _LEVEL.pack(level) + _HASH.pack(state_hash(state)))
+
+    def _write(self, data: bytes):
+        self.file.write(data)
+        self.file.flush()
+        self.records += 1
+
+    def close(self):
+        if self._owns_file:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_replay(file: BinaryIO) -> Tuple[int, int, Optional[int], Iterator[ReplayRecord]]:
+    """อ่าน header แล้วคืน (ขนาดกระดาน, seed, ด่านสุดท้าย (None = endless), iterator ของ record)"""
+    magic, version, size, seed = HEADER_V1.unpack(_read(file, HEADER_V1.size))
+    if magic != MAGIC:
+        raise ValueError("not a Moodeng replay file")
+    if version == 1:
+        max_level = MAX_LEVEL
+    elif version in (2, VERSION):
+        max_level = _MAX_LEVEL.unpack(_read(file, _MAX_LEVEL.size))[0]
+        if max_level == ENDLESS:
+            max_level = None
+    else:
+        raise ValueError(f"unsupported replay version {version}")
+    return size, seed, max_level, _records(file, size, _LEVEL if version == VERSION else _LEVEL_V2)
+
+
+def _records(file: BinaryIO, size: int, level_struct: struct.Struct) -> Iterator[ReplayRecord]:
+    while True:
+        tag = file.read(1)
+        if not tag:
+            return
+        kind = tag[0]
+        if kind == TURN:
+            x, y, ability, count = _TURN.unpack(_read(file, _TURN.size))
+            squares = struct.unpack(f"<{count}H", _read(file, 2 * count))
+            ai_moves = [Position(sq % size, sq // size) if sq != NO_MOVE else None
+                        for sq in squares]
+            action = Action(Position(x, y), ABILITIES[ability - 1] if ability else None)
+            yield ReplayRecord(kind, _read_hash(file), action=action, ai_moves=ai_moves)
+        elif kind == JUMP:
+            level = level_struct.unpack(_read(file, level_struct.size))[0]
+            yield ReplayRecord(kind, _read_hash(file), level=level)
+        elif kind in (RESET, UNDO, REDO):
+            yield ReplayRecord(kind, _read_hash(file))
+        else:
+            raise ValueError(f"unknown replay record tag {kind}")
+
+
+def _read(file: BinaryIO, count: int) -> bytes:
+    data = file.read(count)
+    if len(data) != count:
+        raise EOFError("replay file ends in the middle of a record")
+    return data
+
+
+def _read_hash(file: BinaryIO) -> int:
+    return _HASH.unpack(_read(file, _HASH.size))[0]
+
+
+class ReplayPlayer:
+    """เล่น replay กับ GameState ใหม่ทีละ record และตรวจ hash ทุกครั้ง
+
+    ปกติใช้ตาของ AI ที่บันทึกไว้ (AI ที่จำกัดเวลาคิดให้ผลต่างกันได้ในแต่ละเครื่อง)
+    ถ้า verify_ai จะให้ AI คิดใหม่ด้วยแล้วแจ้ง ReplayDivergence ถ้าได้ตาไม่ตรงกัน
+    """
+
+    def __init__(self, file: Union[str, BinaryIO], verify_ai: bool = False):
+        self._owns_file = isinstance(file, str)
+        self.file = open(file, "rb") if self._owns_file else file
+        size, seed, max_level, self._records = read_replay(self.file)
+        self.state = GameState(seed=seed, board_size=size, max_level=max_level)
+        self.levels = None
+        if max_level is None:
+            self.levels = LevelGenerator(seed, size)
+            self.state.levels = self.levels
+        self.verify_ai = verify_ai
+        self.index = 0
+        self.finished = False
+
+    def step(self) -> Optional[ReplayRecord]:
+        """เล่น record ถัดไป คืน None เมื่อจบไฟล์"""
+        record = next(self._records, None)
+        if record is None:
+            self.finished = True
+            self.close()
+            return None
+        state = self.state
+        if record.kind == TURN:
+            ai_moves = record.ai_moves
+            if self.verify_ai:
+                ai_moves = None
+            state.step(record.action, ai_moves)
+            if self.verify_ai and list(state.last_ai_moves) != record.ai_moves:
+                raise ReplayDivergence(self.index, f"AI chose {state.last_ai_moves}, "
+                                                   f"recorded {record.ai_moves}")
+        elif record.kind == RESET:
+            state.reset()
+        elif record.kind == UNDO:
+            state.undo()
+        elif record.kind == REDO:
+            state.redo()
+        elif record.kind == JUMP:
+            state.jump_to_level(record.level)
+        actual = state_hash(state)
+        if actual != record.state_hash:
+            raise ReplayDivergence(self.index, f"state hash {actual:016x} after tag {record.kind}, "
+                                               f"recorded {record.state_hash:016x}")
+        self.index += 1
+        return record
+
+    def run(self) -> int:
+        """เล่นจนจบไฟล์ คืนจำนวน record"""
+        while self.step() is not None:
+            pass
+        return self.index
+
+    def close(self):
+        if self._owns_file:
+            self.file.close()
+        if self.levels is not None:
+            self.levels.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-run a Moodeng chess replay headless")
+    parser.add_argument("replay")
+    parser.add_argument("--verify-ai", action="store_true",
+                        help="recompute AI moves instead of using the recorded ones")
+    args = parser.parse_args(argv)
+
+    player = ReplayPlayer(args.replay, args.verify_ai)
+    start = time.perf_counter()
+    try:
+        records = player.run()
+    except ReplayDivergence as error:
+        print(f"DIVERGED: {error}")
+        return 1
+    elapsed = time.perf_counter() - start
+    state = player.state
+    print(f"{records} records OK in {elapsed:.3f}s ({records / max(elapsed, 1e-9):.0f} records/s)")
+    print(f"level {state.current_level}, score {state.score}, hp {state.player.hp}, "
+          f"game over {state.game_over}, victory {state.victory}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,461 @@
+from typing import List, Optional, Tuple
+import random
+import threading
+import time
+
+from moodeng_bitboard import get_tables, iter_squares, respawn_square
+from moodeng_core import ChessAI, Piece, Player, Position, assign_targets
+from moodeng_history import CAPTURE, FIELD, PIECE, PLAYER, Event, make, unmake
+
+WIN_SCORE = 100000
+HP_WEIGHT = 1000
+SHIELD_WEIGHT = 500
+PIECE_WEIGHT = 200
+THREAT_WEIGHT = 60
+ESCAPE_WEIGHT = 25
+DISTANCE_WEIGHT = 3
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# ความลึกสูงสุด (ตา) และเวลาคิดต่อตา (ms) ตาม ChessAI.difficulty_level
+DIFFICULTY_BUDGETS = {
+    1: (1, 20),
+    2: (2, 40),
+    3: (3, 80),
+    4: (4, 120),
+    5: (6, 200),
+}
+
+
+class SearchTimeout(Exception):
+    """หมดเวลาคิดของตานี้"""
+
+
+class Zobrist:
+    """ค่าสุ่ม 64 บิตสำหรับ hash ตำแหน่งบนกระดาน (ใช้ seed คงที่ให้ hash เหมือนเดิมทุกครั้ง)"""
+
+    def __init__(self, size: int = 8, max_hp: int = 16, seed: int = 20240601):
+        rng = random.Random(seed)
+        squares = size * size
+        self.piece = {
+            name: [rng.getrandbits(64) for _ in range(squares)]
+            for name in ("PAWN", "KNIGHT", "BISHOP", "ROOK", "QUEEN")
+        }
+        self.player = [rng.getrandbits(64) for _ in range(squares)]
+        self.hp = [rng.getrandbits(64) for _ in range(max_hp + 1)]
+        self.shield = rng.getrandbits(64)
+        self.ai_to_move = rng.getrandbits(64)
+
+    def hash(self, pieces, player_sq: int, hp: int, shield: bool, ai_to_move: bool) -> int:
+        """คำนวณ hash ใหม่ทั้งหมด (ระหว่างค้นหาจะอัปเดตแบบ XOR ทีละส่วน)"""
+        key = self.player[player_sq] ^ self.hp[max(hp, 0)]
+        for name, sq in pieces:
+            key ^= self.piece[name][sq]
+        if shield:
+            key ^= self.shield
+        if ai_to_move:
+            key ^= self.ai_to_move
+        return key
+
+
+class SearchState:
+    """สถานะเดียวที่การค้นหาเดินไปแล้วย้อนกลับด้วย moodeng_history.make/unmake ไม่ต้อง copy ทุก node
+
+    มี method ชุดเดียวกับ GameState ที่ make/unmake เรียก และอัปเดต Zobrist hash (key) ทีละส่วนไปด้วย
+    หมาก AI เป็น list ของ (ชื่อชนิด, ช่อง) ตาที่ต้องเดินเป็น field "ai_to_move" (event FIELD เหมือน hp และโล่)
+    """
+
+    __slots__ = ("zobrist", "pieces", "player_sq", "hp", "shield_active", "ai_to_move", "key")
+
+    def __init__(self, zobrist: Zobrist, pieces: List[Tuple[str, int]], player_sq: int,
+                 hp: int, shield_active: bool, ai_to_move: bool = True):
+        self.zobrist = zobrist
+        self.pieces = pieces
+        self.player_sq = player_sq
+        self.hp = hp
+        self.shield_active = shield_active
+        self.ai_to_move = ai_to_move
+        self.key = zobrist.hash(pieces, player_sq, hp, shield_active, ai_to_move)
+
+    def set_player_square(self, sq: int):
+        player = self.zobrist.player
+        self.key ^= player[self.player_sq] ^ player[sq]
+        self.player_sq = sq
+
+    def move_piece(self, index: int, sq: int):
+        name, old = self.pieces[index]
+        table = self.zobrist.piece[name]
+        self.key ^= table[old] ^ table[sq]
+        self.pieces[index] = (name, sq)
+
+    def remove_piece(self, index: int):
+        name, sq = self.pieces.pop(index)
+        self.key ^= self.zobrist.piece[name][sq]
+
+    def add_piece(self, name: str, sq: int, index: int):
+        self.pieces.insert(index, (name, sq))
+        self.key ^= self.zobrist.piece[name][sq]
+
+    def set_field(self, name: str, value):
+        z = self.zobrist
+        if name == "hp":
+            self.key ^= z.hp[max(self.hp, 0)] ^ z.hp[max(value, 0)]
+        elif value != getattr(self, name):
+            self.key ^= z.shield if name == "shield_active" else z.ai_to_move
+        setattr(self, name, value)
+
+
+class TranspositionTable:
+    """ตารางจำผลการค้นหาขนาดคงที่ ช่องละหนึ่ง entry
+
+    แทนที่ entry เดิมเมื่อมาจากการค้นหารอบก่อน หรือเมื่อค้นได้ลึกกว่าหรือเท่ากัน
+    """
+
+    def __init__(self, size_bits: int = 16):
+        self.mask = (1 << size_bits) - 1
+        self.slots: List[Optional[tuple]] = [None] * (1 << size_bits)
+        self.generation = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def probe(self, key: int) -> Optional[tuple]:
+        """คืน (depth, value, flag, best_index) ถ้ามี entry ของ key นี้"""
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1:5]
+        return None
+
+    def store(self, key: int, depth: int, value: float, flag: int, best_index: int):
+        index = key & self.mask
+        entry = self.slots[index]
+        if entry is None or entry[5] != self.generation or depth >= entry[1]:
+            self.slots[index] = (key, depth, value, flag, best_index, self.generation)
+            self.stores += 1
+
+    def clear(self):
+        self.slots = [None] * len(self.slots)
+
+
+class AlphaBetaSearch:
+    """ค้นหาล่วงหน้าหลายตา (ตา AI ที่ขยับทุกตัวพร้อมกัน สลับกับตาเดินแบบคิงของผู้เล่น)
+
+    ใช้ alpha-beta, เรียงลำดับการเดิน และ transposition table ตัดกิ่งที่ไม่จำเป็น
+    ค้นแบบ iterative deepening ลึกขึ้นทีละตาจนหมดเวลา แล้วคืนตาที่ดีที่สุดที่หาได้
+    ทุก node ใช้ SearchState ตัวเดียว: make event ของตาที่ลอง ค้นต่อ แล้ว unmake กลับ
+    ถ้าไม่กำหนด depth/time_budget_ms จะใช้ค่าตาม ChessAI.difficulty_level
+    ความสามารถของผู้เล่นไม่ถูกนำมาคิดในการค้นหา
+    """
+
+    def __init__(self, ai: ChessAI, depth: Optional[int] = None,
+                 time_budget_ms: Optional[float] = None,
+                 candidates_per_piece: int = 3, tt_bits: int = 16,
+                 respawn: Optional[Position] = None):
+        self.ai = ai
+        self.depth = depth
+        self.time_budget_ms = time_budget_ms
+        self.candidates_per_piece = candidates_per_piece
+        self.size = ai.board_size
+        self.tables = get_tables(self.size)
+        self.zobrist = Zobrist(self.size)
+        self.tt = TranspositionTable(tt_bits)
+        if respawn is None:
+            respawn = Position(self.size // 2, self.size - 1)  # ช่องเริ่มของผู้เล่น
+        self.respawn_sq = respawn.y * self.size + respawn.x
+        self.nodes = 0
+        self.completed_depth = 0
+        # False ถ้า choose_moves ครั้งล่าสุดหยุดก่อนค้นครบ (หมดเวลาหรือถูก cancel) ผลใช้ได้แต่ไม่ควรจำไว้
+        self.complete = True
+        self._deadline = 0.0
+        self._cancel: Optional[threading.Event] = None
+        self._best_root: Optional[Tuple[int, ...]] = None
+
+    def budget(self) -> Tuple[int, float]:
+        """(ความลึกสูงสุด, เวลาคิด ms) ของตานี้"""
+        level = min(max(self.ai.difficulty_level, 1), max(DIFFICULTY_BUDGETS))
+        depth, time_budget_ms = DIFFICULTY_BUDGETS[level]
+        if self.depth is not None:
+            depth = self.depth
+        if self.time_budget_ms is not None:
+            time_budget_ms = self.time_budget_ms
+        return depth, time_budget_ms
+
+    def choose_moves(self, pieces: List[Piece], player: Player,
+                     deadline_ms: Optional[float] = None,
+                     cancel: Optional[threading.Event] = None) -> List[Position]:
+        """เลือกช่องปลายทางให้หมาก AI ทุกตัว (ลำดับเดียวกับ pieces) ภายใน deadline_ms
+
+        ถ้า cancel ถูก set (จาก thread อื่น) จะหยุดเหมือนหมดเวลา แต่ละงานมี cancel ของตัวเอง
+        การหยุดงานหนึ่งจึงไม่ไปโดนงานอื่นที่ใช้ search ตัวเดียวกันทีหลัง
+        """
+        if not pieces:
+            return []
+        size = self.size
+        max_depth, time_budget_ms = self.budget()
+        if deadline_ms is not None:
+            time_budget_ms = deadline_ms
+        state = self._root_state(pieces, player)
+        self.tt.new_search()
+        self.nodes = 0
+        self.completed_depth = 0
+        self.complete = False
+        self._deadline = time.perf_counter() + time_budget_ms / 1000
+        self._cancel = cancel
+
+        reply = None
+        for depth in range(1, max_depth + 1):
+            self._best_root = None
+            try:
+                reply, value = self._search_root(state, depth, reply)
+            except SearchTimeout:
+                # ตาที่ดีที่สุดของรอบก่อนถูกค้นเป็นตาแรกเสมอ
+                # ผลบางส่วนของรอบนี้จึงดีไม่น้อยกว่ารอบก่อน
+                # (state ค้างอยู่กลางกิ่งที่หมดเวลา แต่ไม่ได้ใช้ต่อแล้ว)
+                if self._best_root is not None:
+                    reply = self._best_root
+                break
+            self.completed_depth = depth
+            if abs(value) >= WIN_SCORE - max_depth:
+                self.complete = True
+                break  # รู้ผลแพ้ชนะแล้ว ไม่ต้องค้นลึกกว่านี้
+        else:
+            self.complete = True
+
+        if reply is None:
+            return self.ai.choose_moves_greedy(pieces, player)
+        return [Position(sq % size, sq // size) for sq in reply]
+
+    def _root_state(self, pieces: List[Piece], player: Player) -> SearchState:
+        size = self.size
+        squares = [(piece.piece_type.name, piece.position.y * size + piece.position.x)
+                   for piece in pieces]
+        player_sq = player.position.y * size + player.position.x
+        return SearchState(self.zobrist, squares, player_sq, player.hp, player.shield_active)
+
+    def _search_root(self, state: SearchState, depth: int,
+                     first: Optional[Tuple[int, ...]]) -> Tuple[Tuple[int, ...], float]:
+        alpha, beta = -WIN_SCORE * 2, WIN_SCORE * 2
+        best_reply = None
+        replies = self._ordered_ai_replies(state)
+        if first is not None and first in replies:
+            replies.remove(first)
+            replies.insert(0, first)
+        for reply in replies:
+            events = self._make_ai_reply(state, reply)
+            value = self._search(state, depth - 1, alpha, beta, 1)
+            _unmake_all(state, events)
+            if best_reply is None or value > alpha:
+                alpha = value
+                best_reply = reply
+                self._best_root = reply
+        return best_reply, alpha
+
+    def _search(self, state: SearchState, depth: int, alpha: float, beta: float,
+                ply: int) -> float:
+        self.nodes += 1
+        if self.nodes & 63 == 0 and (time.perf_counter() > self._deadline
+                                     or self._cancel is not None and self._cancel.is_set()):
+            raise SearchTimeout()
+
+        if state.hp <= 0:
+            return WIN_SCORE - ply  # ยิ่งจับได้เร็วยิ่งดี
+        if not state.pieces:
+            return -WIN_SCORE + ply
+        if depth <= 0:
+            return self.evaluate(state)
+
+        ai_to_move = state.ai_to_move
+        key = state.key
+        alpha_start, beta_start = alpha, beta
+        best_index = 0
+        entry = self.tt.probe(key)
+        if entry is not None:
+            entry_depth, value, flag, best_index = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value
+                if flag == LOWER and value > alpha:
+                    alpha = value
+                elif flag == UPPER and value < beta:
+                    beta = value
+                if alpha >= beta:
+                    return value
+
+        if ai_to_move:
+            moves = self._ordered_ai_replies(state)
+            make_move = self._make_ai_reply
+        else:
+            moves = self._player_moves(state)
+            make_move = self._make_player_move
+        # ลองตาที่ดีที่สุดจากครั้งก่อนเป็นตาแรก
+        if 0 < best_index < len(moves):
+            moves.insert(0, moves.pop(best_index))
+            order = [best_index] + [i for i in range(len(moves)) if i != best_index]
+        else:
+            order = list(range(len(moves)))
+
+        best = -WIN_SCORE * 2 if ai_to_move else WIN_SCORE * 2
+        best_child = order[0] if order else 0
+        for move, index in zip(moves, order):
+            events = make_move(state, move)
+            value = self._search(state, depth - 1, alpha, beta, ply + 1)
+            _unmake_all(state, events)
+            if ai_to_move:
+                if value > best:
+                    best, best_child = value, index
+                alpha = max(alpha, value)
+            else:
+                if value < best:
+                    best, best_child = value, index
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+
+        if best <= alpha_start:
+            flag = UPPER
+        elif best >= beta_start:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, best, flag, best_child)
+        return best
+
+    def _occupancy(self, pieces, player_sq: int) -> int:
+        occupied = 1 << player_sq
+        for _, sq in pieces:
+            occupied |= 1 << sq
+        return occupied
+
+    def _ordered_ai_replies(self, state: SearchState) -> List[Tuple[int, ...]]:
+        """ตาเดินร่วมของ AI: ทุกตัวเดินช่องที่ดีที่สุดที่ไม่ชนกัน (assign_targets)
+        แล้วลองเปลี่ยนทีละตัวเป็นช่องรองลงมาที่ไม่มีตัวอื่นจะไปอยู่
+
+        จำนวนตาที่สร้างจึงโตแบบเส้นตรงตามจำนวนหมาก ไม่ใช่ผลคูณของทุกตัว
+        """
+        pieces, player_sq = state.pieces, state.player_sq
+        size = self.size
+        px, py = player_sq % size, player_sq // size
+        occupied = self._occupancy(pieces, player_sq)
+        ranked = []
+        for name, sq in pieces:
+            options = []
+            distances = self.tables.distances(name, player_sq)
+            for target in iter_squares(self.tables.moves(name, sq, occupied)):
+                if target == player_sq:
+                    rank = (-1, 0)
+                else:
+                    # ตาที่ต้องเดินต่อถึงผู้เล่นก่อน แล้วค่อยดูระยะบนกระดาน
+                    rank = (distances[target],
+                            max(abs(target % size - px), abs(target // size - py)))
+                options.append((rank, target))
+            options.sort()
+            if not options:
+                options = [((0, 0), sq)]  # ไม่มีที่ให้เดิน ให้อยู่ที่เดิม
+            ranked.append(options)
+
+        base = tuple(assign_targets(ranked, [sq for _, sq in pieces]))
+        replies = [base]
+        for rank in range(1, self.candidates_per_piece):
+            for i, options in enumerate(ranked):
+                if rank < len(options):
+                    target = options[rank][1]
+                    if target not in base:
+                        replies.append(base[:i] + (target,) + base[i + 1:])
+        return replies
+
+    def _make_ai_reply(self, state: SearchState, reply: Tuple[int, ...]) -> List[Event]:
+        """ขยับหมากทุกตัวตามลำดับ คิดดาเมจและจุดเกิดใหม่แบบเดียวกับ GameState.apply_ai_moves
+
+        คืน event ที่ make ไปแล้ว (ส่งให้ _unmake_all ตอนย้อน)
+        """
+        events = []
+        pieces = state.pieces
+        for i, target in enumerate(reply):
+            sq = pieces[i][1]
+            if target != sq:
+                _make(state, events, (PIECE, i, sq, target))
+            if target == state.player_sq and state.hp > 0:
+                if state.shield_active:
+                    _make(state, events, (FIELD, "shield_active", True, False))
+                else:
+                    _make(state, events, (FIELD, "hp", state.hp, state.hp - 1))
+                    if state.hp > 0:
+                        # หมากที่ยังไม่ถึงลำดับเดินยังอยู่ที่เดิม เหมือน threat map ของ GameState ตอนนั้น
+                        respawn = self._respawn(pieces)
+                        if respawn != state.player_sq:
+                            _make(state, events, (PLAYER, state.player_sq, respawn))
+        _make(state, events, (FIELD, "ai_to_move", True, False))
+        return events
+
+    def _respawn(self, pieces) -> int:
+        """จุดเกิดใหม่ของผู้เล่นเมื่อหมาก AI อยู่ที่ pieces (ดู respawn_square)"""
+        occupied = 0
+        for _, sq in pieces:
+            occupied |= 1 << sq
+        attacked = 0
+        for name, sq in pieces:
+            attacked |= self.tables.moves(name, sq, occupied)
+        safe = self.tables.full & ~(attacked | occupied)
+        return respawn_square(self.size, self.respawn_sq, safe)
+
+    def _player_moves(self, state: SearchState) -> List[Tuple[int, int]]:
+        """ตาเดินแบบคิงของผู้เล่นเป็น (ช่อง, ลำดับหมากที่ถูกกิน หรือ -1)
+        เรียงให้การกินหมากมาก่อน ตามด้วยช่องที่ไม่ถูกโจมตี"""
+        pieces, player_sq = state.pieces, state.player_sq
+        occupied = self._occupancy(pieces, player_sq)
+        attacked = 0
+        for name, sq in pieces:
+            attacked |= self.tables.moves(name, sq, occupied)
+        index_at = {}
+        for i, (_, sq) in enumerate(pieces):
+            index_at.setdefault(sq, i)
+
+        scored = []
+        for target in iter_squares(self.tables.king[player_sq]):
+            captured = index_at.get(target, -1)
+            scored.append(((captured < 0, attacked >> target & 1, target), (target, captured)))
+        scored.sort()
+        return [move for _, move in scored]
+
+    def _make_player_move(self, state: SearchState, move: Tuple[int, int]) -> List[Event]:
+        target, captured = move
+        events = []
+        if captured >= 0:
+            name, sq = state.pieces[captured]
+            _make(state, events, (CAPTURE, captured, name, sq))
+        _make(state, events, (PLAYER, state.player_sq, target))
+        _make(state, events, (FIELD, "ai_to_move", False, True))
+        return events
+
+    def evaluate(self, state: SearchState) -> float:
+        """คะแนนจากมุมของ AI (ยิ่งมากยิ่งดีสำหรับ AI)"""
+        pieces, player_sq, hp, shield = state.pieces, state.player_sq, state.hp, state.shield_active
+        tables = self.tables
+        occupied = self._occupancy(pieces, player_sq)
+        attacked = 0
+        distance = 0
+        for name, sq in pieces:
+            attacked |= tables.moves(name, sq, occupied)
+            distance += tables.distances(name, player_sq)[sq]  # จำนวนตาถึงผู้เล่น
+
+        score = -HP_WEIGHT * hp + PIECE_WEIGHT * len(pieces) - DISTANCE_WEIGHT * distance
+        if shield:
+            score -= SHIELD_WEIGHT
+        if attacked >> player_sq & 1:
+            score += THREAT_WEIGHT
+        escapes = self.tables.king[player_sq] & ~attacked
+        score -= ESCAPE_WEIGHT * escapes.bit_count()
+        return score
+
+
+def _make(state: SearchState, events: List[Event], event: Event):
+    make(state, event)
+    events.append(event)
+
+
+def _unmake_all(state: SearchState, events: List[Event]):
+    for event in reversed(events):
+        unmake(state, event)
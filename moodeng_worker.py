@@ -0,0 +1,137 @@
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+import threading
+
+from moodeng_core import ChessAI, Piece, Player, Position
+from moodeng_profile import Profiler
+
+
+def snapshot(pieces: List[Piece], player: Player):
+    """สำเนาของหมากและผู้เล่น ให้ thread ของ AI อ่านได้โดยไม่ชนกับหน้าจอที่แก้ state ตัวจริง"""
+    pieces = [Piece(piece.piece_type, Position(piece.position.x, piece.position.y))
+              for piece in pieces]
+    player = Player(Position(player.position.x, player.position.y), player.hp,
+                    list(player.abilities), player.shield_active, player.moves_remaining)
+    return pieces, player
+
+
+def position_key(pieces: List[Piece], player: Player, ai: ChessAI) -> tuple:
+    """ทุกอย่างที่มีผลต่อ choose_moves: ระดับของ AI ตำแหน่งหมาก ช่องผู้เล่น hp และโล่"""
+    return (ai.difficulty_level, ai.search is not None,
+            player.position.x, player.position.y, player.hp, player.shield_active,
+            tuple((piece.piece_type, piece.position.x, piece.position.y) for piece in pieces))
+
+
+class AIWorker:
+    """ให้ ChessAI.choose_moves คิดบน thread แยก หน้าจอยังวาดและรับ event ได้ระหว่างรอ
+
+    submit() ส่งงาน (คิดจากสำเนาของ state) แล้ว poll() เอาผลเมื่อเสร็จ มีได้ทีละงาน
+    on_done ถูกเรียกเมื่องานที่ submit เสร็จ (จาก thread ของ AI หรือทันทีถ้าได้ผลจาก cache)
+    cancel() สั่งการค้นหาให้หยุดเหมือนหมดเวลา รอจนหยุดจริง แล้วทิ้งผล
+    แต่ละงานมี threading.Event ของตัวเองส่งให้ ChessAI.choose_moves สั่งหยุดงานไหนก็โดนแค่งานนั้น
+
+    speculate() ให้คิดตาตอบของหลายตำแหน่งไว้ก่อนระหว่างที่ผู้เล่นยังเลือกช่องอยู่
+    ถ้า submit ตำแหน่งที่คิดเสร็จแล้วจะได้ผลทันที ถ้ากำลังคิดอยู่ก็รองานนั้นต่อ
+    งานล่วงหน้าอื่นที่ยังไม่ได้เริ่มจะถูกยกเลิก
+    """
+
+    def __init__(self, ai: ChessAI, profiler: Optional[Profiler] = None,
+                 on_done: Optional[Callable[[], None]] = None):
+        self.ai = ai
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.on_done = on_done
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="moodeng-ai")
+        self._future: Optional[Future] = None
+        self._cancel: Optional[threading.Event] = None  # ตัวสั่งหยุดของงานใน _future
+        # ผลของตำแหน่งที่คิดไว้ล่วงหน้า และงานล่วงหน้าที่ยังไม่เสร็จ (เฉพาะตานี้)
+        self._cache: Dict[tuple, List[Position]] = {}
+        self._speculative: Dict[tuple, Tuple[Future, threading.Event]] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def submit(self, pieces: List[Piece], player: Player):
+        if self._future is not None:
+            raise RuntimeError("AI is already thinking")
+        pieces, player = snapshot(pieces, player)
+        key = position_key(pieces, player, self.ai)
+        moves = self._cache.get(key)
+        job = self._speculative.pop(key, None)
+        self._cancel_speculation()
+        cancel = None
+        if moves is not None:
+            self.hits += 1
+            future = Future()
+            future.set_result(moves)
+        elif job is not None and not job[0].cancelled():
+            self.hits += 1
+            future, cancel = job
+        else:
+            self.misses += 1
+            cancel = threading.Event()
+            future = self._executor.submit(self._run, key, self._generation, pieces, player,
+                                           False, cancel)
+        self._future, self._cancel = future, cancel
+        if self.on_done is not None:
+            future.add_done_callback(lambda _: self.on_done())
+
+    def speculate(self, positions: List[Tuple[List[Piece], Player]]):
+        """ทิ้งผลล่วงหน้าชุดเดิม แล้วคิดตาตอบของ (pieces, player) แต่ละชุดไว้ก่อน
+
+        pieces และ player ต้องเป็นสำเนา (ดู snapshot()) เพราะ thread ของ AI จะอ่านทีหลัง
+        """
+        self.invalidate()
+        for pieces, player in positions:
+            key = position_key(pieces, player, self.ai)
+            if key not in self._speculative:
+                cancel = threading.Event()
+                future = self._executor.submit(
+                    self._run, key, self._generation, pieces, player, True, cancel)
+                self._speculative[key] = (future, cancel)
+
+    def invalidate(self):
+        """ทิ้งผลล่วงหน้าทั้งหมด (state เปลี่ยนไปแล้ว ตำแหน่งพวกนั้นเกิดขึ้นไม่ได้อีก)"""
+        self._generation += 1
+        self._cache.clear()
+        self._cancel_speculation()
+
+    def _cancel_speculation(self):
+        """ยกเลิกงานล่วงหน้าที่ยังไม่เริ่ม และสั่งหยุดงานที่กำลังคิดอยู่ (ถ้าเป็นงานล่วงหน้า)"""
+        for future, cancel in self._speculative.values():
+            future.cancel()
+            cancel.set()
+        self._speculative.clear()
+
+    def _run(self, key: tuple, generation: int, pieces: List[Piece], player: Player,
+             speculative: bool, cancel: threading.Event) -> List[Position]:
+        with self.profiler.time("ai.speculative" if speculative else "ai"):
+            moves = self.ai.choose_moves(pieces, player, cancel)
+        # งานที่ถูกสั่งหยุดได้ผลจากการค้นหาไม่ครบ ไม่เก็บไว้ตอบตาหน้า
+        if speculative and generation == self._generation and not cancel.is_set():
+            self._cache[key] = moves
+        return moves
+
+    def poll(self) -> Optional[List[Position]]:
+        """ผลของงานที่ส่งไป (None ถ้ายังไม่เสร็จหรือไม่มีงาน) error ของ AI จะถูก raise ที่นี่"""
+        future = self._future
+        if future is None or not future.done():
+            return None
+        self._future = None
+        return future.result()
+
+    def cancel(self):
+        future, self._future = self._future, None
+        cancel, self._cancel = self._cancel, None
+        if future is None or future.cancel():
+            return
+        if cancel is not None:
+            cancel.set()
+        try:
+            future.result()
+        except CancelledError:
+            pass
+
+    def shutdown(self):
+        self.cancel()
+        self.invalidate()
+        self._executor.shutdown(wait=True)
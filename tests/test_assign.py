@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from moodeng_core import ChessAI, Piece, PieceType, Player, Position, assign_targets
+
+
+def test_assign_targets_never_stacks():
+    rng = random.Random(1)
+    for _ in range(500):
+        count = rng.randint(1, 12)
+        current = rng.sample(range(64), count)
+        # ช่องที่อยากไปซ้อนกันเยอะ ๆ (ตัวเลือกจาก 16 ช่องเท่านั้น)
+        options = [[(rng.randint(0, 5), sq) for sq in rng.sample(range(16), rng.randint(0, 6))]
+                   for _ in range(count)]
+        result = assign_targets(options, current)
+        assert len(set(result)) == count
+        for i, sq in enumerate(result):
+            assert sq == current[i] or sq in {target for _, target in options[i]}
+
+
+def test_assign_targets_gives_free_square_to_best_cost():
+    # สองตัวอยากได้ช่อง 10 ตัวที่ cost ต่ำกว่าได้ไป อีกตัวได้ช่องรอง
+    assert assign_targets([[(1, 10), (5, 11)], [(0, 10), (2, 12)]], [0, 1]) == [11, 10]
+
+
+def _wave(size):
+    rng = random.Random(size)
+    # หมากเต็มครึ่งบนของกระดาน ช่องว่างมีน้อย หลายตัวอยากได้ช่องเดียวกัน
+    squares = rng.sample(range(size * size // 2), size * 2)
+    types = list(PieceType)
+    pieces = [Piece(types[i % len(types)], Position(sq % size, sq // size))
+              for i, sq in enumerate(squares)]
+    return pieces, Player(Position(size // 2, size - 1), hp=3, abilities=[])
+
+
+@pytest.mark.parametrize("size", [8, 32, 64])
+def test_greedy_choose_moves_never_stacks(size):
+    pieces, player = _wave(size)
+    moves = ChessAI(size).choose_moves_greedy(pieces, player)
+    assert len({(move.x, move.y) for move in moves}) == len(pieces)
+
@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from moodeng_bitboard import MoveTables
+from moodeng_core import ChessAI, Piece, PieceType, Position
+
+
+@pytest.mark.parametrize("size", [8, 13, 64])
+def test_bitboard_matches_reference(size):
+    """ตารางบิตบอร์ดให้ช่องเดินได้ตรงกับการเดินทีละช่องแบบเดิม ทุกชนิดหมาก บนกระดานหลายขนาด"""
+    rng = random.Random(size)
+    ai = ChessAI(size)
+    squares = size * size
+    for _ in range(300):
+        occupied = 0
+        for sq in rng.sample(range(squares), rng.randint(0, squares // 4)):
+            occupied |= 1 << sq
+        sq = rng.randrange(squares)
+        for piece_type in PieceType:
+            piece = Piece(piece_type, Position(sq % size, sq // size))
+            bitboard = sorted((move.x, move.y) for move in ai.get_moves(piece, occupied))
+            reference = sorted((move.x, move.y)
+                               for move in ai.get_moves_reference(piece, occupied))
+            assert bitboard == reference, (piece, occupied)
+
+
+def test_slider_cache_is_bounded():
+    """cache ของหมากไถลล้างเมื่อเต็ม และผลหลังล้างยังถูกต้อง"""
+    tables = MoveTables(8)
+    tables.max_slider_entries = 50
+    reference = MoveTables(8)
+    rng = random.Random(2)
+    for _ in range(2000):
+        occupied = rng.getrandbits(64)
+        sq = rng.randrange(64)
+        for type_name in ("ROOK", "BISHOP", "QUEEN"):
+            attacks = tables.slide(type_name, sq, occupied)
+            assert attacks == reference.slide(type_name, sq, occupied)
+        entries = sum(len(cache) for caches in tables._slider_cache.values() for cache in caches)
+        assert entries == tables._slider_entries <= 50
+
+
+def test_slider_cache_budget_scales_with_board_size():
+    """key ของกระดานใหญ่ยาวกว่า จึงจำได้น้อยตัวกว่า (หน่วยความจำรวมใกล้เคียงกัน)"""
+    assert MoveTables(8).max_slider_entries == 65536
+    assert MoveTables(64).max_slider_entries == 1024
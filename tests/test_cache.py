@@ -0,0 +1,38 @@
+import threading
+
+from moodeng_cache import ReplyCache
+from moodeng_core import Position
+from moodeng_engine import GameState
+
+
+def test_cancelled_search_is_not_cached():
+    state = GameState(seed=1)
+    state.jump_to_level(5)
+    state.ai.cache = cache = ReplyCache()
+    state.searcher.time_budget_ms = 10_000
+    cancel = threading.Event()
+    cancel.set()
+    state.ai.choose_moves(state.ai_pieces, state.player, cancel)
+    assert not state.searcher.complete
+    assert len(cache) == 0
+
+    state.searcher.depth = 1
+    moves = state.ai.choose_moves(state.ai_pieces, state.player)
+    assert state.searcher.complete
+    assert len(cache) == 1
+    assert state.ai.choose_moves(state.ai_pieces, state.player) == moves
+    assert cache.hits == 1
+
+
+def test_lru_eviction_and_file_round_trip(tmp_path):
+    path = str(tmp_path / "replies.bin")
+    cache = ReplyCache(max_entries=2, path=path)
+    for i in range(3):
+        cache.put(bytes([i]) * 16, 8, [Position(i, 0), None])
+    assert len(cache) == 2
+    assert cache.get(bytes([0]) * 16, 8) is None
+    cache.save()
+
+    loaded = ReplyCache(path=path)
+    assert len(loaded) == 2
+    assert loaded.get(bytes([2]) * 16, 8) == [Position(2, 0), None]
@@ -0,0 +1,44 @@
+import random
+
+from moodeng_balance import flee_policy
+from moodeng_engine import GameState
+from moodeng_replay import state_hash
+
+
+def test_compact_round_trip():
+    rng = random.Random(2)
+    state = GameState(seed=2, search_from_level=None)
+    state.jump_to_level(3)
+    for _ in range(10):
+        state.step(flee_policy(state, rng))
+    compact = state.to_compact()
+    clone = compact.copy()
+    assert clone == compact and clone.data is not compact.data
+    player, pieces = clone.to_game()
+    assert (player.position, player.hp, player.shield_active) == (
+        state.player.position, state.player.hp, state.player.shield_active)
+    # ความสามารถเก็บเป็นจำนวนต่อชนิด ลำดับจึงไม่ตามเดิม
+    assert sorted(player.abilities, key=str) == sorted(state.player.abilities, key=str)
+    assert pieces == state.ai_pieces
+
+
+def test_restart_from_replays_the_same_game():
+    """เริ่มจาก CompactState เดิมกับ rng เดิม ต้องได้เกมเดิมทุกครั้ง แม้ state จะผ่านด่านไปแล้ว"""
+    state = GameState(seed=0, search_from_level=None, keep_history=False)
+    state.jump_to_level(2)
+    start = state.to_compact()
+    runs = []
+    for _ in range(3):
+        rng = random.Random("rollout")
+        state.rng = rng
+        state.restart_from(start)
+        assert state.current_level == 1 and not state.game_over
+        assert state.to_compact() == start
+        hashes = []
+        for _ in range(40):
+            if state.game_over:
+                break
+            state.step(flee_policy(state, rng))
+            hashes.append(state_hash(state))
+        runs.append(hashes)
+    assert runs[0] == runs[1] == runs[2]
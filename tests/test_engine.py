@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from moodeng_balance import flee_policy
+from moodeng_engine import GameState
+from moodeng_replay import state_hash
+
+
+def test_without_history_plays_the_same_game():
+    """keep_history=False ไม่บันทึก event แต่ผลของทุกตาต้องเหมือนเดิม"""
+    logged = GameState(seed=4, search_from_level=None)
+    headless = GameState(seed=4, search_from_level=None, keep_history=False)
+    rng_logged, rng_headless = random.Random(4), random.Random(4)
+    for _ in range(200):
+        if logged.game_over:
+            break
+        logged.step(flee_policy(logged, rng_logged))
+        headless.step(flee_policy(headless, rng_headless))
+        assert state_hash(headless) == state_hash(logged)
+    assert logged.history.turns
+    assert not headless.history.turns
+    assert not headless.undo()
+
+
+def test_capture_index_follows_the_pieces():
+    """ลำดับหมากใน Occupancy ตรงกับ ai_pieces หลังกิน ผ่านด่าน และ undo"""
+    rng = random.Random(3)
+    state = GameState(seed=3, search_from_level=None)
+    state.jump_to_level(5)
+    for _ in range(60):
+        if state.game_over:
+            break
+        state.step(flee_policy(state, rng))
+        if rng.random() < 0.3:
+            state.undo()
+        for i, piece in enumerate(state.ai_pieces):
+            assert state.occupancy.index_of(piece) == i
+
+
+def test_threats_match_a_rebuild():
+    """threat map ที่อัปเดตทีละการเดิน (รวม undo) เท่ากับสร้างใหม่จากหมากที่เหลือ"""
+    rng = random.Random(5)
+    state = GameState(seed=5, search_from_level=None)
+    state.jump_to_level(5)
+    fresh = GameState(seed=5, search_from_level=None)
+    for _ in range(60):
+        if state.game_over:
+            break
+        state.step(flee_policy(state, rng))
+        if rng.random() < 0.3:
+            state.undo()
+        fresh.load_compact(state.to_compact())
+        assert state.threats.safe_squares() == fresh.threats.safe_squares()
+        assert state.respawn_position() == fresh.respawn_position()
+
+
+@pytest.mark.parametrize("size", [7, 65])
+def test_board_size_out_of_range(size):
+    with pytest.raises(ValueError):
+        GameState(board_size=size)
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from moodeng_balance import flee_policy  # noqa: E402
+from moodeng_core import ChessAI, Piece, PieceType, Player, Position  # noqa: E402
+from moodeng_engine import GameState  # noqa: E402
+from moodeng_eval import ROW_CACHE_ENTRIES  # noqa: E402
+
+
+def _wave(size, seed):
+    rng = random.Random(seed)
+    squares = rng.sample(range(size * size // 2), size * 2)
+    types = list(PieceType)
+    pieces = [Piece(types[i % len(types)], Position(sq % size, sq // size))
+              for i, sq in enumerate(squares)]
+    player = Player(Position(rng.randrange(size), rng.randrange(size // 2, size)),
+                    hp=3, abilities=[])
+    return pieces, player
+
+
+@pytest.mark.parametrize("blocked_distances", [False, True])
+def test_numpy_evaluator_matches_scalar(blocked_distances):
+    for seed in range(20):
+        pieces, player = _wave(8, seed)
+        scalar = ChessAI(8, blocked_distances=blocked_distances)
+        batched = ChessAI(8, evaluator="numpy", blocked_distances=blocked_distances)
+        assert (scalar.choose_moves_greedy(pieces, player)
+                == batched.choose_moves_greedy(pieces, player))
+
+
+def test_row_cache_is_bounded():
+    """ตารางระยะที่คำนวณใหม่ (blocked_distances) แทนที่ array เก่า ไม่สะสมไว้"""
+    rng = random.Random(0)
+    ai = ChessAI(evaluator="numpy", blocked_distances=True)
+    state = GameState(ai=ai, seed=0, search_from_level=None, keep_history=False)
+    state.jump_to_level(5)
+    for _ in range(2000):
+        if state.game_over or state.current_level != 5:
+            state.jump_to_level(5)
+        state.step(flee_policy(state, rng))
+        assert len(ai._batch._rows) <= ROW_CACHE_ENTRIES
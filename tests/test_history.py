@@ -0,0 +1,42 @@
+import random
+
+from moodeng_balance import flee_policy
+from moodeng_engine import GameState
+from moodeng_replay import state_hash
+
+
+def test_undo_redo_restore_state_hash():
+    for game in range(10):
+        rng = random.Random(game)
+        state = GameState(seed=game, search_from_level=None)
+        state.jump_to_level(rng.randint(1, 5))
+        hashes = [state_hash(state)]
+        for _ in range(80):
+            if state.game_over:
+                break
+            state.step(flee_policy(state, rng))
+            if state.history.cursor == len(hashes):  # ตาที่เดินไม่ได้ไม่ถูกบันทึก
+                hashes.append(state_hash(state))
+        assert state.history.cursor == len(hashes) - 1
+
+        for expected in reversed(hashes[:-1]):
+            assert state.undo()
+            assert state_hash(state) == expected
+        assert not state.undo()
+        for expected in hashes[1:]:
+            assert state.redo()
+            assert state_hash(state) == expected
+        assert not state.redo()
+
+
+def test_new_turn_after_undo_drops_redo():
+    rng = random.Random(1)
+    state = GameState(seed=1, search_from_level=None)
+    for _ in range(5):
+        state.step(flee_policy(state, rng))
+    state.undo()
+    state.undo()
+    assert state.history.can_redo
+    state.step(flee_policy(state, rng))
+    assert not state.history.can_redo
+    assert state.history.cursor == len(state.history.turns) == 4
@@ -0,0 +1,35 @@
+import pytest
+
+from moodeng_levelgen import LevelGenerator
+
+
+def test_same_seed_same_levels(tmp_path):
+    path = str(tmp_path / "levels.mdlv")
+    first = LevelGenerator(9, path=path)
+    try:
+        levels = [first.prefetch(level).result() for level in (6, 7)]
+    finally:
+        first.close()
+    first.save()
+
+    second = LevelGenerator(9)
+    try:
+        assert [second.generate(level) for level in (6, 7)] == levels
+    finally:
+        second.close()
+
+    loaded = LevelGenerator(9, path=path)
+    try:
+        assert len(loaded) == 2
+        difficulty, layout = loaded.prefetch(7).result()
+        assert layout == levels[1][1]
+        assert difficulty == pytest.approx(levels[1][0], abs=1e-6)  # เก็บเป็น f32 ในไฟล์
+        assert loaded.generated == 0
+    finally:
+        loaded.close()
+
+
+@pytest.mark.parametrize("seed, board_size", [(-1, 8), (1 << 64, 8), (0, 65)])
+def test_rejects_bad_settings(seed, board_size):
+    with pytest.raises(ValueError):
+        LevelGenerator(seed, board_size)
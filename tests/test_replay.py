@@ -0,0 +1,90 @@
+import io
+import random
+
+import pytest
+
+from moodeng_balance import flee_policy
+from moodeng_engine import GameState
+from moodeng_levelgen import LevelGenerator
+from moodeng_replay import ReplayDivergence, ReplayPlayer, ReplayWriter, state_hash
+
+
+def _record(state, rng, actions):
+    buffer = io.BytesIO()
+    ReplayWriter(buffer, state)
+    actions(state, rng)
+    return buffer.getvalue()
+
+
+def _play(state, rng, turns):
+    for _ in range(turns):
+        if state.game_over:
+            break
+        state.step(flee_policy(state, rng))
+
+
+def test_round_trip():
+    state = GameState(seed=11)
+    rng = random.Random(11)
+
+    def actions(state, rng):
+        _play(state, rng, 20)
+        state.undo()
+        state.undo()
+        state.redo()
+        state.jump_to_level(4)
+        _play(state, rng, 10)
+        state.reset()
+        _play(state, rng, 5)
+
+    data = _record(state, rng, actions)
+    player = ReplayPlayer(io.BytesIO(data))
+    assert player.run() > 0
+    assert state_hash(player.state) == state_hash(state)
+
+
+def test_round_trip_on_big_board():
+    state = GameState(seed=5, board_size=16, search_from_level=None)
+    data = _record(state, random.Random(5), lambda state, rng: _play(state, rng, 15))
+    player = ReplayPlayer(io.BytesIO(data))
+    player.run()
+    assert player.state.board_size == 16
+    assert state_hash(player.state) == state_hash(state)
+
+def test_round_trip_endless():
+    """ด่านที่สร้างขึ้นไม่ได้อยู่ในไฟล์ ตอนเล่นซ้ำต้องสร้างจาก seed ได้หมากชุดเดิม"""
+    state = GameState(seed=7, max_level=None, search_from_level=None)
+    levels = LevelGenerator(state.seed, state.board_size)
+    state.levels = levels
+
+    def actions(state, rng):
+        state.jump_to_level(6)
+        _play(state, rng, 10)
+        state.jump_to_level(300)  # เกิน u8 ของ replay รุ่นเก่า
+        _play(state, rng, 5)
+
+    try:
+        data = _record(state, random.Random(7), actions)
+    finally:
+        levels.close()
+    player = ReplayPlayer(io.BytesIO(data))
+    player.run()
+    assert player.state.max_level is None
+    assert player.state.current_level == state.current_level == 300
+    assert state_hash(player.state) == state_hash(state)
+
+
+def test_tampered_replay_diverges():
+    state = GameState(seed=3)
+    data = bytearray(_record(state, random.Random(3), lambda state, rng: _play(state, rng, 5)))
+    data[-1] ^= 0xFF  # hash ของ record สุดท้าย
+    with pytest.raises(ReplayDivergence):
+        ReplayPlayer(io.BytesIO(bytes(data))).run()
+
+
+def test_seed_must_fit_u64():
+    with pytest.raises(ValueError):
+        GameState(seed=-1)
+    with pytest.raises(ValueError):
+        GameState(seed=1 << 64)
+    assert GameState(seed=(1 << 64) - 1).seed == (1 << 64) - 1
@@ -0,0 +1,64 @@
+import random
+
+from moodeng_core import Position
+from moodeng_engine import GameState
+from moodeng_search import _unmake_all
+
+
+def _positions(games):
+    for game in range(games):
+        rng = random.Random(game)
+        state = GameState(rng=rng, search_from_level=None)
+        state.jump_to_level(rng.randint(1, 5))
+        size = state.board_size
+        state.player.position = Position(rng.randrange(size), rng.randrange(size // 2, size))
+        state.player.shield_active = rng.random() < 0.3
+        yield rng, state
+
+
+def _snapshot(node):
+    return (list(node.pieces), node.player_sq, node.hp, node.shield_active,
+            node.ai_to_move, node.key)
+
+
+def test_search_respawns_like_the_engine():
+    """ผลของตา AI ในการค้นหา (ช่องผู้เล่น hp โล่) ตรงกับ GameState.apply_ai_moves"""
+    for _, state in _positions(100):
+        size = state.board_size
+        search = state.searcher
+        node = search._root_state(state.ai_pieces, state.player)
+        for reply in search._ordered_ai_replies(node)[:4]:
+            events = search._make_ai_reply(node, reply)
+            state.history.begin()
+            state.apply_ai_moves([Position(sq % size, sq // size) for sq in reply])
+            state.history.end()
+            player = state.player
+            if not state.game_over:
+                assert (node.player_sq, node.hp, node.shield_active) == (
+                    player.position.y * size + player.position.x, player.hp,
+                    player.shield_active)
+            state.undo()
+            _unmake_all(node, events)
+
+
+def test_make_unmake_restores_the_search_state():
+    """เดินสุ่มลงไปหลายตาบน SearchState ตัวเดียว hash ต้องตรงกับคำนวณใหม่ทุกตา และย้อนกลับได้ครบ"""
+    for rng, state in _positions(50):
+        search = state.searcher
+        node = search._root_state(state.ai_pieces, state.player)
+        path = []
+        for _ in range(6):
+            if node.hp <= 0 or not node.pieces:
+                break
+            if node.ai_to_move:
+                events = search._make_ai_reply(node, rng.choice(search._ordered_ai_replies(node)))
+            else:
+                events = search._make_player_move(node, rng.choice(search._player_moves(node)))
+            assert node.key == search.zobrist.hash(node.pieces, node.player_sq, node.hp,
+                                                   node.shield_active, node.ai_to_move)
+            path.append((_snapshot(node), events))
+        root = search._root_state(state.ai_pieces, state.player)
+        for expected, events in reversed(path):
+            assert _snapshot(node) == expected
+            _unmake_all(node, events)
+        assert _snapshot(node) == _snapshot(root)
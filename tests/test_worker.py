@@ -0,0 +1,51 @@
+import time
+
+from moodeng_engine import GameState
+from moodeng_worker import AIWorker, snapshot
+
+
+def _level5():
+    state = GameState(seed=1)
+    state.jump_to_level(5)
+    # ค้นให้ครบทุกครั้ง ผลจะได้ไม่ขึ้นกับความเร็วเครื่อง
+    state.searcher.depth = 2
+    state.searcher.time_budget_ms = 10_000
+    return state
+
+
+def _wait(worker):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        moves = worker.poll()
+        if moves is not None:
+            return moves
+        time.sleep(0.001)
+    raise AssertionError("AI did not finish")
+
+
+def test_cancel_only_stops_its_own_job():
+    state = _level5()
+    worker = AIWorker(state.ai)
+    try:
+        worker.submit(state.ai_pieces, state.player)
+        worker.cancel()
+        assert worker.poll() is None
+        worker.submit(state.ai_pieces, state.player)
+        moves = _wait(worker)
+        assert state.searcher.complete
+        assert moves == state.ai.choose_moves(state.ai_pieces, state.player)
+    finally:
+        worker.shutdown()
+
+
+def test_speculated_position_is_a_hit():
+    state = _level5()
+    worker = AIWorker(state.ai)
+    try:
+        worker.speculate([snapshot(state.ai_pieces, state.player)])
+        worker.submit(state.ai_pieces, state.player)
+        moves = _wait(worker)
+        assert (worker.hits, worker.misses) == (1, 0)
+        assert moves == state.ai.choose_moves(state.ai_pieces, state.player)
+    finally:
+        worker.shutdown()